@@ -0,0 +1,1648 @@
+"""The storage backends for the stored dates
+
+`DataBackend` is the interface `Project` and `CacheManager` use the data
+through. There's one backend per way of storing the dates, named in a
+config's data config and looked up in `DATA_BACKENDS`: csv partitions and
+archive segments (`DataManager`, the default), a single binary file, an
+SQLite database, or memory only. Every backend has to pass the checks in
+conformance.py.
+"""
+import bisect
+import csv
+import gzip
+import hashlib
+import heapq
+import json
+import os
+import os.path
+import sqlite3
+import struct
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from functools import partial, wraps
+from itertools import accumulate, groupby
+
+from data_files import (parse_rows, iter_rows, iter_columns, in_order,
+                        merge_sorted, merged_rows, parse_chunk,
+                        chunk_offsets, fsync_file, fsync_directory,
+                        write_atomically, frozen_lines)
+from date_point import (DatePoint, DateStore, Timeframe, civil_from_days,
+                        timeframe_start)
+from events import Change, DataEvent, EventBus
+from metrics import registry, Metric
+from rollup import Rollup
+
+class SegmentedStore:
+    """Every stored DatePoint as one sequence, loading parts on demand
+
+    Indexes run through the archive segments and then the partitions in
+    order, the same as `DataManager.date_list`. A part (e.g. a compressed
+    segment) is only loaded once an index inside it is accessed, so
+    `TimeframeGroup`s can refer into old history without loading it.
+    """
+    def __init__(self, parts):
+        """Create a store from a list of (row count, store loader) pairs"""
+        self._loaders = [loader for _, loader in parts]
+        self._offsets = list(accumulate([0] + [rows for rows, _ in parts]))
+        self._stores = {}
+
+    def __len__(self):
+        return self._offsets[-1]
+
+    def _part(self, part):
+        """Get the DateStore of a part, loading it the first time"""
+        store = self._stores.get(part)
+        if store is None:
+            store = self._stores[part] = self._loaders[part]()
+        return store
+
+    def __getitem__(self, index):
+        """Get the DatePoint at an index, or a list of them for a slice"""
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('SegmentedStore index out of range')
+        part = bisect.bisect_right(self._offsets, index) - 1
+        return self._part(part)[index - self._offsets[part]]
+
+    def __iter__(self):
+        for part in range(len(self._loaders)):
+            yield from self._part(part)
+
+    def total_time(self, start_index=0, end_index=None):
+        """Get the total time of the DatePoints in an index range"""
+        if end_index is None:
+            end_index = len(self)
+        total = timedelta()
+        for part, offset in enumerate(self._offsets[:-1]):
+            part_end = self._offsets[part + 1]
+            if part_end > start_index and offset < end_index:
+                total += self._part(part).total_time(
+                    max(start_index - offset, 0), end_index - offset)
+        return total
+
+def publishes_change(method):
+    """Decorate a data manager method that changes the stored dates
+
+    Once the method returns its change is published as a `DataEvent` on the
+    manager's `events`, unless the data didn't change or nothing subscribes.
+    The method notes the rows it adds with `_note_added`, and changes made
+    by a call from another such method are part of that method's change.
+    Any state the manager memoized is forgotten once the method returns.
+    """
+    @wraps(method)
+    def publishing(self, *args, **kwargs):
+        if self._added is not None or not self.events.subscribers:
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self._checked_state = None
+        previous_version = self.version
+        last_start = self._last_stored_start()
+        self._added = []
+        try:
+            result = method(self, *args, **kwargs)
+        except BaseException:
+            self._added = None
+            self._checked_state = None
+            self._publish_change(previous_version, last_start, None)
+            raise
+        added, self._added = self._added, None
+        self._checked_state = None
+        self._publish_change(previous_version, last_start, added)
+        return result
+    return publishing
+
+class DataBackend:
+    """Interface of the data managers for each storage backend
+
+    `Project` and `CacheManager` only use the data through the methods
+    here. Backends that keep all their dates in one place just need to
+    provide `_load` (every stored date, in time order, as a `DateStore`),
+    `_insert` (store sorted rows) and `version`, and the rest is done on
+    the loaded dates. Backends with a better way to do the rest (reading
+    only a range, or only what was appended) override it.
+
+    Tag names are interned in a small dictionary file in the data
+    directory, and dates only store their tag's integer ID.
+
+    Changes to the dates are published on `events` (see `events.py`).
+    """
+
+    # file (in the data directory) of the interned tag names
+    TAGS_FILENAME = 'tags.json'
+
+    def __init__(self, config, path):
+        self.config = config
+        self.path = path
+        self.tags_path = (None if path is None
+                          else os.path.join(path, self.TAGS_FILENAME))
+        self._tag_names = None
+        self._loaded = None
+        self._loaded_version = None
+        self.events = EventBus()
+        self._added = None
+        self._followed_version = None
+        # (stamp, state) for backends that memoize state read from files
+        self._checked_state = None
+
+    @property
+    def tag_names(self):
+        """The interned tag names, in order of their IDs (from 1)"""
+        if self._tag_names is None:
+            self._tag_names = []
+            if self.tags_path is not None:
+                try:
+                    with open(self.tags_path, 'r') as tags_file:
+                        self._tag_names = json.load(tags_file)
+                        registry.count(Metric.bytes_read, tags_file.tell())
+                except FileNotFoundError:
+                    pass
+        return self._tag_names
+
+    def tag_id(self, name, intern=False):
+        """Get the ID of a tag name, or 0 for None
+
+        An unknown name is a KeyError, unless `intern`, in which case it's
+        given the next ID. The dictionary is then written straight away, so
+        it's on disk before any date with the new ID is.
+        """
+        if name is None:
+            return 0
+        names = self.tag_names
+        if name in names:
+            return names.index(name) + 1
+        if not intern:
+            raise KeyError(name)
+        names.append(name)
+        if self.tags_path is not None:
+            write_atomically(self.tags_path, json.dumps(names))
+        return len(names)
+
+    def tag_name(self, tag):
+        """Get the name of a tag ID, or None for 0"""
+        if not tag:
+            return None
+        return self.tag_names[tag - 1]
+
+    @property
+    def version(self):
+        """An identifier for the current state of the data
+
+        Changes whenever the stored dates do, so derived data such as a
+        `Rollup` can be cached against it.
+        """
+        raise NotImplementedError
+
+    def stamp(self, previous=None):
+        """A cheap identifier of the data's state, to check a cached value by
+
+        Takes constant time however much data there is, so `Project` can
+        check the last frame it keeps in the cache on every start, stop
+        and finish. `previous` is a stamp taken before, which a backend
+        can use as a hint. Defaults to `version`.
+        """
+        return self.version
+
+    @property
+    def watch_paths(self):
+        """The directories with the files the dates are stored in"""
+        return [self.path]
+
+    def _load(self):
+        """Load every stored date, in time order, into a `DateStore`"""
+        raise NotImplementedError
+
+    def _insert(self, rows):
+        """Store new (start, offset, end, end_offset, tag) rows
+
+        They're sorted, but can start before the last stored date.
+        """
+        raise NotImplementedError
+
+    def _last_stored_start(self):
+        """Get the start timestamp of the last stored date, or None"""
+        store = self.date_list
+        return store.starts[-1] if len(store) else None
+
+    def _note_added(self, rows):
+        """Note rows stored by a method publishing its change"""
+        if self._added is not None:
+            self._added.extend(rows)
+
+    def _publish_change(self, previous_version, last_start, added):
+        """Publish the change from `previous_version` to the current data
+
+        Rows `added` (None if not known) that all start at or after
+        `last_start` make it an append, and anything else a rewrite.
+        """
+        version = self.version
+        if version == previous_version:
+            return
+        if added and (last_start is None or min(added)[0] >= last_start):
+            event = DataEvent(Change.appended,
+                              DateStore.from_rows(sorted(added)),
+                              previous_version, version)
+        else:
+            event = DataEvent(Change.rewrite, None, previous_version, version)
+        self.events.publish(event)
+
+    @publishes_change
+    def add_date(self, date):
+        """Store a new DatePoint"""
+        rows = list(DateStore([date]).rows())
+        self._insert(rows)
+        self._note_added(rows)
+
+    @publishes_change
+    def add_dates(self, dates):
+        """Add many DatePoints at once, skipping ones already stored
+
+        Dates already stored (or repeated in `dates`), with any tag, are
+        skipped. Returns how many dates were added and how many skipped.
+        """
+        store = DateStore(dates)
+        stored = {row[:4] for row in self.iter_columns()}
+        new_rows = []
+        for row in sorted(set(store.rows())):
+            if row[:4] not in stored:
+                stored.add(row[:4])
+                new_rows.append(row)
+        if new_rows:
+            self._insert(new_rows)
+            self._note_added(new_rows)
+        return len(new_rows), len(store) - len(new_rows)
+
+    @property
+    def date_list(self):
+        """Get every stored date as a `DateStore`, loaded once per version"""
+        version = self.version
+        if self._loaded_version != version:
+            self._loaded = self._load()
+            self._loaded_version = version
+        return self._loaded
+
+    @property
+    def dates(self):
+        """Get all the stored dates, indexed the same as `date_list`"""
+        return self.date_list
+
+    def dates_between(self, start=None, end=None):
+        """Get the dates starting between two DatePoints as a `DateStore`
+
+        Either bound can be None to leave that side open.
+        """
+        store = self.date_list
+        low = 0 if start is None else bisect.bisect_left(
+            store.starts, DatePoint(start)._start)
+        high = len(store) if end is None else bisect.bisect_right(
+            store.starts, DatePoint(end)._start)
+        return store.sliced(low, max(low, high))
+
+    def iter_rows(self):
+        """Yield every stored date as a (start, offset, end) tuple"""
+        for columns in self.iter_columns():
+            yield columns[:3]
+
+    def iter_columns(self):
+        """Yield every stored date as a full `DateStore` row"""
+        return self.date_list.rows()
+
+    def follow(self, reset=False):
+        """Get the rows appended since the last call, and the data version
+
+        See `DataManager.follow`. Here the rows are always None, so derived
+        data is reloaded whenever the data changes, and a change since the
+        last call is published as a rewrite.
+        """
+        version = self.version
+        previous_version, self._followed_version = (self._followed_version,
+                                                    version)
+        if not reset and previous_version not in (None, version):
+            self.events.publish(DataEvent(Change.rewrite, None,
+                                          previous_version, version))
+        return None, version
+
+    def build_rollup(self, version=None):
+        """Build the `Rollup` of all the data"""
+        return Rollup.build(self.date_list, version)
+
+    def merge(self, sources):
+        """Merge other data logs into this one (only csv data supports it)"""
+        raise ValueError("{} data can't be merged into, only csv".format(
+            self.default()['backend']))
+
+    def archive(self, before=None):
+        """Archive old dates (only csv data supports it)"""
+        raise ValueError("{} data can't be archived, only csv".format(
+            self.default()['backend']))
+
+    def save(self):
+        """Persist any data that may have changed during runtime
+
+        The dates themselves are persisted as they're added.
+        """
+        pass
+
+class DataManager(DataBackend):
+    """Wraps the mechanism for persisting and querying work dates and times
+
+    The main features of this program rely on storage of dates and times during
+    which personal project work has take place. The actual mechanism for
+    storing this data is abstracted from the rest of the program. Here it is
+    a set of `csv` files, one per month, with 'frozen' DatePoints stored in
+    them.
+
+    Each month's partition has an entry in the partition manifest with its
+    zone map (first and last start timestamps), row count, total time and
+    `Rollup`. Entries are refreshed when their file changes, so appending
+    only ever reparses the current month, and queries over a date range
+    only open the partitions it overlaps. Rows in the single data file of
+    older versions are moved into partitions on first use.
+
+    Files of at least `parallel_threshold` bytes are parsed in chunks by a
+    pool of worker processes, one chunk per worker.
+
+    Closed years can be moved out of the partitions into gzipped archive
+    segments (see `archive`). The archive's manifest stores each segment's
+    `Rollup` too, and a segment is only decompressed when its individual
+    dates are needed.
+
+    Dates added before the end of their partition (e.g. a forgotten session
+    recorded later) don't make it rewrite the partition. They go into the
+    partition's small, sorted overflow file instead, which is merged in
+    whenever the partition is read, and which is folded into the partition
+    (see `compact`) once it reaches `OVERFLOW_LIMIT` rows.
+    """
+
+    # default size in bytes above which a data file is parsed in parallel
+    PARALLEL_THRESHOLD = 16 * 2 ** 20
+    # directory (in the data directory) for archive segments
+    ARCHIVE_DIRNAME = 'archive'
+    # directory (in the data directory) for the monthly partitions
+    PARTITION_DIRNAME = 'partitions'
+    # file in the archive directory describing its segments
+    MANIFEST_FILENAME = 'manifest.json'
+    # file (in the data directory) summarising the partitions, kept out of
+    # the partition directory so refreshing it doesn't change the
+    # directory (see `stamp`)
+    PARTITION_MANIFEST_FILENAME = 'partitions.json'
+    # suffix added to a partition's name for its overflow file
+    OVERFLOW_SUFFIX = '.overflow'
+    # rows an overflow file can have before it's folded into its partition
+    OVERFLOW_LIMIT = 256
+    # file (in the archive directory) with just the manifest's
+    # `archived_before`, so adding a date needn't read the whole manifest
+    ARCHIVED_BEFORE_FILENAME = 'archived_before'
+
+    def __init__(self, config, path, data_file, parallel_threshold=None,
+                 workers=None, auto_archive=True):
+        super().__init__(config, path)
+        self.data_filepath = os.path.join(path, data_file)
+        self.archive_path = os.path.join(path, self.ARCHIVE_DIRNAME)
+        self.manifest_path = os.path.join(self.archive_path,
+                                          self.MANIFEST_FILENAME)
+        self.archived_before_path = os.path.join(
+            self.archive_path, self.ARCHIVED_BEFORE_FILENAME)
+        self.partition_path = os.path.join(path, self.PARTITION_DIRNAME)
+        self.partition_manifest_path = os.path.join(
+            path, self.PARTITION_MANIFEST_FILENAME)
+        self.auto_archive = auto_archive
+        self._manifest = None
+        self._segments = {}
+        self._partition_manifest = None
+        self._partition_manifest_modified = False
+        self._partitions = {}
+        self._migrated = False
+        self._tail = None
+        self._full_list = None
+        self._full_version = None
+        self._hot_list = None
+        self._hot_version = None
+        if parallel_threshold is None:
+            parallel_threshold = self.PARALLEL_THRESHOLD
+        self.parallel_threshold = parallel_threshold
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.workers = workers
+
+    @classmethod
+    def default(cls):
+        """Return the default init arguments to be passed in by Config"""
+        return {'backend': Backend.csv, 'data_file': 'data.csv'}
+
+    @classmethod
+    def setup(cls, path, data_file, **kwargs):
+        """Perform the necessary initial setup for the data
+
+        Makes the (legacy) data file and the partition directory
+        """
+        data_filepath = os.path.join(path, data_file)
+        if not os.path.isfile(data_filepath):
+            with open(data_filepath, 'w'):
+                pass
+        os.makedirs(os.path.join(path, cls.PARTITION_DIRNAME), exist_ok=True)
+
+    @property
+    def watch_paths(self):
+        return [os.path.dirname(self.data_filepath), self.partition_path,
+                self.archive_path]
+
+    @classmethod
+    def partition_name(cls, start, offset):
+        """Get the name of the partition for a start timestamp and offset"""
+        year, month, _ = civil_from_days((start // 1000000 + offset) // 86400)
+        return '{:04d}-{:02d}.csv'.format(year, month)
+
+    def _last_stored_start(self):
+        names = self.partition_names()
+        if names:
+            last_start = self._last_start(
+                os.path.join(self.partition_path, names[-1]))
+            if last_start != -2 ** 63:
+                return last_start
+        segments = self.manifest['segments']
+        return segments[-1]['last'] if segments else None
+
+    @publishes_change
+    def add_date(self, date):
+        """Append a new DatePoint to its month's partition
+
+        If the partitions start in a year that's over, it's archived first.
+        A date in a year that's archived already is merged into its segment
+        by `add_dates` (so isn't added if it's stored already).
+        """
+        self._archive_closed_years()
+        if self._target(date._start, date._offset).endswith('.gz'):
+            self.add_dates([date])
+            return
+        os.makedirs(self.partition_path, exist_ok=True)
+        name = self.partition_name(date._start, date._offset)
+        partition_path = os.path.join(self.partition_path, name)
+        rows = list(DateStore([date]).rows())
+        if date._start < self._last_start(partition_path):
+            self._add_overflow(name, rows)
+            self._note_added(rows)
+            return
+        with open(partition_path, 'a', newline='') as writef:
+            writer = csv.writer(writef)
+            start = writef.tell()
+            writer.writerow([date.freeze()])
+            registry.count(Metric.bytes_written, writef.tell() - start)
+            fsync_file(writef)
+        self._note_added(rows)
+
+    @publishes_change
+    def add_dates(self, dates):
+        """Add many DatePoints at once, skipping ones already stored
+
+        The dates are sorted and grouped by partition, and each partition
+        gets all of its new dates in a single write. New dates before the
+        end of a partition go into its overflow instead, and dates in months
+        that were already archived are merged into their year's segment.
+        Dates already stored (or repeated in `dates`), with any tag, are
+        skipped. Returns how many dates were added and how many skipped.
+        """
+        store = DateStore(dates)
+        rows = sorted(set(store.rows()))
+        if not rows:
+            return 0, 0
+        self._archive_closed_years()
+        segments = {segment['name']: segment
+                    for segment in self.manifest['segments']}
+        segments_changed = False
+        os.makedirs(self.partition_path, exist_ok=True)
+        added = 0
+        targets = sorted((self._target(*row[:2]), row) for row in rows)
+        for name, group in groupby(targets, key=lambda item: item[0]):
+            is_segment = name.endswith('.gz')
+            path = os.path.join(self.partition_path, name)
+            if is_segment:
+                existing = (self.load_segment(name) if name in segments
+                            else DateStore())
+            else:
+                existing = (self.load_partition(name) if os.path.isfile(path)
+                            else DateStore())
+            # the same times are the same date, whatever the tag
+            stored = {row[:4] for row in existing.rows()}
+            new_rows = []
+            for _, row in group:
+                if row[:4] not in stored:
+                    stored.add(row[:4])
+                    new_rows.append(row)
+            if not new_rows:
+                continue
+            added += len(new_rows)
+            self._note_added(new_rows)
+            if is_segment:
+                merged = DateStore.from_rows(heapq.merge(
+                    existing.rows(), new_rows, key=lambda row: row[0]))
+                self._write_segment(segments, name, merged)
+                segments_changed = True
+                continue
+            last_start = max(existing.starts, default=new_rows[0][0])
+            split = bisect.bisect_left([row[0] for row in new_rows], last_start)
+            if split:
+                self._add_overflow(name, new_rows[:split])
+            if split < len(new_rows):
+                text = frozen_lines(DateStore.from_rows(new_rows[split:]))
+                with open(path, 'a', newline='') as partition_file:
+                    partition_file.write(text)
+                    fsync_file(partition_file)
+                registry.count(Metric.bytes_written, len(text))
+        if segments_changed:
+            self._write_manifest(segments)
+        return added, len(store) - added
+
+    @publishes_change
+    def merge(self, sources):
+        """Merge other data logs into this one, e.g. from another machine
+
+        Each source is a data file (a partition, an archive segment or the
+        single data file of older versions) or a whole data directory, and
+        tags are matched up by name. Every file is read as a stream and
+        merged with the stored dates in a single pass by `merged_rows`, so
+        this takes linear time and holds only a month (a year, for archived
+        dates) of the result at once. Changed partitions and segments are
+        written to temporary files first and only swapped in once the whole
+        merge has worked, so a file out of time order (a ValueError) leaves
+        the data as it was. The stored dates are kept as they are. Returns
+        how many dates were added, how many of those were cut short around
+        ones with their tag and how many were dropped as repeats or
+        overlaps.
+        """
+        self._archive_closed_years()
+        stored = in_order(self.iter_columns(), 'the data')
+        streams = [stream for source in sources
+                   for stream in self._source_streams(source)]
+        counts = {}
+        segments = {segment['name']: segment
+                    for segment in self.manifest['segments']}
+        stale = set(segments) | set(self.partition_names())
+        merged_names = set()
+        replacements = {}
+        os.makedirs(self.partition_path, exist_ok=True)
+        try:
+            merged = merged_rows(stored, streams, counts)
+            for name, group in groupby(merged,
+                                       key=lambda row: self._target(*row[:2])):
+                rows = list(group)
+                if name in replacements:
+                    # back in a month merged already, from a change of offset
+                    with self._open(replacements[name]) as merged_file:
+                        rows = list(heapq.merge(iter_columns(merged_file),
+                                                rows))
+                elif name in merged_names:
+                    # which was merged without changing it
+                    rows = list(heapq.merge(self._load(name).rows(), rows))
+                self._merge_target(name, rows, segments, replacements)
+                merged_names.add(name)
+                stale.discard(name)
+            for name in stale:
+                self._merge_target(name, [], segments, replacements)
+        except BaseException:
+            for temporary_path in replacements.values():
+                os.remove(temporary_path)
+            raise
+        for name, temporary_path in replacements.items():
+            os.replace(temporary_path, temporary_path[:-len('.merge')])
+            # the merged partition has the overflow's rows already
+            self._remove_overflow(name)
+        for path in (self.archive_path, self.partition_path):
+            if os.path.isdir(path):
+                fsync_directory(path)
+        if any(name.endswith('.gz') for name in replacements):
+            self._write_manifest(segments)
+        return counts['added'], counts['trimmed'], counts['dropped']
+
+    @staticmethod
+    def _open(path):
+        """Open a data file for reading, decompressing segments"""
+        if path.endswith('.gz') or path.endswith('.gz.merge'):
+            return gzip.open(path, 'rt', newline='')
+        return open(path, 'r', newline='')
+
+    def _merge_target(self, name, rows, segments, replacements):
+        """Write the merged rows of a partition or segment if they changed
+
+        They go to a temporary file recorded in `replacements`, and a
+        segment's new entry into `segments` (or out of it, if empty).
+        """
+        is_segment = name.endswith('.gz')
+        path = os.path.join(self.archive_path if is_segment
+                            else self.partition_path, name)
+        existing = self._load(name) if os.path.isfile(path) else None
+        if existing is not None and list(existing.rows()) == rows:
+            return
+        if existing is None and not rows:
+            return
+        store = DateStore.from_rows(rows)
+        contents = frozen_lines(store).encode()
+        if is_segment:
+            os.makedirs(self.archive_path, exist_ok=True)
+            contents = gzip.compress(contents)
+        temporary_path = replacements[name] = path + '.merge'
+        with open(temporary_path, 'wb') as temporary_file:
+            temporary_file.write(contents)
+            fsync_file(temporary_file)
+        registry.count(Metric.bytes_written, len(contents))
+        if is_segment:
+            self._segments[name] = store
+            if rows:
+                segments[name] = self._segment_entry(name, store)
+            else:
+                segments.pop(name, None)
+
+    def _load(self, name):
+        """Load a partition or archive segment by name"""
+        if name.endswith('.gz'):
+            return self.load_segment(name)
+        return self.load_partition(name)
+
+    def _source_streams(self, source):
+        """Get a stream of rows for each data file in a source for `merge`
+
+        The source's tag IDs are mapped to this manager's by name, interning
+        names it doesn't have yet.
+        """
+        directory = source if os.path.isdir(source) else os.path.dirname(source)
+        names = []
+        # a partition or segment is a level below its data directory
+        for tags_directory in (directory, os.path.dirname(directory)):
+            tags_path = os.path.join(tags_directory, self.TAGS_FILENAME)
+            if os.path.isfile(tags_path):
+                with open(tags_path, 'r') as tags_file:
+                    names = json.load(tags_file)
+                break
+        tags = {index: self.tag_id(name, intern=True)
+                for index, name in enumerate(names, 1)}
+        if os.path.isdir(source):
+            paths = self._source_files(source)
+        else:
+            paths = [source]
+        return [self._source_rows(path, tags) for path in paths]
+
+    def _source_files(self, directory):
+        """Get the data files of another data directory, oldest first"""
+        paths = []
+        archived_before = ''
+        archive_path = os.path.join(directory, self.ARCHIVE_DIRNAME)
+        manifest_path = os.path.join(archive_path, self.MANIFEST_FILENAME)
+        if os.path.isfile(manifest_path):
+            with open(manifest_path, 'r') as manifest_file:
+                manifest = json.load(manifest_file)
+            paths.extend(os.path.join(archive_path, segment['name'])
+                         for segment in manifest['segments'])
+            archived_before = manifest.get('archived_before', '')
+        partition_path = os.path.join(directory, self.PARTITION_DIRNAME)
+        if os.path.isdir(partition_path):
+            paths.extend(os.path.join(partition_path, name)
+                         for name in sorted(os.listdir(partition_path))
+                         if name.endswith(('.csv', '.csv' + self.OVERFLOW_SUFFIX))
+                         and name >= archived_before)
+        data_filepath = os.path.join(directory, self.default()['data_file'])
+        if os.path.isfile(data_filepath):
+            paths.append(data_filepath)
+        if not paths:
+            raise ValueError('no data files in {}'.format(directory))
+        return paths
+
+    def _source_rows(self, path, tags):
+        """Stream the rows of a data file, with tags mapped by `tags`"""
+        with self._open(path) as source_file:
+            registry.count(Metric.bytes_read, os.path.getsize(path))
+            for start, offset, end, end_offset, tag in in_order(
+                    iter_columns(source_file), path):
+                yield start, offset, end, end_offset, tags.get(tag, 0)
+
+    def _target(self, start, offset):
+        """Get the partition, or archived segment, a date belongs in"""
+        name = self.partition_name(start, offset)
+        if name < self.archived_before:
+            return '{}.csv.gz'.format(name[:4])
+        return name
+
+    def _archive_closed_years(self):
+        """Archive the partitions if they start in a year that's over
+
+        Once `archived_before` is this year's first partition that's known
+        from it alone, so the partitions are only listed on the first date
+        added in a year. If there's nothing to archive then, the boundary is
+        still moved up to this year. Also brings the archived_before file up
+        to date first, as this is the start of every way of adding dates.
+        """
+        self._mark_archived_before()
+        if not self.auto_archive:
+            return
+        year_start = self._year_start()
+        boundary = self.partition_name(year_start._start, year_start._offset)
+        if self.archived_before >= boundary:
+            return
+        if not self.archive(year_start):
+            os.makedirs(self.archive_path, exist_ok=True)
+            segments = {segment['name']: segment
+                        for segment in self.manifest['segments']}
+            self._write_manifest(segments, boundary)
+
+    @staticmethod
+    def _year_start():
+        """Get the start of the current year, as a DatePoint"""
+        now = DatePoint.now()
+        return DatePoint.from_timestamps(
+            timeframe_start(now.ordinal(Timeframe.year), now._offset,
+                            Timeframe.year), now._offset)
+
+    def partition_names(self):
+        """Get the names of the partition files in time order"""
+        self._migrate()
+        try:
+            names = os.listdir(self.partition_path)
+        except FileNotFoundError:
+            return []
+        archived = self.archived_before
+        return sorted(name for name in names
+                      if name.endswith('.csv') and name >= archived)
+
+    def _partition_stat(self, name):
+        """Get the [size, modification time] of a partition file
+
+        Followed by those of its overflow file, if it has one.
+        """
+        stat = os.stat(os.path.join(self.partition_path, name))
+        try:
+            overflow = os.stat(self._overflow_path(name))
+        except FileNotFoundError:
+            return [stat.st_size, stat.st_mtime_ns]
+        return [stat.st_size, stat.st_mtime_ns,
+                overflow.st_size, overflow.st_mtime_ns]
+
+    @property
+    def version(self):
+        """An identifier for the current state of the data
+
+        Changes whenever a partition or the archive does, so derived data
+        such as a `Rollup` can be cached against it. Made from
+        `_partition_stats`, so asking again (as every cached rollup and
+        report does) takes constant time.
+        """
+        return self._version(self._partition_stats())
+
+    def _partition_stats(self):
+        """Get the `_partition_stat` of every partition, by name in order
+
+        That's a stat of every partition, so it's memoized until the data's
+        `stamp` changes or the manager changes the data itself.
+        """
+        checked = self._checked_state
+        stamp = self.stamp(checked[0] if checked is not None else None)
+        if checked is None or checked[0] != stamp:
+            checked = stamp, {name: self._partition_stat(name)
+                              for name in self.partition_names()}
+            self._checked_state = checked
+        return checked[1]
+
+    def stamp(self, previous=None):
+        """A cheap identifier of the data's state, to check a cached value by
+
+        Rather than every partition, only looks at the partition directory,
+        the newest partition and the archive manifest. Making, replacing or
+        removing a partition or overflow (adding to an overflow included)
+        changes the directory, and dates are appended to the newest
+        partition, so only appending to an older partition is missed.
+        While the directory is unchanged since the `previous` stamp its
+        newest partition is still the newest, so the partitions aren't
+        listed either.
+        """
+        try:
+            directory = os.stat(self.partition_path).st_mtime_ns
+        except FileNotFoundError:
+            directory = None
+        if previous is not None and previous[0] == directory:
+            newest = previous[1]
+        else:
+            names = self.partition_names()
+            newest = names[-1] if names else None
+        stamp = [directory, newest]
+        if newest is not None:
+            stat = os.stat(os.path.join(self.partition_path, newest))
+            stamp += [stat.st_size, stat.st_mtime_ns]
+        if os.path.isfile(self.manifest_path):
+            stamp.append(os.stat(self.manifest_path).st_mtime_ns)
+        return stamp
+
+    def _version(self, stats):
+        """Get the version for the given partition stats"""
+        parts = [':'.join(map(str, [name] + stats[name]))
+                 for name in sorted(stats)]
+        if os.path.isfile(self.manifest_path):
+            stat = os.stat(self.manifest_path)
+            parts.append('{}:{}'.format(stat.st_size, stat.st_mtime_ns))
+        return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+    def follow(self, reset=False):
+        """Get the rows appended to the partitions since the last call
+
+        Returns a `DateStore` of the new rows and the version of the data
+        including them, reading only the new bytes of each partition. On
+        the first call, with `reset`, or after any change other than
+        appending to the newest partitions (e.g. archiving, or adding to an
+        overflow) the rows are None, and derived data should be reloaded at
+        the returned version.
+
+        Changes since the last call (not on the first, or with `reset`) are
+        published on `events`: appended rows as an append, partitions only
+        getting shorter as a truncation and anything else as a rewrite.
+        """
+        names = self.partition_names()
+        stats = {name: self._partition_stat(name) for name in names}
+        version = self._version(stats)
+        if (self._checked_state is not None and
+                self._checked_state[1] != stats):
+            self._checked_state = None
+        tail, self._tail = self._tail, None
+        # anything that changes other than partition sizes means a reset
+        archive_stat = (
+            os.stat(self.manifest_path).st_mtime_ns
+            if os.path.isfile(self.manifest_path) else None,
+            sorted((name, stat[2:]) for name, stat in stats.items()
+                   if len(stat) > 2))
+        if reset or not self._appended_only(tail, stats, archive_stat):
+            self._tail = ({name: stat[0] for name, stat in stats.items()},
+                          archive_stat, version)
+            if not reset and tail is not None and tail[2] != version:
+                truncated = (
+                    tail[1] == archive_stat and
+                    all(name in tail[0] and stats[name][0] <= tail[0][name]
+                        for name in stats) and
+                    any(stats[name][0] < tail[0][name] for name in stats))
+                self.events.publish(DataEvent(
+                    Change.truncation if truncated else Change.rewrite,
+                    None, tail[2], version))
+            return None, version
+        offsets = dict(tail[0])
+        store = DateStore()
+        for name in names:
+            offset = offsets.get(name, 0)
+            if stats[name][0] == offset:
+                continue
+            with open(os.path.join(self.partition_path, name), 'rb') as data_file:
+                data_file.seek(offset)
+                chunk = data_file.read(stats[name][0] - offset)
+            chunk = chunk[:chunk.rfind(b'\n') + 1]
+            registry.count(Metric.bytes_read, len(chunk))
+            offsets[name] = offset + len(chunk)
+            parse_rows(chunk.decode().splitlines(), store)
+        registry.count(Metric.rows_parsed, len(store))
+        self._tail = offsets, archive_stat, version
+        if tail[2] != version:
+            self.events.publish(DataEvent(Change.appended, store, tail[2],
+                                          version))
+        return store, version
+
+    @staticmethod
+    def _appended_only(tail, stats, archive_stat):
+        """Check that partitions only grew at the end since `tail` was taken
+
+        Only the newest partition followed and any newer ones may change.
+        """
+        if tail is None or tail[1] != archive_stat:
+            return False
+        offsets = tail[0]
+        newest = max(offsets, default='')
+        for name, offset in offsets.items():
+            size = stats[name][0] if name in stats else -1
+            if size < offset or name != newest and size != offset:
+                return False
+        return all(name in offsets or name > newest for name in stats)
+
+    @property
+    def date_list(self):
+        """Get the list of DatePoints this manager stores
+
+        Includes every archive segment, which are all loaded for this.
+        """
+        segments = self.manifest['segments']
+        if not segments:
+            return self.hot_list
+        version = self.version
+        if self._full_version != version:
+            self._full_list = DateStore.concatenate(
+                [self.load_segment(segment['name']) for segment in segments]
+                + [self.hot_list])
+            self._full_version = version
+        return self._full_list
+
+    @property
+    def dates(self):
+        """Get all the stored dates as a `SegmentedStore`
+
+        Indexes the same as `date_list`, but only loads archive segments
+        and partitions when dates inside them are accessed.
+        """
+        parts = [(segment['rows'], partial(self.load_segment, segment['name']))
+                 for segment in self.manifest['segments']]
+        for name, stat in self._partition_stats().items():
+            parts.append((self.partition_summary(name, stat)['rows'],
+                          partial(self.load_partition, name)))
+        return SegmentedStore(parts)
+
+    def dates_between(self, start=None, end=None):
+        """Get the dates starting between two DatePoints as a `DateStore`
+
+        Only the segments and partitions whose zone maps overlap the range
+        are opened. Either bound can be None to leave that side open.
+        """
+        low = -2 ** 63 if start is None else DatePoint(start)._start
+        high = 2 ** 63 - 1 if end is None else DatePoint(end)._start
+        stores = [self.load_segment(segment['name'])
+                  for segment in self.manifest['segments']
+                  if segment['first'] <= high and segment['last'] >= low]
+        for name, stat in self._partition_stats().items():
+            summary = self.partition_summary(name, stat)
+            if summary['rows'] and (summary['first'] <= high and
+                                    summary['last'] >= low):
+                stores.append(self.load_partition(name))
+        store = DateStore.concatenate(stores)
+        return store.sliced(bisect.bisect_left(store.starts, low),
+                            bisect.bisect_right(store.starts, high))
+
+    def iter_rows(self):
+        """Yield every stored date as a (start, offset, end) tuple
+
+        Reads the archive segments and then the partitions (merged with
+        their overflows) line by line, without loading any of them, so
+        memory use doesn't grow with the history.
+        """
+        for rows in self._stored_streams(iter_rows):
+            yield from rows
+
+    def iter_columns(self):
+        """Yield every stored date as a full `DateStore` row, like `iter_rows`"""
+        for rows in self._stored_streams(iter_columns):
+            yield from rows
+
+    def _stored_streams(self, parse):
+        """Yield the rows of each segment and partition in turn, parsed by `parse`"""
+        for segment in self.manifest['segments']:
+            with self._open(os.path.join(self.archive_path,
+                                         segment['name'])) as segment_file:
+                yield parse(segment_file)
+        for name in self.partition_names():
+            overflow_path = self._overflow_path(name)
+            with self._open(os.path.join(self.partition_path,
+                                         name)) as partition_file:
+                if not os.path.isfile(overflow_path):
+                    yield parse(partition_file)
+                    continue
+                with self._open(overflow_path) as overflow_file:
+                    yield merge_sorted(parse(partition_file),
+                                       parse(overflow_file))
+
+    def build_rollup(self, version=None):
+        """Build the `Rollup` of all the data
+
+        Archive segments and unchanged partitions contribute the rollups
+        stored in their manifests, so only changed partitions are parsed.
+        """
+        rollups = [Rollup.unfreeze(segment['rollup'])
+                   for segment in self.manifest['segments']]
+        rollups.extend(
+            Rollup.unfreeze(self.partition_summary(name, stat)['rollup'])
+            for name, stat in self._partition_stats().items())
+        return Rollup.concatenate(rollups, version)
+
+    @property
+    def manifest(self):
+        """The archive manifest, describing each archived segment"""
+        if self._manifest is None:
+            try:
+                with open(self.manifest_path, 'r') as manifest_file:
+                    self._manifest = json.load(manifest_file)
+                    registry.count(Metric.bytes_read, manifest_file.tell())
+            except FileNotFoundError:
+                self._manifest = {'segments': []}
+        return self._manifest
+
+    @property
+    def archived_before(self):
+        """The name of the first partition not archived, or ''
+
+        Read from its own small file rather than the manifest, unless the
+        manifest is loaded already or was written after that file (which
+        older versions didn't write, and a crash could leave behind). Adding
+        dates writes the file again then (see `_mark_archived_before`), so
+        reading never writes anything.
+        """
+        if self._manifest is not None:
+            return self._manifest.get('archived_before', '')
+        marked = self._marked_archived_before()
+        if marked is None:
+            return self.manifest.get('archived_before', '')
+        return marked
+
+    def _marked_archived_before(self):
+        """Read the archived_before file
+
+        Returns '' if nothing was archived, or None if the file is missing
+        or older than the manifest.
+        """
+        try:
+            written = os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return ''
+        try:
+            if os.stat(self.archived_before_path).st_mtime_ns < written:
+                return None
+            with open(self.archived_before_path, 'r') as marker_file:
+                archived_before = marker_file.read()
+        except FileNotFoundError:
+            return None
+        registry.count(Metric.bytes_read, len(archived_before))
+        return archived_before
+
+    def _mark_archived_before(self):
+        """Write the archived_before file if it's missing or out of date"""
+        if self._marked_archived_before() is None:
+            write_atomically(self.archived_before_path,
+                             self.manifest.get('archived_before', ''),
+                             durable=False)
+
+    @property
+    def partition_manifest(self):
+        """The partition manifest, a summary of each partition by name"""
+        if self._partition_manifest is None:
+            try:
+                with open(self.partition_manifest_path, 'r') as manifest_file:
+                    self._partition_manifest = json.load(manifest_file)
+                    registry.count(Metric.bytes_read, manifest_file.tell())
+            except (FileNotFoundError, json.decoder.JSONDecodeError):
+                self._partition_manifest = {'partitions': {}}
+        return self._partition_manifest
+
+    def partition_summary(self, name, stat=None):
+        """Get the manifest entry of a partition
+
+        It has the partition's row count, first and last start timestamps,
+        total time (in microseconds) and frozen `Rollup`. It's rebuilt if
+        the file changed since it was made, going by its `stat` (from
+        `_partition_stat`, which is called if it isn't given).
+        """
+        summaries = self.partition_manifest['partitions']
+        if stat is None:
+            stat = self._partition_stat(name)
+        summary = summaries.get(name)
+        if summary is None or summary['stat'] != stat:
+            registry.count(Metric.cache_miss)
+            store = self.load_partition(name)
+            summary = summaries[name] = {
+                'name': name,
+                'stat': stat,
+                'first': min(store.starts, default=0),
+                'last': max(store.starts, default=0),
+                'rows': len(store),
+                'total': store.total_time() // timedelta(microseconds=1),
+                'rollup': Rollup.build(store).freeze(),
+            }
+            self._partition_manifest_modified = True
+        else:
+            registry.count(Metric.cache_hit)
+        return summary
+
+    def load_partition(self, name):
+        """Parse a partition file, or reuse it if it hasn't changed"""
+        stat = self._partition_stat(name)
+        memo = self._partitions.get(name)
+        if memo is not None and memo[0] == stat:
+            registry.count(Metric.memo_hit)
+            return memo[1]
+        registry.count(Metric.memo_miss)
+        store = self.parse_file(os.path.join(self.partition_path, name))
+        if len(stat) > 2:
+            overflow = self.parse_file(self._overflow_path(name))
+            store = DateStore.from_rows(merge_sorted(store.rows(),
+                                                     overflow.rows()))
+        self._partitions[name] = (stat, store)
+        return store
+
+    def _overflow_path(self, name):
+        """Get the path of a partition's overflow file"""
+        return os.path.join(self.partition_path, name + self.OVERFLOW_SUFFIX)
+
+    @staticmethod
+    def _last_start(path):
+        """Get the start of the last date in a data file
+
+        Only reads the end of the file. Returns the lowest timestamp if
+        there are no dates in it.
+        """
+        try:
+            with open(path, 'rb') as data_file:
+                data_file.seek(max(data_file.seek(0, os.SEEK_END) - 512, 0))
+                tail = data_file.read()
+        except FileNotFoundError:
+            return -2 ** 63
+        for line in reversed(tail.splitlines()):
+            columns = DatePoint.unfreeze_columns(line.decode().strip())
+            if columns is not None:
+                return columns[0]
+        return -2 ** 63
+
+    def _add_overflow(self, name, rows):
+        """Add time-ordered rows to a partition's overflow
+
+        The overflow is small, so it's simply rewritten in order. Once it
+        has more than `OVERFLOW_LIMIT` rows it's folded into the partition.
+        """
+        overflow_path = self._overflow_path(name)
+        existing = DateStore()
+        if os.path.isfile(overflow_path):
+            existing = self.parse_file(overflow_path)
+        overflow = DateStore.from_rows(merge_sorted(existing.rows(), rows))
+        write_atomically(overflow_path, frozen_lines(overflow))
+        if len(overflow) > self.OVERFLOW_LIMIT:
+            self.compact([name])
+
+    def _remove_overflow(self, name):
+        """Delete a partition's overflow file, if it has one"""
+        try:
+            os.remove(self._overflow_path(name))
+        except FileNotFoundError:
+            pass
+
+    @publishes_change
+    def compact(self, names=None):
+        """Fold the overflows of some partitions (default all) into them
+
+        Each partition is rewritten in order, and only then is its overflow
+        deleted. Reading a partition drops rows repeated in its overflow, so
+        a crash in between loses nothing. Returns how many partitions were
+        compacted.
+        """
+        if names is None:
+            names = self.partition_names()
+        compacted = 0
+        for name in names:
+            if not os.path.isfile(self._overflow_path(name)):
+                continue
+            store = self.load_partition(name)
+            write_atomically(os.path.join(self.partition_path, name),
+                             frozen_lines(store))
+            self._remove_overflow(name)
+            fsync_directory(self.partition_path)
+            compacted += 1
+        return compacted
+
+    def load_segment(self, name):
+        """Decompress and parse an archive segment"""
+        store = self._segments.get(name)
+        if store is None:
+            registry.count(Metric.memo_miss)
+            segment_path = os.path.join(self.archive_path, name)
+            with gzip.open(segment_path, 'rt', newline='') as segment_file:
+                store = self._segments[name] = parse_rows(segment_file)
+            registry.count(Metric.bytes_read, os.path.getsize(segment_path))
+            registry.count(Metric.rows_parsed, len(store))
+        else:
+            registry.count(Metric.memo_hit)
+        return store
+
+    def _migrate(self):
+        """Move the rows of the legacy single data file into partitions
+
+        Rows a partition (or the archive) already has are skipped, so an
+        interrupted migration can simply be run again. The data file is
+        read with `parse_file`, so a large one is parsed in parallel.
+        """
+        if self._migrated:
+            return
+        self._migrated = True
+        if not os.path.getsize(self.data_filepath):
+            return
+        store = self.parse_file(self.data_filepath)
+        segments = self.manifest['segments']
+        archived = segments[-1]['last'] if segments else -2 ** 63
+        months = {}
+        for row in store.rows():
+            if row[0] > archived:
+                months.setdefault(self.partition_name(*row[:2]),
+                                  []).append(row)
+        os.makedirs(self.partition_path, exist_ok=True)
+        for name, rows in sorted(months.items()):
+            partition_path = os.path.join(self.partition_path, name)
+            existing = DateStore()
+            if os.path.isfile(partition_path):
+                existing = self.parse_file(partition_path)
+            existing = set(existing.rows())
+            new_rows = DateStore.from_rows(row for row in rows
+                                           if row not in existing)
+            with open(partition_path, 'a', newline='') as partition_file:
+                partition_file.write(frozen_lines(new_rows))
+                fsync_file(partition_file)
+        write_atomically(self.data_filepath, '')
+
+    @publishes_change
+    def archive(self, before=None):
+        """Move the partitions before `before` into compressed yearly segments
+
+        Defaults to the start of the current year, and otherwise is rounded
+        down to the start of its month. Each year's dates go into a gzipped
+        segment (merged with one already archived for that year), and the
+        manifest gets the segment's row count, bounds, total time and
+        `Rollup`. Returns how many dates were archived.
+        """
+        if before is None:
+            before = self._year_start()
+        before = DatePoint(before)
+        boundary = self.partition_name(before._start, before._offset)
+        names = [name for name in self.partition_names() if name < boundary]
+        if not names:
+            return 0
+        os.makedirs(self.archive_path, exist_ok=True)
+        segments = {segment['name']: segment
+                    for segment in self.manifest['segments']}
+        archived = 0
+        for year, year_names in groupby(names, key=lambda name: name[:4]):
+            stores = [self.load_partition(name) for name in year_names]
+            archived += sum(len(store) for store in stores)
+            name = '{}.csv.gz'.format(year)
+            if name in segments:
+                stores.insert(0, self.load_segment(name))
+            self._write_segment(segments, name, DateStore.concatenate(stores))
+        self._write_manifest(segments, boundary)
+        # a crash before this leaves the partitions behind, but
+        # `partition_names` ignores the ones before `archived_before`
+        summaries = self.partition_manifest['partitions']
+        for name in names:
+            os.remove(os.path.join(self.partition_path, name))
+            self._remove_overflow(name)
+            self._partitions.pop(name, None)
+            summaries.pop(name, None)
+        self._partition_manifest_modified = True
+        return archived
+
+    def _write_segment(self, segments, name, store):
+        """Write an archive segment, and its entry into `segments`"""
+        write_atomically(os.path.join(self.archive_path, name),
+                         frozen_lines(store), compress=True)
+        self._segments[name] = store
+        segments[name] = self._segment_entry(name, store)
+
+    @staticmethod
+    def _segment_entry(name, store):
+        """Get the manifest entry for an archive segment"""
+        return {
+            'name': name,
+            'first': store.starts[0],
+            'last': store.starts[-1],
+            'rows': len(store),
+            'total': store.total_time() // timedelta(microseconds=1),
+            'rollup': Rollup.build(store).freeze(),
+        }
+
+    def _write_manifest(self, segments, boundary=''):
+        """Write the archive manifest for a dict of segments by name
+
+        `boundary` is the name of the first partition not archived, if it
+        moved forward.
+        """
+        self._manifest = {
+            'segments': sorted(segments.values(),
+                               key=lambda segment: segment['first']),
+            'archived_before': max(boundary,
+                                   self.manifest.get('archived_before', '')),
+        }
+        write_atomically(self.manifest_path, json.dumps(self._manifest))
+        write_atomically(self.archived_before_path,
+                         self._manifest['archived_before'])
+
+    @property
+    def hot_list(self):
+        """Get the DatePoints in the (unarchived) partitions"""
+        version = self.version
+        if self._hot_version != version:
+            registry.count(Metric.memo_miss)
+            self._hot_list = DateStore.concatenate(
+                [self.load_partition(name) for name in self.partition_names()])
+            self._hot_version = version
+        else:
+            registry.count(Metric.memo_hit)
+        return self._hot_list
+
+    def parse_file(self, filepath):
+        """Parse a csv file of frozen DatePoints into a `DateStore`
+
+        In parallel if it's at least `parallel_threshold` bytes.
+        """
+        size = os.path.getsize(filepath)
+        if size >= self.parallel_threshold and self.workers > 1:
+            store = self._parse_parallel(filepath, size)
+        else:
+            with open(filepath, 'r', newline='') as data_file:
+                store = parse_rows(data_file)
+        registry.count(Metric.bytes_read, size)
+        registry.count(Metric.rows_parsed, len(store))
+        return store
+
+    def _parse_parallel(self, filepath, size):
+        """Parse a file in newline-aligned chunks across processes
+
+        The chunks' stores are concatenated in file order.
+        """
+        chunks = chunk_offsets(filepath, size, self.workers)
+        with ProcessPoolExecutor(max_workers=len(chunks)) as executor:
+            stores = executor.map(parse_chunk, [filepath] * len(chunks),
+                                  *zip(*chunks))
+            return DateStore.concatenate(stores)
+
+    def save(self):
+        """Persist any data that may have changed during runtime
+
+        The dates themselves are persisted as they're added, so this only
+        writes the partition manifest if any summaries were refreshed. The
+        summaries can always be rebuilt, so that write isn't synced.
+        """
+        if self._partition_manifest_modified:
+            write_atomically(self.partition_manifest_path,
+                             json.dumps(self._partition_manifest),
+                             durable=False)
+            self._partition_manifest_modified = False
+
+class BinaryDataManager(DataBackend):
+    """Stores the dates in a single file of fixed-size binary records
+
+    Each date is its `DateStore` row packed into a `RECORD`, in time order,
+    so loading is one read and an unpack with no text parsing, and adding
+    a date appends one record. A date added before the last one rewrites
+    the file (atomically) with it in place. Otherwise the file only grows
+    at the end, so `follow` reads just the new records.
+    """
+
+    # layout of a record: start, offset, end, end offset and tag
+    RECORD = struct.Struct('<qiqii')
+
+    def __init__(self, config, path, data_file):
+        super().__init__(config, path)
+        self.data_filepath = os.path.join(path, data_file)
+        self._tail = None
+
+    @classmethod
+    def default(cls):
+        """Return the default init arguments to be passed in by Config"""
+        return {'backend': Backend.binary, 'data_file': 'data.bin'}
+
+    @classmethod
+    def setup(cls, path, data_file, **kwargs):
+        """Make the empty data file"""
+        data_filepath = os.path.join(path, data_file)
+        if not os.path.isfile(data_filepath):
+            with open(data_filepath, 'wb'):
+                pass
+
+    @property
+    def version(self):
+        return self._version(os.stat(self.data_filepath))
+
+    @staticmethod
+    def _version(stat):
+        """Get the version for a stat of the data file"""
+        return '{}:{}:{}'.format(stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def _read(self, offset=0, end=None):
+        """Unpack the whole records between two byte offsets of the file"""
+        with open(self.data_filepath, 'rb') as data_file:
+            data_file.seek(offset)
+            contents = data_file.read(-1 if end is None else end - offset)
+        contents = contents[:len(contents) - len(contents) % self.RECORD.size]
+        registry.count(Metric.bytes_read, len(contents))
+        store = DateStore.from_rows(self.RECORD.iter_unpack(contents))
+        registry.count(Metric.rows_parsed, len(store))
+        return store
+
+    def _load(self):
+        return self._read()
+
+    def _last_stored_start(self):
+        return self._last_start()
+
+    def _last_start(self):
+        """Get the start of the last stored date, or None if there are none"""
+        with open(self.data_filepath, 'rb') as data_file:
+            size = data_file.seek(0, os.SEEK_END)
+            if size < self.RECORD.size:
+                return None
+            data_file.seek(size - size % self.RECORD.size - self.RECORD.size)
+            return self.RECORD.unpack(data_file.read(self.RECORD.size))[0]
+
+    def _insert(self, rows):
+        last_start = self._last_start()
+        if last_start is not None and rows[0][0] < last_start:
+            rows = heapq.merge(self._load().rows(), rows,
+                               key=lambda row: row[0])
+            contents = b''.join(self.RECORD.pack(*row) for row in rows)
+            write_atomically(self.data_filepath, contents)
+            return
+        contents = b''.join(self.RECORD.pack(*row) for row in rows)
+        with open(self.data_filepath, 'ab') as data_file:
+            data_file.write(contents)
+            fsync_file(data_file)
+        registry.count(Metric.bytes_written, len(contents))
+
+    def follow(self, reset=False):
+        """Get the records appended since the last call, and the data version
+
+        The records are a `DateStore`, or None on the first call, with
+        `reset`, or if the file was rewritten since. Changes since the last
+        call are published on `events`, as for `DataManager.follow`.
+        """
+        stat = os.stat(self.data_filepath)
+        size = stat.st_size - stat.st_size % self.RECORD.size
+        version = self._version(stat)
+        tail, self._tail = self._tail, (stat.st_ino, size, version)
+        if reset or tail is None:
+            return None, version
+        if tail[0] != stat.st_ino or size < tail[1]:
+            if tail[2] != version:
+                self.events.publish(DataEvent(
+                    Change.truncation if tail[0] == stat.st_ino
+                    else Change.rewrite, None, tail[2], version))
+            return None, version
+        store = self._read(tail[1], size)
+        if tail[2] != version:
+            self.events.publish(DataEvent(Change.appended, store, tail[2],
+                                          version))
+        return store, version
+
+class SqliteDataManager(DataBackend):
+    """Stores the dates in an SQLite database, one table row per date
+
+    The table is indexed by start time, so range queries only read the rows
+    in the range, dates added out of order don't rewrite anything, and the
+    rows are streamed in time order without loading them all at once.
+    """
+
+    # the table of dates, created when the database is first opened
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS dates (
+            start_time INTEGER NOT NULL,
+            start_offset INTEGER NOT NULL,
+            end_time INTEGER NOT NULL,
+            end_offset INTEGER NOT NULL,
+            tag INTEGER NOT NULL DEFAULT 0);
+        CREATE INDEX IF NOT EXISTS dates_start ON dates (start_time);
+    '''
+    # query for the rows of the dates, to be followed by an ORDER BY
+    SELECT = ('SELECT start_time, start_offset, end_time, end_offset, tag '
+              'FROM dates ')
+
+    def __init__(self, config, path, data_file):
+        super().__init__(config, path)
+        self.data_filepath = os.path.join(path, data_file)
+        self._connection = None
+
+    @classmethod
+    def default(cls):
+        """Return the default init arguments to be passed in by Config"""
+        return {'backend': Backend.sqlite, 'data_file': 'data.sqlite3'}
+
+    @classmethod
+    def setup(cls, path, data_file, **kwargs):
+        """Make the database and its table"""
+        connection = sqlite3.connect(os.path.join(path, data_file))
+        connection.executescript(cls.SCHEMA)
+        connection.close()
+
+    @property
+    def connection(self):
+        """The connection to the database, opened on first use"""
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.data_filepath)
+            self._connection.executescript(self.SCHEMA)
+        return self._connection
+
+    @property
+    def version(self):
+        """An identifier for the current state of the data
+
+        The database's file change counter, which every committed write
+        increments.
+        """
+        with open(self.data_filepath, 'rb') as data_file:
+            header = data_file.read(28)
+        return '{}:{}'.format(os.stat(self.data_filepath).st_ino,
+                              int.from_bytes(header[24:28], 'big'))
+
+    def _load(self):
+        store = DateStore.from_rows(self.iter_columns())
+        registry.count(Metric.rows_parsed, len(store))
+        return store
+
+    def _insert(self, rows):
+        with self.connection:
+            self.connection.executemany(
+                'INSERT INTO dates VALUES (?, ?, ?, ?, ?)', rows)
+
+    def iter_columns(self):
+        return self.connection.execute(
+            self.SELECT + 'ORDER BY start_time, rowid')
+
+    def _last_stored_start(self):
+        return self.connection.execute(
+            'SELECT MAX(start_time) FROM dates').fetchone()[0]
+
+    def dates_between(self, start=None, end=None):
+        """Get the dates starting between two DatePoints as a `DateStore`
+
+        Only reads the rows in the range, through the start time index.
+        Either bound can be None to leave that side open.
+        """
+        low = -2 ** 63 if start is None else DatePoint(start)._start
+        high = 2 ** 63 - 1 if end is None else DatePoint(end)._start
+        return DateStore.from_rows(self.connection.execute(
+            self.SELECT + 'WHERE start_time BETWEEN ? AND ? '
+            'ORDER BY start_time, rowid', (low, high)))
+
+class MemoryDataManager(DataBackend):
+    """Keeps the dates in memory only, e.g. for tests and benchmarks
+
+    Nothing is written anywhere, tag names included, so every instance
+    starts out empty. Versions include an ID unique to the instance, so a
+    rollup cached for another one never matches.
+    """
+
+    def __init__(self, config, path=None, **kwargs):
+        super().__init__(config, None)
+        self._store = DateStore()
+        self._changes = 0
+        self._identity = uuid.uuid4().hex
+
+    @classmethod
+    def default(cls):
+        """Return the default init arguments to be passed in by Config"""
+        return {'backend': Backend.memory}
+
+    @classmethod
+    def setup(cls, **kwargs):
+        """There's nothing to set up"""
+        pass
+
+    @property
+    def version(self):
+        return '{}:{}'.format(self._identity, self._changes)
+
+    @property
+    def watch_paths(self):
+        return []
+
+    def _load(self):
+        return self._store
+
+    def _insert(self, rows):
+        store = self._store
+        if len(store) and rows[0][0] < store.starts[-1]:
+            self._store = DateStore.from_rows(heapq.merge(
+                store.rows(), rows, key=lambda row: row[0]))
+        else:
+            for row in rows:
+                store.append_columns(*row)
+        self._changes += 1
+
+class Backend:
+    """Enum for the storage backends a data config can name"""
+    csv = 'csv' # monthly csv partitions and archive segments (the default)
+    binary = 'binary' # one file of fixed-size binary records
+    sqlite = 'sqlite' # an SQLite database
+    memory = 'memory' # nothing persisted, for tests and benchmarks
+
+    @classmethod
+    def backends(cls):
+        return [attribute for attribute in dir(cls)
+                if not attribute.startswith('__') and attribute != 'backends']
+
+# the data manager class for each storage backend
+DATA_BACKENDS = {
+    Backend.csv: DataManager,
+    Backend.binary: BinaryDataManager,
+    Backend.sqlite: SqliteDataManager,
+    Backend.memory: MemoryDataManager,
+}
+
+def data_manager_class(backend=None):
+    """Get the data manager class of a backend name, by default csv's"""
+    if backend is None:
+        backend = Backend.csv
+    try:
+        return DATA_BACKENDS[backend]
+    except KeyError:
+        raise ValueError('Unknown storage backend {!r}'.format(backend))
+
+def data_manager(config, data_config):
+    """Make the data manager for a data config, of the backend it names
+
+    Configs from before there were backends don't name one, and are csv.
+    """
+    arguments = dict(data_config)
+    backend = arguments.pop('backend', None)
+    return data_manager_class(backend)(config, **arguments)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""Benchmarks for the storage and query paths of the tracker
+
+Each benchmark runs against synthetic data in a temporary directory, so it
+never touches a real config location. Run `benchmark.py --help` for the
+list of benchmarks.
+"""
+import datetime
+import os
+import random
+import tempfile
+import time
+
+import click
+
+from backends import Backend, DataManager, data_manager, data_manager_class
+from date_point import DatePoint
+
+def synthetic_rows(count, seed=0, year=2000):
+    """Yield `count` time-ordered frozen ranges, a few per day"""
+    generator = random.Random(seed)
+    timezone = datetime.timezone(datetime.timedelta(hours=2))
+    moment = datetime.datetime(year, 1, 1, 8, tzinfo=timezone)
+    for _ in range(count):
+        moment += datetime.timedelta(minutes=generator.randint(30, 600),
+                                     microseconds=generator.randint(0, 999999))
+        end = moment + datetime.timedelta(minutes=generator.randint(5, 120))
+        yield DatePoint(moment, end).freeze()
+        moment = end
+
+# about how many rows `synthetic_rows` makes per year
+ROWS_PER_YEAR = 1300
+
+def write_data(path, rows, filename='data.csv'):
+    """Write a synthetic data file of `rows` rows into a directory"""
+    with open(os.path.join(path, filename), 'w') as data_file:
+        data_file.writelines(row + '\n' for row in synthetic_rows(rows))
+
+def timed(function, repeat=1):
+    """Get the best wall-clock time of running a function, and its result"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+@click.group()
+def cli():
+    """Benchmarks for the tracker's storage and query paths"""
+
+
+@cli.command(short_help='serial vs parallel parsing of the data file')
+@click.option('--rows', '-n', default=1000000, help='rows of synthetic data')
+@click.option('--workers', '-w', default=None, type=click.INT,
+              help='worker processes (defaults to the CPU count)')
+@click.option('--repeat', default=3, help='runs per measurement')
+def load(rows, workers, repeat):
+    """Time a cold load of a data file serially and in parallel chunks
+
+    That's the parse of the legacy single data file that moving its rows
+    into partitions does (partitions are far too small to be parallel).
+    """
+    with tempfile.TemporaryDirectory() as path:
+        write_data(path, rows)
+        size = os.path.getsize(os.path.join(path, 'data.csv'))
+
+        def load_with(threshold):
+            manager = DataManager(None, path, 'data.csv',
+                                  parallel_threshold=threshold,
+                                  workers=workers)
+            return manager.parse_file(os.path.join(path, 'data.csv'))
+
+        serial, serial_store = timed(lambda: load_with(float('inf')), repeat)
+        parallel, parallel_store = timed(lambda: load_with(0), repeat)
+        assert serial_store.starts == parallel_store.starts
+        assert serial_store.ends == parallel_store.ends
+        click.echo('{} rows, {:.1f} MB, {} workers'.format(
+            rows, size / 2 ** 20, workers or os.cpu_count()))
+        click.echo('serial:   {:.3f}s'.format(serial))
+        click.echo('parallel: {:.3f}s'.format(parallel))
+        click.echo('speedup:  {:.2f}x'.format(serial / parallel))
+
+
+@cli.command(short_help='load, append, range and aggregate per backend')
+@click.option('--rows', '-n', default=50000, help='rows of synthetic data')
+@click.option('--appends', default=100, help='dates to append one by one')
+@click.option('--repeat', default=3, help='runs per measurement')
+@click.argument('backends', nargs=-1, type=click.Choice(Backend.backends()))
+def backends(rows, appends, repeat, backends):
+    """Time each storage backend on the same synthetic data
+
+    For every backend: a cold load of all the dates, appending dates of
+    this year one at a time (after one untimed append, on which csv data
+    archives the closed years), a cold query of a month in the middle and a
+    cold build of the rollup. Cold means from a new data manager, as each
+    command starts with. The memory backend has nothing to reopen, so it's
+    timed warm.
+
+    The data starts early enough to end before this year, for up to about
+    60000 rows (it doesn't start before 1971).
+    """
+    year = DatePoint.now().datetime_date.year
+    first_year = max(1971, year - rows // ROWS_PER_YEAR - 1)
+    dates = [DatePoint.unfreeze(row)
+             for row in synthetic_rows(rows, year=first_year)]
+    new_dates = [DatePoint.unfreeze(row)
+                 for row in synthetic_rows(appends + 1, year=year)]
+    middle = dates[rows // 2]
+    month_end = DatePoint.from_timestamps(middle._start + 30 * 86400 * 10 ** 6,
+                                          middle._offset)
+    header = ['backend', 'load', 'append', 'range', 'aggregate']
+    click.echo('{} rows, seconds (append: per date)'.format(rows))
+    click.echo(' '.join('{:>10}'.format(column) for column in header))
+    for backend in backends or Backend.backends():
+        with tempfile.TemporaryDirectory() as path:
+            manager_class = data_manager_class(backend)
+            arguments = dict(manager_class.default(), path=path)
+            manager_class.setup(**arguments)
+            manager = data_manager(None, arguments)
+            manager.add_dates(dates)
+            manager.add_date(new_dates[0])
+
+            def reopened():
+                if backend == Backend.memory:
+                    return manager
+                return data_manager(None, arguments)
+
+            load, _ = timed(lambda: len(reopened().date_list), repeat)
+            append, _ = timed(lambda: [manager.add_date(date)
+                                       for date in new_dates[1:]])
+            query, _ = timed(
+                lambda: reopened().dates_between(middle, month_end), repeat)
+            aggregate, _ = timed(lambda: reopened().build_rollup(), repeat)
+            row = [backend] + ['{:.4f}'.format(seconds) for seconds in
+                               (load, append / max(appends, 1), query,
+                                aggregate)]
+            click.echo(' '.join('{:>10}'.format(column) for column in row))
+
+
+if __name__ == '__main__':
+    cli()
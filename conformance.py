@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""Conformance checks for the storage backends
+
+Every backend (see `backends.Backend`) has to behave the same through the
+`DataBackend` interface `Project` uses: dates come back in time order
+whatever order they were added in, repeats are skipped, the version
+changes exactly when the data does, and so on. Each check runs against a
+fresh data directory per backend. Run `conformance.py` to check them all,
+or name the backends to check.
+"""
+import atexit
+import os
+import tempfile
+import traceback
+
+import click
+
+from backends import Backend, data_manager, data_manager_class
+from benchmark import synthetic_rows
+from controller import Project
+from data import CacheManager, ConfigLocations, ConfigManager
+from date_point import DatePoint, DateStore, Timeframe
+from filters import Filter
+from project import times_report
+from rollup import Rollup
+
+# the checks to run, in order, as (name, function) pairs
+CHECKS = []
+
+def check(function):
+    """Add a function taking a data manager and a way to reopen it to CHECKS"""
+    CHECKS.append((function.__name__, function))
+    return function
+
+def open_manager(backend, path):
+    """Set up a data directory for a backend, and make its data manager"""
+    manager_class = data_manager_class(backend)
+    arguments = dict(manager_class.default(), path=path)
+    manager_class.setup(**arguments)
+    return data_manager(None, arguments)
+
+def sample_dates(count, seed=0, year=2000):
+    """Get `count` time-ordered DatePoints, with every 10th one a point
+
+    They start in `year`, by default one long over (so csv data archives
+    them).
+    """
+    dates = []
+    for index, frozen in enumerate(synthetic_rows(count, seed, year)):
+        date = DatePoint.unfreeze(frozen)
+        if index % 10 == 9:
+            date = DatePoint.from_timestamps(date._start, date._offset)
+        dates.append(date)
+    return dates
+
+def rows_of(dates):
+    """Get the `DateStore` rows of some DatePoints"""
+    return list(DateStore(dates).rows())
+
+def expect(actual, expected, what):
+    if actual != expected:
+        raise AssertionError('{}: expected {!r}, got {!r}'.format(
+            what, expected, actual))
+
+@check
+def starts_empty(manager, reopen):
+    expect(len(manager.date_list), 0, 'dates stored')
+    expect(list(manager.iter_columns()), [], 'rows')
+    expect(len(manager.dates_between()), 0, 'dates in range')
+    expect(manager.build_rollup().rows, 0, 'rollup rows')
+
+@check
+def adds_in_order(manager, reopen):
+    dates = sample_dates(50)
+    for date in dates:
+        manager.add_date(date)
+    expect(list(manager.date_list.rows()), rows_of(dates), 'date_list')
+    expect(list(manager.iter_columns()), rows_of(dates), 'iter_columns')
+    expect([row[:3] for row in rows_of(dates)], list(manager.iter_rows()),
+           'iter_rows')
+    expect(list(manager.dates), list(dates), 'dates')
+
+@check
+def sorts_out_of_order(manager, reopen):
+    dates = sample_dates(30)
+    for date in dates[20:] + dates[:10] + dates[10:20]:
+        manager.add_date(date)
+    expect(list(manager.date_list.rows()), rows_of(dates), 'date_list')
+    expect(list(manager.iter_columns()), rows_of(dates), 'iter_columns')
+
+@check
+def adds_this_year(manager, reopen):
+    dates = sample_dates(30, year=DatePoint.now().datetime_date.year)
+    for date in dates[10:] + dates[:10]:
+        manager.add_date(date)
+    expect(list(manager.iter_columns()), rows_of(dates), 'rows')
+    expect(list(manager.dates_between(dates[5], dates[20]).rows()),
+           rows_of(dates[5:21]), 'range')
+
+@check
+def skips_repeats(manager, reopen):
+    dates = sample_dates(20)
+    tagged = dates[3].tagged(manager.tag_id('repeat', intern=True))
+    expect(manager.add_dates(dates[:10]), (10, 0), 'first add_dates')
+    expect(manager.add_dates(dates + [dates[12], tagged]), (10, 12),
+           'second add_dates')
+    expect(list(manager.iter_columns()), rows_of(dates), 'rows')
+
+@check
+def versions_changes(manager, reopen):
+    dates = sample_dates(3)
+    versions = [manager.version]
+    expect(manager.version, versions[0], 'unchanged version')
+    for date in dates:
+        manager.add_date(date)
+        versions.append(manager.version)
+    expect(len(set(versions)), len(versions), 'distinct versions')
+    manager.add_dates(dates)
+    expect(manager.version, versions[-1], 'version after adding repeats')
+
+@check
+def persists(manager, reopen):
+    dates = sample_dates(40)
+    manager.add_dates(dates)
+    tag = manager.tag_id('kept', intern=True)
+    manager.add_date(sample_dates(41)[-1].tagged(tag))
+    manager.save()
+    version = manager.version
+    reopened = reopen()
+    expect(reopened.version, version, 'version once reopened')
+    expect(list(reopened.iter_columns()), list(manager.iter_columns()),
+           'rows once reopened')
+    expect(reopened.tag_id('kept'), tag, 'tag once reopened')
+
+@check
+def queries_ranges(manager, reopen):
+    dates = sample_dates(60)
+    manager.add_dates(dates)
+    start, end = dates[15], dates[40]
+    expect(list(manager.dates_between(start, end).rows()),
+           rows_of(dates[15:41]), 'closed range')
+    expect(list(manager.dates_between(end=end).rows()), rows_of(dates[:41]),
+           'range open at the start')
+    expect(list(manager.dates_between(start).rows()), rows_of(dates[15:]),
+           'range open at the end')
+    expect(len(manager.dates_between(end, start)), 0, 'backwards range')
+
+@check
+def builds_rollups(manager, reopen):
+    tag = manager.tag_id('rolled', intern=True)
+    dates = sample_dates(80)
+    manager.add_dates(date.tagged(tag) if index % 3 else date
+                      for index, date in enumerate(dates))
+    version = manager.version
+    expect(manager.build_rollup(version).freeze(),
+           Rollup.build(DateStore.from_rows(manager.iter_columns()),
+                        version).freeze(), 'rollup')
+
+@check
+def interns_tags(manager, reopen):
+    expect(manager.tag_id(None), 0, 'ID of no tag')
+    expect(manager.tag_id('a', intern=True), 1, 'first ID')
+    expect(manager.tag_id('b', intern=True), 2, 'second ID')
+    expect(manager.tag_id('a'), 1, 'interned ID')
+    expect(manager.tag_name(2), 'b', 'name of an ID')
+    expect(manager.tag_names, ['a', 'b'], 'names')
+    try:
+        manager.tag_id('c')
+    except KeyError:
+        pass
+    else:
+        raise AssertionError('unknown tag names should be KeyErrors')
+
+@check
+def follows_appends(manager, reopen):
+    dates = sample_dates(10)
+    manager.add_dates(dates[:5])
+    rows, version = manager.follow()
+    expect(rows, None, 'rows on the first follow')
+    expect(version, manager.version, 'followed version')
+    for date in dates[5:]:
+        manager.add_date(date)
+    rows, version = manager.follow()
+    expect(version, manager.version, 'followed version after appending')
+    if rows is not None:
+        expect(list(rows.rows()), rows_of(dates[5:]), 'followed rows')
+    rows, version = manager.follow(reset=True)
+    expect(rows, None, 'rows on a reset')
+
+@check
+def caches_rollups(manager, reopen):
+    dates = sample_dates(30, year=DatePoint.now().datetime_date.year)
+    manager.add_dates(dates[:20])
+    with tempfile.TemporaryDirectory() as path:
+        CacheManager.setup(path, 'cache.json')
+        cache = CacheManager(None, 'cache.json', path)
+        cache.rollup(manager)
+        for date in dates[20:]:
+            manager.add_date(date)
+        expect(cache._rollup.version, manager.version,
+               'rollup version after appending')
+        # a date before the end of the data, so the rollup is dropped
+        manager.add_date(DatePoint.from_timestamps(dates[5]._start + 1,
+                                                   dates[5]._offset))
+        cache.save()
+        version = manager.version
+        expect(cache.rollup(manager).freeze(),
+               manager.build_rollup(version).freeze(), 'rebuilt rollup')
+
+@check
+def filters_frames(manager, reopen):
+    # through a whole project, in a config location of the same backend
+    backend = manager.default()['backend']
+    with tempfile.TemporaryDirectory() as path:
+        os.environ[ConfigManager.ENVIRONMENT_OVERRIDE] = path
+        ConfigManager.setup(ConfigLocations.env, backend=backend)
+        if ConfigManager._config_dirpath() != os.path.realpath(path):
+            raise AssertionError('another config takes precedence')
+        project = Project(ConfigManager.find_config())
+        atexit.unregister(project.close)
+        project.record_many(sample_dates(300))
+        where = Filter('total > 5h')
+        for timeframe in (Timeframe.day, Timeframe.week, Timeframe.month):
+            project.timeframe = timeframe
+            for print_format in ('combined', 'streak'):
+                arguments = (None, None, print_format, None, None, False)
+                _, rows = times_report(project, *arguments, None)
+                _, matching = times_report(project, *arguments, where)
+                expect(matching, [row for row in rows if row[1] > 5 * 3600],
+                       '{} {} rows matching'.format(timeframe, print_format))
+                if not matching:
+                    raise AssertionError('no {} {} rows to filter'.format(
+                        timeframe, print_format))
+
+def run_check(backend, function):
+    """Run a check on a fresh data directory, returning an error or None"""
+    with tempfile.TemporaryDirectory() as path:
+        manager = open_manager(backend, path)
+        if backend == Backend.memory:
+            reopen = lambda: manager
+        else:
+            reopen = lambda: open_manager(backend, path)
+        try:
+            function(manager, reopen)
+        except Exception:
+            return traceback.format_exc(limit=-1).strip()
+
+@click.command()
+@click.argument('backends', nargs=-1,
+                type=click.Choice(Backend.backends()))
+@click.pass_context
+def cli(context, backends):
+    """Check that storage backends behave the same
+
+    Checks every backend by default. Exits with status 1 if any check
+    fails.
+    """
+    failures = 0
+    for backend in backends or Backend.backends():
+        for name, function in CHECKS:
+            error = run_check(backend, function)
+            click.echo('{} {}: {}'.format(backend, name,
+                                          'ok' if error is None else 'FAIL'))
+            if error is not None:
+                click.echo(error)
+                failures += 1
+    if failures:
+        click.echo('{} checks failed'.format(failures))
+        context.exit(1)
+
+
+if __name__ == '__main__':
+    cli()
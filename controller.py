@@ -18,12 +18,26 @@ is also useful, and so is supported as well.
 WIP
 """
 import atexit
+import base64
 import bisect
+import heapq
+import os
+from array import array
 from datetime import timedelta
 import arrow
 
-from date_point import Timeframe, DatePoint, TimeframeGroup
-from utilities import binary_groupby
+from date_point import (Timeframe, DatePoint, DateStore, TimeframeGroup,
+                        frame_day, day_frame, timeframe_start)
+from rollup import Rollup, FrameTotals
+from metrics import registry, Metric
+from utilities import sliding_sums, sliding_max, percentile
+import streaming
+
+# the resolution frame totals are kept at
+MICROSECOND = timedelta(microseconds=1)
+# version of how reports are made, in their cache keys so ones cached
+# before a change to a report aren't used
+REPORT_FORMAT = 1
 
 class Project:
     """Provides the programmatic interface of the function
@@ -32,48 +46,223 @@ class Project:
     it's the 'API' of the application, the high level set of supported
     operations
     """
+
+    # fractions of the finished threshold that separate `daily_levels`
+    LEVEL_FRACTIONS = (0.5, 1, 2)
+
     def __init__(self, config):
         """Create a `Project`"""
         self.config = config
-        self.cache = self.config.cache
-        self.data = self.config.data
         self.finished_threshold = self.config.finished_threshold
         self.timeframe = self.config.timeframe
         self._last_range = None
+        self._groups = None
+        self._groups_key = None
+        self._extra_totals = {}
+        self._streak_index_key = None
+        self._streak_index_value = None
+        self._followed_version = None
         atexit.register(self.close)
 
-    def finish(self):
-        """Record this timeframe as finished >= the threshold of project work"""
+    @property
+    def cache(self):
+        """The config's `CacheManager`"""
+        return self.config.cache
+
+    @property
+    def data(self):
+        """The config's data manager"""
+        return self.config.data
+
+    def finish(self, tag=None):
+        """Record this timeframe as finished >= the threshold of project work
+
+        The date recorded can be given a tag name. Only the cached total of
+        the last frame is needed to check it isn't finished already (see
+        `last_frame`), not the history.
+        """
         current = DatePoint.now()
-        if self.data.date_list:
-            last_date = self.data.date_list[-1]
-            last_frame_finished = self._is_finished(self.timeframe_groups[-1])
-            if (current.after(last_date, self.timeframe) or
-                    current.same(last_date, self.timeframe) and
-                    not last_frame_finished):
-                self.data.add_date(current)
-                return current
-        else:
-            self.data.add_date(current)
-            return current
+        last_frame = self.last_frame()
+        if last_frame is not None:
+            last_ordinal, last_total = last_frame
+            last_frame_finished = self._is_finished_total(last_total)
+            ordinal = current.ordinal(self.timeframe)
+            if not (ordinal > last_ordinal or
+                    ordinal == last_ordinal and not last_frame_finished):
+                return None
+        current = current.tagged(self.data.tag_id(tag, intern=True))
+        self._add_dates([current])
+        return current
+
+    def last_frame(self):
+        """Get the (ordinal, total) of the last frame with time in it
+
+        None if there's no data. Kept in the cache against the data's
+        `stamp` and the timeframe, and updated as dates are recorded (see
+        `_add_dates`), so the frame totals are only needed again after some
+        other change to the data or the timeframe.
+        """
+        entry = self._cached_last_frame()
+        if entry is None:
+            stamp = self.data.stamp()
+            frames = self.frame_totals
+            entry = {'timeframe': self.timeframe, 'stamp': stamp,
+                     'ordinal': frames.ordinals[-1] if len(frames) else None,
+                     'total': frames.totals[-1] if len(frames) else 0}
+            self.cache.last_frame = entry
+        if entry['ordinal'] is None:
+            return None
+        return entry['ordinal'], entry['total']
+
+    def _cached_last_frame(self):
+        """Get the cached last frame entry, or None if it's not current
+
+        Checking it only takes the data's stamp, which costs the same
+        however long the history is.
+        """
+        entry = self.cache.last_frame
+        if (entry is None or entry.get('timeframe') != self.timeframe or
+                entry.get('stamp') != self.data.stamp(entry.get('stamp'))):
+            return None
+        return entry
+
+    def _add_dates(self, dates):
+        """Add dates one at a time, folding them into the cached last frame
+
+        Only if the cached last frame was current before, and then it's
+        current after too: a later frame replaces it, and time in it adds
+        to its total.
+        """
+        entry = self._cached_last_frame()
+        for date in dates:
+            self.data.add_date(date)
+        if entry is None:
+            return
+        entry = dict(entry)
+        frames = FrameTotals.build(DateStore(dates), entry['timeframe'])
+        for ordinal, total in zip(frames.ordinals, frames.totals):
+            if ordinal == entry['ordinal']:
+                entry['total'] += total
+            elif entry['ordinal'] is None or ordinal > entry['ordinal']:
+                entry['ordinal'], entry['total'] = ordinal, total
+        entry['stamp'] = self.data.stamp(entry['stamp'])
+        self.cache.last_frame = entry
+
+    @property
+    def rollup(self):
+        """The per-frame totals for every timeframe in `Rollup.TIMEFRAMES`"""
+        return self.cache.rollup(self.data)
+
+    @property
+    def frame_totals(self):
+        """The `FrameTotals` for the current timeframe"""
+        return self.totals_for(self.timeframe)
+
+    def totals_for(self, timeframe):
+        """The `FrameTotals` for a timeframe
+
+        Taken from the cached rollup, so switching between any of
+        `Rollup.TIMEFRAMES` doesn't rescan the data. Shorter timeframes are
+        folded from the data on first use.
+        """
+        if timeframe in Rollup.TIMEFRAMES:
+            return self.rollup[timeframe]
+        key = (self.data.version, timeframe)
+        if key not in self._extra_totals:
+            self._extra_totals[key] = FrameTotals.build(self.data.date_list,
+                                                        timeframe)
+        return self._extra_totals[key]
 
     @property
     def timeframe_groups(self):
-        """Return the DatePoints grouped into TimeframeGroups"""
-        return TimeframeGroup.group_timeframes(self.data.date_list,
-                                               self.timeframe)
+        """Return the DatePoints grouped into TimeframeGroups
+
+        Made from the frames in `frame_totals` and kept until the data or
+        the timeframe changes. The groups refer into `DataManager.dates`, so
+        archived dates are only loaded if a group's dates are asked for.
+        """
+        key = (self.data.version, self.timeframe)
+        if self._groups_key != key:
+            registry.count(Metric.timeframe_groups)
+            frames = self.frame_totals
+            store = self.data.dates
+            self._groups = [
+                TimeframeGroup(store, self.timeframe,
+                               *frames.span(index, len(store)),
+                               ordinal=frames.ordinals[index],
+                               offset=frames.offsets[index],
+                               total=frames.totals[index])
+                for index in range(len(frames))]
+            self._groups_key = key
+        return self._groups
 
     def _is_finished(self, timeframe_group):
         """Check if the time of the DatePoints exceeds completion threshold"""
         return timeframe_group.total_time >= self.finished_threshold
 
+    def _is_finished_total(self, total):
+        """Check if a frame total (in microseconds) exceeds the threshold"""
+        return total * MICROSECOND >= self.finished_threshold
+
+    def _finished_runs(self):
+        """Get the runs of consecutive finished frames
+
+        Each run is a (first, last) pair of indexes into `frame_totals`.
+        """
+        return self._streak_index()[0]
+
+    def _streak_index(self):
+        """Get the finished runs along with sorted columns of their bounds
+
+        Returns the runs and arrays of the first and last frame ordinal of
+        each, for bisecting. Kept until the data, timeframe or threshold
+        changes.
+        """
+        key = (self.data.version, self.timeframe, self.finished_threshold)
+        if self._streak_index_key != key:
+            runs = self._compute_finished_runs()
+            ordinals = self.frame_totals.ordinals
+            self._streak_index_value = (
+                runs,
+                array('q', (ordinals[first] for first, _ in runs)),
+                array('q', (ordinals[last] for _, last in runs)))
+            self._streak_index_key = key
+        return self._streak_index_value
+
+    def _compute_finished_runs(self):
+        """Find the runs of `_finished_runs` in the frame totals"""
+        frames = self.frame_totals
+        threshold = self.finished_threshold // MICROSECOND
+        runs = []
+        last_ordinal = None
+        for index, (ordinal, total) in enumerate(zip(frames.ordinals,
+                                                     frames.totals)):
+            if total < threshold:
+                continue
+            if runs and ordinal - last_ordinal <= 1:
+                runs[-1] = (runs[-1][0], index)
+            else:
+                runs.append((index, index))
+            last_ordinal = ordinal
+        return runs
+
+    def _current_run(self):
+        """Get the run of `_finished_runs` that is the current streak, if any"""
+        runs = self._finished_runs()
+        if not runs:
+            return None
+        first, last = runs[-1]
+        current = DatePoint.now().ordinal(self.timeframe)
+        if abs(current - self.frame_totals.ordinals[last]) <= 1:
+            return first, last
+        return None
+
     @property
     def finished_streaks(self):
         """Get list of streaks of TimeframeGroups for consecutive finished timeframes"""
-        date_points = (group for group in self.timeframe_groups
-                       if self._is_finished(group))
-        return list(binary_groupby(
-            date_points, lambda x, y: x.within_streak(y, self.timeframe)))
+        groups = self.timeframe_groups
+        return [groups[first:last + 1]
+                for first, last in self._finished_runs()]
 
     @property
     def streak(self):
@@ -85,9 +274,10 @@ class Project:
         are only timeranges that total 40min, it will not be counted as a
         completed frame.
         """
-        if self.current_streak is None:
+        run = self._current_run()
+        if run is None:
             return 0
-        return len(self.current_streak)
+        return run[1] - run[0] + 1
 
     @property
     def current_streak(self):
@@ -96,15 +286,10 @@ class Project:
         If either this or the last timeframe `_is_finished`, return the streak
         that contains it. Otherwise there is no current streak.
         """
-        current = DatePoint.now()
-        streaks = self.finished_streaks
-        if not streaks or not any(streaks):
+        run = self._current_run()
+        if run is None:
             return None
-        last_streak = streaks[-1]
-        last_entry = last_streak[-1]
-        if current.within_streak(last_entry, self.timeframe):
-            return last_streak
-        return None
+        return self.timeframe_groups[run[0]:run[1] + 1]
 
     @property
     def current_range_time(self):
@@ -117,22 +302,15 @@ class Project:
     @property
     def current_streak_time(self):
         """Get the total time in the current streak"""
-        if self.current_streak is None:
+        run = self._current_run()
+        if run is None:
             return timedelta()
-        return self.total_time_in(self.current_streak)
+        return sum(self.frame_totals.totals[run[0]:run[1] + 1]) * MICROSECOND
 
     def total_time_on(self, date):
         """Get the total time on a given date"""
-        datepoint = DatePoint(date)
-        matches = (frame for frame in self.timeframe_groups
-                   if frame.same(datepoint, self.timeframe))
-        try:
-            match = next(matches)
-        except StopIteration:
-            match = None
-        if match is None:
-            return timedelta()
-        return match.total_time
+        ordinal = DatePoint(date).ordinal(self.timeframe)
+        return self.frame_totals.total_on(ordinal) * MICROSECOND
 
     @property
     def total_time_current(self):
@@ -151,29 +329,75 @@ class Project:
         """Set the start time for a new timeframe"""
         self.cache.start_time = value
 
-    def start(self, overwrite=False):
-        """Start a new timeframe"""
+    @property
+    def current_tag(self):
+        """The tag name of the current timerange, if started with one"""
+        if self.start_time is not None:
+            return self.data.tag_name(self.start_time.tag)
+
+    def start(self, overwrite=False, tag=None):
+        """Start a new timeframe, optionally with a tag name"""
         now = DatePoint.now()
         if (self.start_time is None or
                 not now.same(self.start_time, self.timeframe) or overwrite):
+            now = now.tagged(self.data.tag_id(tag, intern=True))
             self.start_time = now
             return now
 
-    def stop(self):
-        """End the current timeframe"""
+    def stop(self, tag=None):
+        """End the current timeframe
+
+        A tag name given here replaces the one it was started with.
+        """
         now = DatePoint.now()
         if self.start_time is not None:
-            this_range = DatePoint(self.start_time, now)
+            start = self.start_time
+            if tag is not None:
+                start = start.tagged(self.data.tag_id(tag, intern=True))
+            this_range = DatePoint(start, now)
             if now.same(self.start_time, self.timeframe):
-                self.data.add_date(this_range)
-                self._last_range = this_range
+                dates = [this_range]
             else:
-                for datepoint in this_range.split_range(self.timeframe):
-                    self.data.add_date(datepoint)
-                    self._last_range = datepoint
+                dates = list(this_range.split_range(self.timeframe))
+            self._add_dates(dates)
+            if dates:
+                self._last_range = dates[-1]
             self.start_time = None
             return now
 
+    def record_many(self, ranges, tag=None):
+        """Record many ranges (or single dates) at once, e.g. from an import
+
+        Each item is a DatePoint, or a (start, end) pair of anything
+        DatePoint takes. All of them are checked before anything is
+        written, raising a ValueError for a range that ends before it
+        starts or a date in the future. Ranges over several frames are
+        split as in `stop`, and a tag name given replaces their tags.
+        Dates before the end of the data go into overflows (see
+        `DataManager`) so nothing needs rewriting. Returns the number of
+        dates recorded and the number skipped as already recorded.
+        """
+        now = DatePoint.now()
+        dates = []
+        for item in ranges:
+            date = item if isinstance(item, DatePoint) else DatePoint(*item)
+            end = date.end
+            if end < date:
+                raise ValueError('{} ends before it starts'.format(date))
+            if end > now:
+                raise ValueError('{} is in the future'.format(date))
+            if date.is_range and not end.same(date, self.timeframe):
+                dates.extend(date.split_range(self.timeframe))
+            else:
+                dates.append(date)
+        if tag is not None:
+            tag_id = self.data.tag_id(tag, intern=True)
+            dates = [date.tagged(tag_id) for date in dates]
+        # the dates skipped aren't known here, so the last frame is
+        # worked out again when next needed
+        self.cache.last_frame = None
+        return self.data.add_dates(dates)
+
     def fill_boundries(func):
         """Decorator that defaults a start to the first frame and end to now
 
@@ -181,8 +405,13 @@ class Project:
         that default to None, and all have the same desired default behavior.
         """
         def wrapped(*args, **kwargs):
-            if kwargs.get('start') is None and args[0].timeframe_groups:
-                kwargs['start'] = args[0].timeframe_groups[0].group_date
+            for key in ('start', 'end'):
+                value = kwargs.get(key)
+                if value is not None and not isinstance(value, DatePoint):
+                    kwargs[key] = DatePoint(value)
+            frames = args[0].frame_totals
+            if kwargs.get('start') is None and len(frames):
+                kwargs['start'] = frames.frame_date(0)
             if kwargs.get('end') is None:
                 kwargs['end'] = DatePoint.now()
             return func(*args, **kwargs)
@@ -215,37 +444,587 @@ class Project:
         streaks that contain start and end, or only streaks strictly
         after start and before end.
         """
-        streaks = self.finished_streaks
+        if start is None:
+            return []
+        runs = self._streak_index()[0]
+        start_index, end_index = self._streak_bounds(start, end, strict)
+        groups = self.timeframe_groups
+        return [groups[first:last + 1]
+                for first, last in runs[start_index:end_index]]
+
+    def _streak_bounds(self, start, end, strict):
+        """Get the index range of the finished runs between two DatePoints
+
+        As in `streaks_range`.
+        """
+        _, firsts, lasts = self._streak_index()
+        start_ordinal = start.ordinal(self.timeframe)
+        end_ordinal = end.ordinal(self.timeframe)
+        if strict:
+            return (bisect.bisect_right(firsts, start_ordinal),
+                    bisect.bisect_left(lasts, end_ordinal))
+        return (bisect.bisect_left(lasts, start_ordinal),
+                bisect.bisect_right(firsts, end_ordinal))
 
-        def startf(streak):
-            if strict:
-                return all(start.before(d, self.timeframe) for d in streak)
-            return any(start.before(d, self.timeframe)
-                       or start.same(d, self.timeframe) for d in streak)
+    def _encode_cursor(self, kind, ordinal):
+        """Make an opaque cursor pointing at a frame or streak ordinal"""
+        raw = '{}:{}:{}'.format(kind, self.timeframe, ordinal)
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
 
-        def endf(streak):
-            if strict:
-                return all(end.after(d, self.timeframe) for d in streak)
-            return any(end.after(d, self.timeframe)
-                       or end.same(d, self.timeframe) for d in streak)
+    def _decode_cursor(self, kind, cursor):
+        """Get the ordinal a cursor from `_encode_cursor` points at"""
         try:
-            start_streak = next(i for i, x in enumerate(streaks) if startf(x))
-            end_streak = [i for i, x in enumerate(streaks) if endf(x)][-1]
-            return streaks[start_streak:end_streak + 1]
-        except StopIteration:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            cursor_kind, timeframe, ordinal = (
+                base64.urlsafe_b64decode(padded).decode().split(':'))
+            ordinal = int(ordinal)
+        except ValueError:
+            raise ValueError('Invalid cursor')
+        if cursor_kind != kind or timeframe != self.timeframe:
+            raise ValueError('Cursor is for a different query')
+        return ordinal
+
+    def _page(self, kind, ordinals, limit, after, reverse):
+        """Seek a page of indexes into sorted ordinals, and the next cursor
+
+        Pages go forward in time from the start, or backward from the end
+        if `reverse`, continuing past the ordinal `after` points at. A
+        `limit` of None means everything that's left.
+        """
+        if limit is None:
+            limit = len(ordinals)
+        if reverse:
+            high = len(ordinals)
+            if after is not None:
+                high = bisect.bisect_left(ordinals,
+                                          self._decode_cursor(kind, after))
+            low = max(high - limit, 0)
+            indexes = range(high - 1, low - 1, -1)
+            more = low > 0
+        else:
+            low = 0
+            if after is not None:
+                low = bisect.bisect_right(ordinals,
+                                          self._decode_cursor(kind, after))
+            high = min(low + limit, len(ordinals))
+            indexes = range(low, high)
+            more = high < len(ordinals)
+        cursor = None
+        if more and indexes:
+            cursor = self._encode_cursor(kind, ordinals[indexes[-1]])
+        return indexes, cursor
+
+    def frames_page(self, limit=50, after=None, reverse=False, where=None):
+        """Get one page of the frames that have time in them
+
+        Returns a list of (frame date, total time) pairs and a cursor to
+        pass as `after` for the next page, or None if this was the last.
+        Seeks into the cached rollup, so earlier pages never get built.
+        With a `Filter` as `where` only pages through the frames it matches.
+        """
+        frames = self.frame_totals
+        ordinals = frames.ordinals
+        matching = None
+        if where is not None:
+            matching = self.filter_frames(where)
+            ordinals = [ordinals[index] for index in matching]
+        indexes, cursor = self._page('frame', ordinals, limit, after, reverse)
+        if matching is not None:
+            indexes = [matching[index] for index in indexes]
+        return [(frames.frame_date(index), frames.totals[index] * MICROSECOND)
+                for index in indexes], cursor
+
+    def streaks_page(self, limit=20, after=None, reverse=False, where=None):
+        """Get one page of the streaks
+
+        Returns a list of (number, first frame date, last frame date,
+        length, total time) tuples and a cursor to pass as `after` for the
+        next page, or None if this was the last. With a `Filter` as `where`
+        only pages through the streaks it matches.
+        """
+        runs, firsts, _ = self._streak_index()
+        frames = self.frame_totals
+        matching = None
+        if where is not None:
+            matching = self.filter_streaks(where)
+            firsts = [firsts[index] for index in matching]
+        indexes, cursor = self._page('streak', firsts, limit, after, reverse)
+        if matching is not None:
+            indexes = [matching[index] for index in indexes]
+        page = []
+        for index in indexes:
+            first, last = runs[index]
+            total = sum(frames.totals[first:last + 1]) * MICROSECOND
+            page.append((index + 1, frames.frame_date(first),
+                         frames.frame_date(last), last - first + 1, total))
+        return page, cursor
+
+    def _day_bounds(self, where, ordinals):
+        """Get the index range of sorted frame ordinals in a Filter's bounds"""
+        low, high = 0, len(ordinals)
+        if where.low_day is not None:
+            ordinal = day_frame(where.low_day, self.timeframe)
+            if frame_day(ordinal, self.timeframe) < where.low_day:
+                ordinal += 1
+            low = bisect.bisect_left(ordinals, ordinal)
+        if where.high_day is not None:
+            high = bisect.bisect_right(
+                ordinals, day_frame(where.high_day, self.timeframe))
+        return low, max(low, high)
+
+    def filter_frames(self, where):
+        """Get the indexes into `frame_totals` of the frames a Filter matches
+
+        The filter's date bounds are bisected in the frame ordinals first,
+        so only the frames inside them are checked.
+        """
+        frames = self.frame_totals
+        low, high = self._day_bounds(where, frames.ordinals)
+        timeframe = self.timeframe
+        return [index for index in range(low, high)
+                if where.matches(frame_day(frames.ordinals[index], timeframe),
+                                 frames.totals[index])]
+
+    def filter_streaks(self, where):
+        """Get the indexes of the finished runs a Filter matches
+
+        A streak's date is that of its first frame, and its total the sum
+        of its frames'. Bisects the filter's date bounds like
+        `filter_frames`.
+        """
+        runs, firsts, _ = self._streak_index()
+        totals = self.frame_totals.totals
+        low, high = self._day_bounds(where, firsts)
+        timeframe = self.timeframe
+        return [index for index in range(low, high)
+                if where.matches(frame_day(firsts[index], timeframe),
+                                 sum(totals[runs[index][0]:runs[index][1] + 1]),
+                                 runs[index][1] - runs[index][0] + 1)]
+
+    @fill_boundries
+    def matching_frames(self, where, start=None, end=None):
+        """Get the frames between start and end that a Filter matches
+
+        Returns (frame date, total time) pairs, as `frames_page` does. Only
+        the frames from `filter_frames` are looked at, not every frame in
+        the range.
+        """
+        if start is None:
             return []
+        frames = self.frame_totals
+        matching = []
+        for index in self.filter_frames(where):
+            date = frames.frame_date(index)
+            if not (date < start or date > end):
+                matching.append((date, frames.totals[index] * MICROSECOND))
+        return matching
+
+    @fill_boundries
+    def matching_streak_frames(self, where, start=None, end=None):
+        """Get the frames a Filter matches in each streak between start and end
+
+        Returns a list of (frame date, total time) pairs for each streak in
+        `streaks_range` with any matching frames. The frames from
+        `filter_frames` are placed in their streaks by bisecting, so only
+        they are looked at.
+        """
+        if start is None:
+            return []
+        runs, firsts, _ = self._streak_index()
+        start_index, end_index = self._streak_bounds(start, end, False)
+        frames = self.frame_totals
+        streaks = []
+        last_run = None
+        for index in self.filter_frames(where):
+            run = bisect.bisect_right(firsts, frames.ordinals[index]) - 1
+            if (run < start_index or run >= end_index or
+                    index > runs[run][1]):
+                continue
+            if run != last_run:
+                streaks.append([])
+                last_run = run
+            streaks[-1].append((frames.frame_date(index),
+                                frames.totals[index] * MICROSECOND))
+        return streaks
+
+    def frame_matches(self, where, date):
+        """Check whether the frame a date is in matches a Filter"""
+        ordinal = DatePoint(date).ordinal(self.timeframe)
+        day = frame_day(ordinal, self.timeframe)
+        if (where.low_day is not None and day < where.low_day or
+                where.high_day is not None and day > where.high_day):
+            return False
+        return where.matches(day, self.frame_totals.total_on(ordinal))
 
     @fill_boundries
     def streaks_boolean(self, start=None, end=None):
         """Return a boolean for whether each frame in the range was finished"""
-        result = [self.total_time_on(frame) >= self.finished_threshold
-                  for frame in self.filled_range(start=start, end=end)]
+        if start is None:
+            return []
+        frames = self.frame_totals
+        first = start.ordinal(self.timeframe)
+        last = end.ordinal(self.timeframe)
+        low = bisect.bisect_left(frames.ordinals, first)
+        high = bisect.bisect_right(frames.ordinals, last)
+        totals = dict(zip(frames.ordinals[low:high], frames.totals[low:high]))
+        threshold = self.finished_threshold // MICROSECOND
+        result = [totals.get(ordinal, 0) >= threshold
+                  for ordinal in range(first, last + 1)]
         # end is today and today is not finished
         if DatePoint.now().same(end, self.timeframe) and result and not result[-1]:
             # today could still be finished
             result[-1] = None
         return result
 
+    @fill_boundries
+    def daily_levels(self, start=None, end=None):
+        """Get how much was done each day between start and end, as levels
+
+        Returns the day ordinal of `start` and a bytearray with one level per
+        day: 0 for nothing, then 1 to 4 for less than half, less than all,
+        up to twice and more than twice the finished threshold. Always per
+        day (from the rollup) whatever the timeframe.
+        """
+        if start is None:
+            return None, bytearray()
+        frames = self.rollup[Timeframe.day]
+        first = start.ordinal(Timeframe.day)
+        last = end.ordinal(Timeframe.day)
+        levels = bytearray(max(last - first + 1, 0))
+        threshold = self.finished_threshold // MICROSECOND
+        bounds = [int(threshold * fraction) for fraction in self.LEVEL_FRACTIONS]
+        low = bisect.bisect_left(frames.ordinals, first)
+        high = bisect.bisect_right(frames.ordinals, last)
+        for ordinal, total in zip(frames.ordinals[low:high],
+                                  frames.totals[low:high]):
+            if total > 0:
+                levels[ordinal - first] = 1 + bisect.bisect_right(bounds, total)
+        return first, levels
+
+    @fill_boundries
+    def frame_series(self, start=None, end=None):
+        """Get the total of every frame from start to end, empty ones included
+
+        Returns a list of totals in microseconds, one per frame.
+        """
+        if start is None:
+            return []
+        frames = self.frame_totals
+        first = start.ordinal(self.timeframe)
+        last = end.ordinal(self.timeframe)
+        series = [0] * max(last - first + 1, 0)
+        low = bisect.bisect_left(frames.ordinals, first)
+        high = bisect.bisect_right(frames.ordinals, last)
+        for ordinal, total in zip(frames.ordinals[low:high],
+                                  frames.totals[low:high]):
+            series[ordinal - first] = total
+        return series
+
+    def moving_averages(self, window, start=None, end=None):
+        """Get the average time per frame over the last `window` frames
+
+        One timedelta per frame from start to end (defaults as in
+        fill_boundries), each averaging the frames up to and including it.
+        """
+        series = self.frame_series(start=start, end=end)
+        return [total * MICROSECOND / min(index + 1, window)
+                for index, total in enumerate(sliding_sums(series, window))]
+
+    def finish_rates(self, window, start=None, end=None):
+        """Get the fraction of finished frames over the last `window` frames
+
+        One float per frame from start to end, like `moving_averages`.
+        """
+        threshold = self.finished_threshold // MICROSECOND
+        finished = (total >= threshold
+                    for total in self.frame_series(start=start, end=end))
+        return [count / min(index + 1, window)
+                for index, count in enumerate(sliding_sums(finished, window))]
+
+    def best_recent(self, window, start=None, end=None):
+        """Get the best single frame total within the last `window` frames
+
+        One timedelta per frame from start to end, like `moving_averages`.
+        """
+        series = self.frame_series(start=start, end=end)
+        return [total * MICROSECOND for total in sliding_max(series, window)]
+
+    def rolling_summary(self, windows=(7, 30, 90)):
+        """Get the latest average, finish rate and best frame per window
+
+        Returns a dict from each window size to an (average timedelta,
+        finish rate, best frame timedelta) tuple over the last that many
+        frames up to now, from a single pass over the frame series.
+        """
+        series = self.frame_series()
+        if not series:
+            return {}
+        threshold = self.finished_threshold // MICROSECOND
+        summary = {}
+        for window in windows:
+            recent = series[-window:]
+            summary[window] = (
+                sum(recent) * MICROSECOND / len(recent),
+                sum(total >= threshold for total in recent) / len(recent),
+                max(recent) * MICROSECOND)
+        return summary
+
+    def best_frames(self, count=5):
+        """Get the `count` frames with the most time as (date, time) pairs"""
+        frames = self.frame_totals
+        best = heapq.nlargest(count, range(len(frames)),
+                              key=frames.totals.__getitem__)
+        return [(frames.frame_date(index), frames.totals[index] * MICROSECOND)
+                for index in best]
+
+    def longest_streaks(self, count=5):
+        """Get the `count` longest streaks as (first, last, length) tuples
+
+        First and last are the dates of the first and last frame.
+        """
+        frames = self.frame_totals
+        runs = heapq.nlargest(count, self._finished_runs(),
+                              key=lambda run: run[1] - run[0])
+        return [(frames.frame_date(first), frames.frame_date(last),
+                 last - first + 1) for first, last in runs]
+
+    def frame_percentiles(self, fractions=(0.5, 0.9, 0.99)):
+        """Get percentiles of the time in frames that have any
+
+        Returns a dict from each fraction to a timedelta.
+        """
+        totals = sorted(self.frame_totals.totals)
+        return {fraction: percentile(totals, fraction) * MICROSECOND
+                for fraction in fractions if totals}
+
+    @property
+    def streak_lengths(self):
+        """Get the length of every streak, in order"""
+        return [last - first + 1 for first, last in self._finished_runs()]
+
+    def streak_percentiles(self, fractions=(0.5, 0.9, 0.99)):
+        """Get percentiles of streak lengths, as a dict from each fraction"""
+        lengths = sorted(self.streak_lengths)
+        return {fraction: percentile(lengths, fraction)
+                for fraction in fractions if lengths}
+
+    def sweep(self, thresholds, timeframes=None):
+        """Get streak statistics for several finished thresholds at once
+
+        For each timeframe (default: the current one) and threshold (a
+        timedelta) gives a (timeframe, threshold, current streak, longest
+        streak, finish rate) tuple, as if `finished_threshold` and
+        `timeframe` were set to those. The finish rate is over the frames
+        from the first one with data up to now, leaving out the current
+        frame while it isn't finished.
+        """
+        if timeframes is None:
+            timeframes = [self.timeframe]
+        results = []
+        for timeframe in timeframes:
+            results.extend(self._sweep_timeframe(timeframe, sorted(thresholds)))
+        return results
+
+    def _sweep_timeframe(self, timeframe, thresholds):
+        """Do the `sweep` of sorted thresholds for one timeframe
+
+        Frames are sorted by total once, then added to the finished runs
+        from the biggest total down while going through the thresholds from
+        the highest, merging runs they join. So each threshold only costs
+        the frames that first finish at it.
+        """
+        frames = self.totals_for(timeframe)
+        if not len(frames):
+            return [(timeframe, threshold, 0, 0, 0) for threshold in thresholds]
+        current = DatePoint.now().ordinal(timeframe)
+        current_total = frames.total_on(current)
+        span = current - frames.ordinals[0] + 1
+        order = sorted(range(len(frames)), key=frames.totals.__getitem__,
+                       reverse=True)
+        # the runs so far, by their first and by their last ordinal
+        lasts_by_first = {}
+        firsts_by_last = {}
+        position = longest = 0
+        newest = None
+        results = []
+        for threshold in reversed(thresholds):
+            limit = threshold // MICROSECOND
+            while (position < len(order) and
+                   frames.totals[order[position]] >= limit):
+                ordinal = frames.ordinals[order[position]]
+                first = firsts_by_last.pop(ordinal - 1, ordinal)
+                last = lasts_by_first.pop(ordinal + 1, ordinal)
+                lasts_by_first.pop(first, None)
+                firsts_by_last.pop(last, None)
+                lasts_by_first[first] = last
+                firsts_by_last[last] = first
+                longest = max(longest, last - first + 1)
+                newest = last if newest is None else max(newest, last)
+                position += 1
+            streak = 0
+            if newest is not None and abs(current - newest) <= 1:
+                streak = newest - firsts_by_last[newest] + 1
+            counted = span - (current_total < limit)
+            rate = position / counted if counted > 0 else 0
+            results.append((timeframe, threshold, streak, longest, rate))
+        results.reverse()
+        return results
+
+    def stream_frames(self):
+        """Stream (ordinal, offset, total) per frame straight from the data
+
+        Unlike `frame_totals` nothing is cached or held in memory.
+        """
+        return streaming.frame_totals(self.data.iter_rows(), self.timeframe)
+
+    def stream_streaks(self, after=None, where=None):
+        """Stream the streaks straight from the data, in constant memory
+
+        Yields the same (number, first frame date, last frame date, length,
+        total time) tuples as `streaks_page`, starting after the streak a
+        cursor from `streak_cursor` points at and only the ones a `Filter`
+        matches, if given.
+        """
+        if after is not None:
+            after = self._decode_cursor('streak', after)
+        threshold = self.finished_threshold // MICROSECOND
+        streaks = streaming.finished_streaks(self.stream_frames(), threshold)
+        return self._streak_tuples(streaks, after, where)
+
+    def _streak_tuples(self, streaks, after, where):
+        """Turn streaks from `streaming.finished_streaks` into page tuples"""
+        timeframe = self.timeframe
+        for number, (first, offset, last, length, total) in enumerate(
+                streaks, 1):
+            if after is not None and first <= after:
+                continue
+            if where is not None and not where.matches(
+                    frame_day(first, timeframe), total, length):
+                continue
+            yield (number,
+                   DatePoint.from_timestamps(
+                       timeframe_start(first, offset, timeframe), offset),
+                   DatePoint.from_timestamps(
+                       timeframe_start(last, offset, timeframe), offset),
+                   length, total * MICROSECOND)
+
+    def streak_cursor(self, first):
+        """Get the cursor for continuing after the streak starting at `first`"""
+        return self._encode_cursor('streak', first.ordinal(self.timeframe))
+
+    def stream_current_streak(self):
+        """Get the current streak's length and total time in constant memory
+
+        Like `streak` and `current_streak_time`, but from one pass over the
+        data instead of the rollup.
+        """
+        streak = streaming.last(self.stream_streaks())
+        if streak is None:
+            return 0, timedelta()
+        _, _, last, length, total = streak
+        current = DatePoint.now().ordinal(self.timeframe)
+        if abs(current - last.ordinal(self.timeframe)) <= 1:
+            return length, total
+        return 0, timedelta()
+
+    def stream_states(self):
+        """Stream `streaks_boolean` for all frames up to now from the data"""
+        current = DatePoint.now().ordinal(self.timeframe)
+        threshold = self.finished_threshold // MICROSECOND
+        frames = self.stream_frames()
+        # hold back one state, to mark an unfinished current frame with None
+        previous = None
+        for index, state in enumerate(streaming.frame_states(
+                frames, threshold, current)):
+            if index:
+                yield previous
+            previous = state
+        if previous is not None:
+            yield previous if previous else None
+
+    def stream_total_current(self):
+        """Get `total_time_current` from one pass over the data"""
+        current = DatePoint.now().ordinal(self.timeframe)
+        frame = streaming.last(frame for frame in self.stream_frames()
+                               if frame[0] == current)
+        total = frame[2] * MICROSECOND if frame is not None else timedelta()
+        return total + self.current_range_time
+
+    def tag_totals(self, tag, timeframe=None):
+        """The `FrameTotals` of just the dates with a tag name
+
+        Taken from the tag's posting lists in the rollup, so no dates are
+        read. Defaults to the project's timeframe, which has to be one of
+        `Rollup.TIMEFRAMES`. Raises a KeyError for a tag never used.
+        """
+        if timeframe is None:
+            timeframe = self.timeframe
+        if timeframe not in Rollup.TIMEFRAMES:
+            raise ValueError('no per-tag totals for {}s'.format(timeframe))
+        layers = self.rollup.tags.get(self.data.tag_id(tag))
+        if layers is None:
+            return FrameTotals(timeframe)
+        return layers[timeframe]
+
+    def tag_streaks(self, tag):
+        """Get the streaks of frames finished with only a tag's time
+
+        As (first ordinal, first offset, last ordinal, length, total)
+        tuples, with totals in microseconds.
+        """
+        frames = self.tag_totals(tag)
+        return list(streaming.finished_streaks(
+            zip(frames.ordinals, frames.offsets, frames.totals),
+            self.finished_threshold // MICROSECOND))
+
+    def tag_summary(self):
+        """Summarize the time spent with each tag
+
+        Returns a (name, total time, finished frames, longest streak,
+        current streak) tuple per tag, in the order they were first used.
+        """
+        current = DatePoint.now().ordinal(self.timeframe)
+        summary = []
+        for name in self.data.tag_names:
+            frames = self.tag_totals(name)
+            streaks = self.tag_streaks(name)
+            streak = 0
+            if streaks and abs(current - streaks[-1][2]) <= 1:
+                streak = streaks[-1][3]
+            summary.append((
+                name, sum(frames.totals) * MICROSECOND,
+                sum(length for _, _, _, length, _ in streaks),
+                max((length for _, _, _, length, _ in streaks), default=0),
+                streak))
+        return summary
+
+    def report(self, command, arguments, build, current=False):
+        """Get a report's text and results, cached until the data changes
+
+        `build` makes the report when it isn't cached, returning its text
+        and JSON-serializable structured results. Reports are cached by
+        `command`, its `arguments`, the timeframe, the threshold and the
+        data version, and with `current` by the current frame too, for
+        reports that run up to now. Keys start with `REPORT_FORMAT`.
+        """
+        key = [REPORT_FORMAT, command, arguments, self.timeframe,
+               self.finished_threshold.total_seconds(), self.data.version]
+        if current:
+            key.append(DatePoint.now().ordinal(self.timeframe))
+        report = self.cache.report(key)
+        if report is not None:
+            return report['text'], report['results']
+        text, results = build()
+        self.cache.save_report(key, text, results)
+        return text, results
+
+    def snapshot(self):
+        """Take a `ProjectSnapshot` of the project as it is now"""
+        rollup = self.rollup
+        return ProjectSnapshot(self.timeframe, self.finished_threshold,
+                               DatePoint.now(), self.start_time,
+                               self.totals_for(self.timeframe), rollup.version)
+
     def total_time_in(self, date_list):
         """Get the total time in a list of dates
 
@@ -255,6 +1034,153 @@ class Project:
         return sum(
             (self.total_time_on(date) for date in date_list), timedelta())
 
+    def refresh(self):
+        """Bring what's loaded up to date with the stored data
+
+        The cached start time is read again, and the data followed, which
+        publishes its changes since the last refresh. The rollup applies
+        them, folding in appended rows without reading the rest of the data.
+        The first refresh, or any other change, loads the rollup afresh.
+        Returns whether the data changed.
+        """
+        self.cache.reload()
+        rows, version = self.data.follow()
+        if version == self._followed_version:
+            return False
+        while self.rollup.version != version:
+            rows, version = self.data.follow(reset=True)
+        self._followed_version = version
+        return True
+
+    @property
+    def watch_paths(self):
+        """The directories with the files that `refresh` follows"""
+        return self.data.watch_paths + [os.path.dirname(self.cache.cache_path)]
+
+    def merge(self, sources):
+        """Merge in the data logs at some paths, e.g. from other machines
+
+        See `DataManager.merge`. Returns the number of dates added, the
+        number of those cut short and the number dropped as already
+        recorded.
+        """
+        return self.data.merge(sources)
+
+    def archive(self, before=None):
+        """Archive the dates before `before` (default: this year)
+
+        See `DataManager.archive`. Returns the number of dates archived.
+        """
+        if before is not None and not isinstance(before, DatePoint):
+            before = DatePoint(before)
+        return self.data.archive(before)
+
     def close(self):
         """Persist data that may have changed during runtime"""
         self.config.save()
+
+
+class ProjectSnapshot:
+    """An immutable view of a project at one moment, for building reports
+
+    Holds copies of the frame totals for one timeframe along with the time
+    it was taken, the start time and the finished threshold, all read
+    once. Report sections computed from it agree with each other even if
+    the data changes meanwhile, and don't each go back to the data (or
+    even stat it for its version).
+    """
+    __slots__ = ('timeframe', 'threshold', 'now', 'start_time', 'version',
+                 'ordinals', 'totals', 'current')
+
+    def __init__(self, timeframe, finished_threshold, now, start_time,
+                 frames, version=None):
+        """Create a snapshot from a Project's state and `FrameTotals`"""
+        values = {
+            'timeframe': timeframe,
+            'threshold': finished_threshold // MICROSECOND,
+            'now': now,
+            'start_time': start_time,
+            'version': version,
+            'ordinals': memoryview(array('q', frames.ordinals)).toreadonly(),
+            'totals': memoryview(array('q', frames.totals)).toreadonly(),
+            'current': now.ordinal(timeframe),
+        }
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('ProjectSnapshot is immutable')
+
+    def compute(self, sections):
+        """Compute report sections from the snapshot, returning the results
+
+        Each section is a function of the snapshot, such as one of its
+        methods. They're run in order in this process: each is a single
+        pass over the snapshot's columns, so together they cost barely more
+        than the most expensive one, which is less than starting a process
+        pool would (and threads can't run them in parallel).
+        """
+        return [section(self) for section in sections]
+
+    def current_run(self):
+        """Get the (first, last) frame indexes of the current streak, or None
+
+        The same run as `Project._current_run`, found by walking back from
+        the last finished frame rather than finding every run.
+        """
+        ordinals, totals, threshold = self.ordinals, self.totals, self.threshold
+        last = len(totals) - 1
+        while last >= 0 and totals[last] < threshold:
+            last -= 1
+        if last < 0 or abs(self.current - ordinals[last]) > 1:
+            return None
+        first = last
+        for index in range(last - 1, -1, -1):
+            if totals[index] < threshold:
+                continue
+            if ordinals[first] - ordinals[index] > 1:
+                break
+            first = index
+        return first, last
+
+    def streak(self):
+        """Get the length of the current streak, like `Project.streak`"""
+        run = self.current_run()
+        if run is None:
+            return 0
+        return run[1] - run[0] + 1
+
+    def streak_time(self):
+        """Get the total time in the current streak"""
+        run = self.current_run()
+        if run is None:
+            return timedelta()
+        return sum(self.totals[run[0]:run[1] + 1]) * MICROSECOND
+
+    def states(self):
+        """Whether each frame from the first until now was finished
+
+        Like `Project.streaks_boolean`, the current frame is None if it
+        isn't finished yet.
+        """
+        if not len(self.ordinals):
+            return []
+        first = self.ordinals[0]
+        result = [False] * max(self.current + 1 - first, 0)
+        for ordinal, total in zip(self.ordinals, self.totals):
+            if total >= self.threshold and first <= ordinal <= self.current:
+                result[ordinal - first] = True
+        if result and not result[-1]:
+            result[-1] = None
+        return result
+
+    def total_current(self):
+        """Get the time spent in the current frame, including a started range"""
+        index = bisect.bisect_left(self.ordinals, self.current)
+        total = 0
+        if index < len(self.ordinals) and self.ordinals[index] == self.current:
+            total = self.totals[index]
+        result = total * MICROSECOND
+        if self.start_time is not None:
+            result += self.now - self.start_time
+        return result
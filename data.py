@@ -1,85 +1,63 @@
-import csv
+import hashlib
 import json
 import os
 import os.path
 from datetime import timedelta
 import pprint
 
+from backends import DataManager, data_manager, data_manager_class
+from data_files import write_atomically
 from date_point import DatePoint, Timeframe
-
-class DataManager:
-    """Wraps the mechanism for persisting and querying work dates and times
-
-    The main features of this program rely on storage of dates and times during
-    which personal project work has take place. The actual mechanism for
-    storing this data is abstracted from the rest of the program. Here it is
-    a simple `csv` file, with 'frozen' DatePoints stored in it.
-    """
-    def __init__(self, config, path, data_file):
-        self.data_filepath = os.path.join(path, data_file)
-        self.config = config
-        self._date_list = None
-        self._file_modified = True
-
-    @classmethod
-    def default(cls):
-        """Return the default init arguments to be passed in by Config"""
-        return {'data_file': 'data.csv'}
-
-    @classmethod
-    def setup(cls, path, data_file, **kwargs):
-        """Perform the necessary initial setup for the data
-
-        Currently just makes the data file (a csv)
-        """
-        data_filepath = os.path.join(path, data_file)
-        if not os.path.isfile(data_filepath):
-            with open(data_filepath, 'w'):
-                pass
-
-    def add_date(self, date):
-        """Append a new DatePoint to the date list"""
-        with open(self.data_filepath, 'a', newline='') as writef:
-            writer = csv.writer(writef)
-            writer.writerow([date.freeze()])
-        self._file_modified = True
-
-    @property
-    def date_list(self):
-        """Get the list of DatePoints this manager stores"""
-        if self._date_list is None or self._file_modified:
-            with open(self.data_filepath, 'r', newline='') as reader:
-                reader = csv.reader(reader)
-                self._date_list = [DatePoint.unfreeze(date[0]) for date in reader]
-            self._file_modified = False
-        return self._date_list
-
-    def save(self):
-        """Persist any data that may have changed during runtime
-
-        Since `add_data` is the only mutating method and it persists the data,
-        this doesn't need to do anything (as of yet).
-        """
-        pass
+from events import Change
+from metrics import registry, Metric
+from rollup import Rollup
 
 class CacheManager:
     """Manager for cached data, i.e. calculated/temporary data
 
-    Not used extensively in `Project`, however will become more relevant as
-    more extensive statistics/information is made available.
+    Holds the small amount of state `Project` keeps between runs (the start
+    time), and data derived from the stored dates such as the `Rollup` of
+    per-frame totals.
+
+    Rendered reports are cached too, one file each in a directory next to
+    the cache file, named by a hash of what they were made from (see
+    `report`). They're evicted least recently used first once together
+    they pass `report_limit` bytes. Reading one writes nothing, so they're
+    only written when a report is made, like the rollup is only written
+    when the data has changed since it was.
     """
-    def __init__(self, config, cache_filename, path):
+
+    # filename for the persisted rollup, next to the cache file
+    ROLLUP_FILENAME = 'rollup.json'
+    # directory (next to the cache file) for cached reports
+    REPORT_DIRNAME = 'reports'
+    # default size in bytes the cached reports are kept under
+    REPORT_LIMIT = 4 * 2 ** 20
+
+    def __init__(self, config, cache_filename, path, report_limit=None):
         """Create a new cache manager from the filepath"""
         self.config = config
         self.cache_path = os.path.join(path, cache_filename)
+        self.rollup_path = os.path.join(path, self.ROLLUP_FILENAME)
+        self.report_path = os.path.join(path, self.REPORT_DIRNAME)
+        if report_limit is None:
+            report_limit = self.REPORT_LIMIT
+        self.report_limit = report_limit
         self._cache = None
+        self._cache_modified = False
+        self._rollup = None
+        self._rollup_modified = False
 
     @property
     def cache(self):
         """Lazy loading of the cache data"""
         if self._cache is None:
+            registry.count(Metric.cache_miss)
             with open(self.cache_path, 'r') as cache_file:
                 self._cache = json.load(cache_file)
+                registry.count(Metric.bytes_read, cache_file.tell())
+        else:
+            registry.count(Metric.cache_hit)
         return self._cache
 
     @classmethod
@@ -91,12 +69,14 @@ class CacheManager:
     def setup(cls, path, cache_filename, **kwargs):
         """Perform the necessary initial setup for the data
 
-        Makes the cache file and initializes the used values to None
+        Makes the cache file and initializes the used values to None, and
+        makes the report directory
         """
         cache_filepath = os.path.join(path, cache_filename)
         if not os.path.isfile(cache_filepath):
             with open(cache_filepath, 'w') as cache_file:
                 json.dump({'start_time': None}, cache_file)
+        os.makedirs(os.path.join(path, cls.REPORT_DIRNAME), exist_ok=True)
 
     @property
     def start_time(self):
@@ -110,13 +90,177 @@ class CacheManager:
         """Set the start time for a new timerange"""
         if value is not None:
             value = value.freeze()
-        self.cache['start_time'] = value
+        if self.cache.get('start_time') != value:
+            self.cache['start_time'] = value
+            self._cache_modified = True
+
+    @property
+    def last_frame(self):
+        """The cached total of the last frame, as kept by `Project`
+
+        A dict of the timeframe, the data's stamp (see `DataBackend.stamp`),
+        and the last frame's ordinal (None if there's no data) and total in
+        microseconds.
+        """
+        return self.cache.get('last_frame')
+
+    @last_frame.setter
+    def last_frame(self, value):
+        if self.cache.get('last_frame') != value:
+            self.cache['last_frame'] = value
+            self._cache_modified = True
+
+    def rollup(self, data):
+        """Get the `Rollup` for the current version of a DataManager's data
+
+        Kept in memory and persisted next to the cache, and only rebuilt
+        (in one pass over the data) when the data version has changed. Once
+        it's loaded, rows appended to the data are folded into it as they're
+        published (see `apply`).
+        """
+        data.events.subscribe(self.apply)
+        version = data.version
+        if self._rollup is not None and self._rollup.version == version:
+            registry.count(Metric.memo_hit)
+            return self._rollup
+        registry.count(Metric.memo_miss)
+        rollup = self._load_rollup(version)
+        if rollup is None:
+            registry.count(Metric.cache_miss)
+            rollup = data.build_rollup(version)
+            self._rollup_modified = True
+        else:
+            registry.count(Metric.cache_hit)
+        self._rollup = rollup
+        return rollup
+
+    def extend_rollup(self, previous_version, store, version):
+        """Fold rows appended to the data into the loaded rollup
+
+        The rollup has to be the one for `previous_version`, and `version`
+        is the data version with the rows, which it's tagged with after.
+        Returns False (doing nothing) if a different rollup is loaded.
+        """
+        if self._rollup is None or self._rollup.version != previous_version:
+            return False
+        if len(store):
+            self._rollup.extend(Rollup.build(store))
+        self._rollup.version = version
+        self._rollup_modified = True
+        return True
+
+    def apply(self, event):
+        """Bring the loaded rollup up to date with a `DataEvent`
+
+        Appended rows are folded into it, and any other change makes it be
+        rebuilt when next used.
+        """
+        if self._rollup is None or (
+                self._rollup.version != event.previous_version):
+            return
+        if event.change == Change.appended:
+            self.extend_rollup(event.previous_version, event.rows,
+                               event.version)
+        else:
+            self._rollup = None
+            self._rollup_modified = False
+
+    def reload(self):
+        """Forget the loaded cache data, so it's read again when next used
+
+        Unsaved changes to it are kept.
+        """
+        if not self._cache_modified:
+            self._cache = None
+
+    def report(self, key):
+        """Get a cached report as a dict of its text and results, or None
+
+        `key` is a JSON-serializable list of everything the report depends
+        on. A hit is just the one file read, with nothing written, so the
+        file's access time is what marks it as used.
+        """
+        try:
+            with open(self._report_filepath(key), 'r') as report_file:
+                report = json.load(report_file)
+                registry.count(Metric.bytes_read, report_file.tell())
+        except (FileNotFoundError, json.decoder.JSONDecodeError):
+            registry.count(Metric.cache_miss)
+            return None
+        registry.count(Metric.cache_hit)
+        return report
+
+    def save_report(self, key, text, results=None):
+        """Cache a report's text and (JSON-serializable) results
+
+        Reports are derived data, like the rollup: a read-only command
+        only writes one after making it, the first time it's asked for at
+        this data version. They can always be made again, so the write
+        isn't synced, and the least recently used ones are evicted to stay
+        under `report_limit` bytes.
+        """
+        os.makedirs(self.report_path, exist_ok=True)
+        write_atomically(self._report_filepath(key),
+                         json.dumps({'key': key, 'text': text,
+                                     'results': results}),
+                         durable=False)
+        self._evict_reports()
+
+    def _report_filepath(self, key):
+        """Get the path of the file a report would be cached in"""
+        digest = hashlib.sha1(json.dumps(key).encode()).hexdigest()
+        return os.path.join(self.report_path, digest + '.json')
+
+    def _evict_reports(self):
+        """Delete the least recently used reports until they fit the limit
+
+        A report was last used when it was last read or written. Where
+        access times aren't kept (or, with relatime, only once a day) this
+        falls back to least recently made first.
+        """
+        reports = []
+        with os.scandir(self.report_path) as entries:
+            for entry in entries:
+                if entry.name.endswith('.json'):
+                    stat = entry.stat()
+                    used = max(stat.st_atime_ns, stat.st_mtime_ns)
+                    reports.append((used, stat.st_size, entry.path))
+        size = sum(report_size for _, report_size, _ in reports)
+        for _, report_size, report_path in sorted(reports):
+            if size <= self.report_limit:
+                break
+            try:
+                os.remove(report_path)
+            except FileNotFoundError:
+                pass
+            size -= report_size
+
+    def _load_rollup(self, version):
+        """Read the persisted rollup if it matches the data version"""
+        try:
+            with open(self.rollup_path, 'r') as rollup_file:
+                frozen = json.load(rollup_file)
+                registry.count(Metric.bytes_read, rollup_file.tell())
+        except (FileNotFoundError, json.decoder.JSONDecodeError):
+            return None
+        if frozen.get('version') != version:
+            return None
+        return Rollup.unfreeze(frozen)
 
     def save(self):
-        """Persist any data that may have changed during runtime"""
-        if self._cache is not None:
-            with open(self.cache_path, 'w') as cache_file:
-                json.dump(self._cache, cache_file)
+        """Persist any data that changed during runtime
+
+        The rollup can always be rebuilt from the data, so its write isn't
+        synced to disk.
+        """
+        if self._cache_modified:
+            write_atomically(self.cache_path, json.dumps(self._cache))
+            self._cache_modified = False
+        if self._rollup_modified and self._rollup is not None:
+            write_atomically(self.rollup_path,
+                             json.dumps(self._rollup.freeze()),
+                             durable=False)
+            self._rollup_modified = False
 
 class ConfigLocations:
     """Enum for the different types of places config can be stored"""
@@ -153,17 +297,21 @@ class ConfigManager:
     CONFIG_FILENAME = 'project.config'
 
     def __init__(self, data_config, cache_config, timeframe=None,
-                 finished_threshold=None):
+                 finished_threshold=None, location=None):
         """Create a new config manager, checking all the default locations
 
         This uses the `_config_location` class method to try to find an
-        existing config location. If no such location exists, or if the data
+        existing config location, unless a (path, location type) `location`
+        found already is given. If no such location exists, or if the data
         there is unreadable, raises an error. Otherwise also initializes the
         data and cache with the init data they store into config (on setup
         or during normal running).
         """
-        self.config_dirpath, self.location_type = self._config_location()
-        self.config_filepath = self._config_filepath()
+        if location is None:
+            location = self._config_location()
+        self.config_dirpath, self.location_type = location
+        self.config_filepath = os.path.join(self.config_dirpath,
+                                            self.CONFIG_FILENAME)
         if timeframe is None:
             timeframe = Timeframe.day
         self.timeframe = timeframe
@@ -172,8 +320,23 @@ class ConfigManager:
         self.finished_threshold = finished_threshold
         self._data_config = data_config
         self._cache_config = cache_config
-        self.data = DataManager(self, **data_config)
-        self.cache = CacheManager(self, **cache_config)
+        self._data = None
+        self._cache = None
+        self._saved = self.freeze()
+
+    @property
+    def data(self):
+        """The data manager, made on first use"""
+        if self._data is None:
+            self._data = data_manager(self, self._data_config)
+        return self._data
+
+    @property
+    def cache(self):
+        """The cache manager, made on first use"""
+        if self._cache is None:
+            self._cache = CacheManager(self, **self._cache_config)
+        return self._cache
 
     @classmethod
     def to_dict(cls, data_config=None, cache_config=None, timeframe=None,
@@ -203,7 +366,7 @@ class ConfigManager:
                             self.finished_threshold.total_seconds())
 
     @classmethod
-    def unfreeze(cls, frozen):
+    def unfreeze(cls, frozen, location=None):
         """Initialize from a frozen dict"""
         timeframe = frozen.get('timeframe')
         finished_threshold = frozen.get('finished_threshold')
@@ -215,15 +378,18 @@ class ConfigManager:
         return cls(data_config,
                    cache_config,
                    timeframe,
-                   finished_threshold)
+                   finished_threshold,
+                   location)
 
     @classmethod
-    def from_file(cls):
-        dirpath = cls._config_location()
-        filepath = cls._config_filepath()
+    def from_file(cls, location=None):
+        if location is None:
+            location = cls._config_location()
+        filepath = os.path.join(location[0], cls.CONFIG_FILENAME)
         try:
             with open(filepath, 'r') as config_file:
                 result = json.load(config_file)
+                registry.count(Metric.bytes_read, config_file.tell())
                 if result is None:
                     raise ValueError('Invalid config')
                 return result
@@ -232,22 +398,25 @@ class ConfigManager:
 
     @classmethod
     def find_config(cls):
-        config = cls.from_file()
-        return cls.unfreeze(config)
+        """Load the config, looking for its location only once"""
+        location = cls._config_location()
+        config = cls.from_file(location)
+        return cls.unfreeze(config, location)
 
     @classmethod
-    def save_dict(cls, config_dict):
-        filepath = cls._config_filepath()
+    def save_dict(cls, config_dict, filepath=None):
+        if filepath is None:
+            filepath = cls._config_filepath()
         with open(filepath, 'r') as config_file:
             contents_dict = json.load(config_file)
+            registry.count(Metric.bytes_read, config_file.tell())
             if contents_dict != config_dict:
                 print('WARNING: overwriting changed data!')
                 print('Pre-overwrite file state:')
                 pprint.pprint(contents_dict)
                 print('Overwriting with:')
                 pprint.pprint(config_dict)
-        with open(filepath, 'w') as config_file:
-            json.dump(config_dict, config_file)
+        write_atomically(filepath, json.dumps(config_dict))
 
     @classmethod
     def merge_config(cls, config_dict):
@@ -257,17 +426,22 @@ class ConfigManager:
         cls.save_dict(old_config)
 
     def save(self):
-        self.save_dict(self.freeze())
-        self.data.save()
-        self.cache.save()
+        """Persist whatever changed during runtime, and nothing else"""
+        frozen = self.freeze()
+        if frozen != self._saved:
+            self.save_dict(frozen, self.config_filepath)
+            self._saved = frozen
+        if self._data is not None:
+            self._data.save()
+        if self._cache is not None:
+            self._cache.save()
 
     @classmethod
     def configure(cls, data_config=None, cache_config=None,
                   timeframe=None, threshold=None):
         config_dict = cls.to_dict(data_config, cache_config, timeframe, threshold)
         if not os.path.isfile(cls._config_filepath()):
-            with open(cls._config_filepath(), 'w') as config_file:
-                json.dump(config_dict, config_file)
+            write_atomically(cls._config_filepath(), json.dumps(config_dict))
         else:
             cls.merge_config(config_dict)
 
@@ -365,10 +539,11 @@ class ConfigManager:
             makedir(cls.GLOBAL_DIRPATH)
 
     @classmethod
-    def setup(cls, config_location_type=None, filepath=None):
+    def setup(cls, config_location_type=None, filepath=None, backend=None):
         """Set up the file structures required to run from scratch
 
-        Can be given a type of config location to set up. Does not
+        Can be given a type of config location to set up, and the storage
+        backend (see `Backend`) a new config's data uses. Does not
         currently overwrite existing files. Not overwriting may cause
         some issues, as proper validation is not yet done so this could
         leave incomplete structures untouched. However it prevents data
@@ -403,7 +578,7 @@ class ConfigManager:
                 print('Invalid config found. Not overwriting.')
                 return
         else:
-            data_init = DataManager.default()
+            data_init = data_manager_class(backend).default()
             cache_init = CacheManager.default()
             data_path = os.path.join(config_dir, cls.DATA_DIRNAME)
             cache_path = os.path.join(config_dir, cls.CACHE_DIRNAME)
@@ -415,5 +590,5 @@ class ConfigManager:
             data_init['path'] = data_path
 
             cls.configure(data_init, cache_init)
-        DataManager.setup(**data_init)
+        data_manager_class(data_init.get('backend')).setup(**data_init)
         CacheManager.setup(**cache_init)
@@ -0,0 +1,237 @@
+"""Reading and writing the files dates are stored in
+
+Frozen DatePoints are stored as csv lines, parsed into `DateStore` rows
+(serially, or in newline-aligned chunks by worker processes for large
+files) and merged as time-ordered streams. Files are replaced atomically,
+and synced when they hold data that can't be rebuilt.
+"""
+import csv
+import gzip
+import heapq
+import os
+import os.path
+
+from date_point import DatePoint, DateStore, NO_END
+from metrics import registry, Metric
+
+def parse_rows(lines, store=None):
+    """Parse csv lines of frozen DatePoints into a `DateStore`
+
+    Rows that aren't frozen DatePoints are skipped.
+    """
+    if store is None:
+        store = DateStore()
+    for row in csv.reader(lines):
+        if row:
+            columns = DatePoint.unfreeze_columns(row[0])
+            if columns is not None:
+                store.append_columns(*columns)
+    return store
+
+def iter_rows(lines):
+    """Lazily parse csv lines of frozen DatePoints into (start, offset, end)
+
+    Rows that aren't frozen DatePoints are skipped.
+    """
+    for columns in iter_columns(lines):
+        yield columns[:3]
+
+def iter_columns(lines):
+    """Lazily parse csv lines of frozen DatePoints into `DateStore` rows
+
+    That is (start, offset, end, end_offset, tag) tuples. Rows that aren't
+    frozen DatePoints are skipped.
+    """
+    for row in csv.reader(lines):
+        if row:
+            columns = DatePoint.unfreeze_columns(row[0])
+            if columns is not None:
+                yield columns
+
+def in_order(rows, name):
+    """Pass rows through, raising a ValueError if they go back in time"""
+    last = -2 ** 63
+    for row in rows:
+        if row[0] < last:
+            raise ValueError('{} is not in time order'.format(name))
+        last = row[0]
+        yield row
+
+def merge_sorted(*streams):
+    """Merge time-ordered streams of rows, dropping exact repeats"""
+    last = None
+    for row in heapq.merge(*streams):
+        if row != last:
+            yield row
+        last = row
+
+# how `merged_rows` marks stored rows, and new rows as they are or cut short
+STORED, NEW, TRIMMED = range(3)
+
+def merged_rows(stored, streams, counts=None):
+    """Merge time-ordered streams of rows into stored ones, dropping overlaps
+
+    A k-way merge, holding only the next row of each stream and the rows
+    around the current time. The `stored` rows are all kept as they are.
+    A row from `streams` with the same times and tag as one already merged
+    is dropped, as is a range inside an earlier one with its tag. A range
+    that partly overlaps one with its tag is cut short around it (in two,
+    if a stored range falls inside it), so no time is counted twice for a
+    tag. Ranges with different tags are left alone. Rows can carry more
+    items after their five columns, which are passed through as they are.
+
+    If given, `counts` gets how many rows from `streams` were added,
+    how many of those were cut short ('trimmed', with each piece of a
+    range cut in two counted) and how many were dropped.
+    """
+    if counts is None:
+        counts = {}
+    for key in ('added', 'trimmed', 'dropped'):
+        counts.setdefault(key, 0)
+    # rows are marked STORED, NEW or TRIMMED, and new ones wait here until
+    # the merge has passed their end, in case a stored range inside them
+    # has to be cut out
+    pending = []
+    seen = set()
+    seen_start = None
+    # the end of the latest range merged per tag
+    covered = {}
+
+    def passed(row, start):
+        return row[0] <= start and (
+            row[-1] == STORED or row[2] == NO_END or row[2] <= start)
+
+    def release(row):
+        if row[-1] != STORED:
+            counts['added'] += 1
+            if row[-1] == TRIMMED:
+                counts['trimmed'] += 1
+        return row[:-1]
+
+    stored = (tuple(row) + (STORED,) for row in stored)
+    streams = [(tuple(row) + (NEW,) for row in stream)
+               for stream in streams]
+    for row in heapq.merge(stored, *streams):
+        start, end, tag = row[0], row[2], row[4]
+        while pending and passed(pending[0], start):
+            yield release(heapq.heappop(pending))
+        if start != seen_start:
+            seen.clear()
+            seen_start = start
+        if row[:5] in seen:
+            counts['dropped'] += row[-1] != STORED
+            continue
+        seen.add(row[:5])
+        if end == NO_END:
+            pass
+        elif row[-1] == STORED:
+            pending = list(cut_out(pending, row, counts))
+            heapq.heapify(pending)
+            covered[tag] = max(covered.get(tag, end), end)
+        else:
+            covered_end = covered.get(tag, NO_END)
+            if end <= covered_end:
+                counts['dropped'] += 1
+                continue
+            if start < covered_end:
+                row = (covered_end,) + row[1:-1] + (TRIMMED,)
+            covered[tag] = end
+        heapq.heappush(pending, row)
+    while pending:
+        yield release(heapq.heappop(pending))
+
+def cut_out(rows, stored, counts):
+    """Cut a stored row's range out of the new (pending) rows with its tag
+
+    For `merged_rows`. The pieces left get the stored row's offsets at the
+    ends that were cut, and a row with nothing left is dropped.
+    """
+    start, offset, end, end_offset, tag = stored[:5]
+    for row in rows:
+        if (row[-1] == STORED or row[4] != tag or row[2] == NO_END or
+                row[2] <= start or row[0] >= end):
+            yield row
+            continue
+        if row[0] >= start and row[2] <= end:
+            counts['dropped'] += 1
+        if row[0] < start:
+            yield row[:2] + (start, offset) + row[4:-1] + (TRIMMED,)
+        if row[2] > end:
+            yield (end, end_offset) + row[2:-1] + (TRIMMED,)
+
+def parse_chunk(filepath, start, end):
+    """Parse the rows between two (newline-aligned) byte offsets of a file
+
+    Runs in a worker process, so it reopens the file itself and sends back
+    a compact `DateStore`.
+    """
+    with open(filepath, 'rb') as data_file:
+        data_file.seek(start)
+        chunk = data_file.read(end - start)
+    return parse_rows(chunk.decode().splitlines())
+
+def chunk_offsets(filepath, size, count):
+    """Split a file into `count` byte ranges that start at line beginnings"""
+    offsets = [0]
+    with open(filepath, 'rb') as data_file:
+        for index in range(1, count):
+            data_file.seek(max(size * index // count - 1, offsets[-1]))
+            data_file.readline()
+            offset = data_file.tell()
+            if offset >= size:
+                break
+            if offset > offsets[-1]:
+                offsets.append(offset)
+    offsets.append(size)
+    return list(zip(offsets, offsets[1:]))
+
+def fsync_file(open_file):
+    """Flush an open file's writes through to disk"""
+    open_file.flush()
+    os.fsync(open_file.fileno())
+    registry.count(Metric.fsyncs)
+
+def fsync_directory(path):
+    """Flush changes to a directory's entries (e.g. a rename) to disk"""
+    directory = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+    registry.count(Metric.fsyncs)
+
+def write_atomically(filepath, text, compress=False, durable=True):
+    """Replace a file's contents by writing a temporary file and renaming it
+
+    The contents can be text or bytes. Readers see either the old or the new
+    contents, never a partial write. If `durable` the new contents are also
+    synced to disk before returning, which derived data that can be rebuilt
+    can skip.
+
+    The temporary file's name has the process ID in it, so processes
+    writing the same file at once each rename a whole file of their own
+    (and the last one wins) rather than writing into one together.
+    """
+    temporary_path = '{}.{}.tmp'.format(filepath, os.getpid())
+    contents = text if isinstance(text, bytes) else text.encode()
+    if compress:
+        contents = gzip.compress(contents)
+    try:
+        with open(temporary_path, 'wb') as temporary_file:
+            temporary_file.write(contents)
+            if durable:
+                fsync_file(temporary_file)
+        os.replace(temporary_path, filepath)
+    except BaseException:
+        try:
+            os.remove(temporary_path)
+        except FileNotFoundError:
+            pass
+        raise
+    registry.count(Metric.bytes_written, len(contents))
+    if durable:
+        fsync_directory(os.path.dirname(os.path.abspath(filepath)))
+
+def frozen_lines(store):
+    """Get the data file contents for the dates in a `DateStore`"""
+    return ''.join(date.freeze() + '\r\n' for date in store)
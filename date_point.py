@@ -1,7 +1,9 @@
 import datetime
+from array import array
+from itertools import islice
 import arrow
 
-from utilities import binary_groupby
+from metrics import registry, Metric
 
 class Timeframe:
     """Enum for possible units of time"""
@@ -16,44 +18,264 @@ class Timeframe:
     @classmethod
     def timeframes(cls):
         return [attribute for attribute in dir(cls)
-                if not attribute.startswith('__')]
+                if not attribute.startswith('__') and attribute != 'timeframes']
+
+# the UNIX epoch, which stored timestamps count microseconds from
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+# `date.toordinal` of the UNIX epoch, so day ordinals match Python's
+EPOCH_ORDINAL = 719163
+# stands in for the end of a non-range DatePoint in integer columns
+NO_END = -2 ** 63
+# the time a non-range DatePoint counts for, in microseconds
+POINT_TIME = 3600 * 10 ** 6
+
+_MICROSECOND = datetime.timedelta(microseconds=1)
+_SECOND = datetime.timedelta(seconds=1)
+_timezones = {}
+
+def _timezone(offset):
+    """Get a shared fixed-offset `tzinfo` for a UTC offset in seconds"""
+    timezone = _timezones.get(offset)
+    if timezone is None:
+        timezone = datetime.timezone(datetime.timedelta(seconds=offset))
+        _timezones[offset] = timezone
+    return timezone
+
+def _to_datetime(timestamp, offset):
+    """Get the aware datetime for epoch microseconds and a UTC offset"""
+    return (EPOCH + timestamp * _MICROSECOND).astimezone(_timezone(offset))
+
+def _from_datetime(value):
+    """Get epoch microseconds and UTC offset (seconds) for a datetime
+
+    Naive datetimes are taken to be in UTC, as `arrow.get` does.
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return (value - EPOCH) // _MICROSECOND, value.utcoffset() // _SECOND
+
+def _parse_date(value):
+    """Get epoch microseconds and UTC offset from any date-like object
+
+    ISO 8601 strings (what `DatePoint.freeze` writes) and datetimes are
+    converted directly, anything else goes through `arrow.get`.
+    """
+    if isinstance(value, str):
+        try:
+            return _from_datetime(datetime.datetime.fromisoformat(value))
+        except ValueError:
+            pass
+    elif isinstance(value, datetime.datetime):
+        return _from_datetime(value)
+    elif isinstance(value, arrow.Arrow):
+        return _from_datetime(value.datetime)
+    registry.count(Metric.arrow_get)
+    return _from_datetime(arrow.get(value).datetime)
+
+def civil_from_days(days):
+    """Get the (year, month, day) of a count of days since the UNIX epoch
+
+    Integer-only proleptic Gregorian conversion, see Howard Hinnant's
+    "chrono-Compatible Low-Level Date Algorithms".
+    """
+    days += 719468
+    era = days // 146097
+    day_of_era = days - era * 146097
+    year_of_era = (day_of_era - day_of_era // 1460 + day_of_era // 36524
+                   - day_of_era // 146096) // 365
+    day_of_year = day_of_era - (365 * year_of_era + year_of_era // 4
+                                - year_of_era // 100)
+    shifted_month = (5 * day_of_year + 2) // 153
+    day = day_of_year - (153 * shifted_month + 2) // 5 + 1
+    month = shifted_month + 3 if shifted_month < 10 else shifted_month - 9
+    return year_of_era + era * 400 + (month <= 2), month, day
+
+def _days_from_civil(year, month, day):
+    """Get the count of days since the UNIX epoch of a Gregorian date"""
+    year -= month <= 2
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month - 3 if month > 2 else month + 9) + 2) // 5 + day - 1
+    day_of_era = (year_of_era * 365 + year_of_era // 4 - year_of_era // 100
+                  + day_of_year)
+    return era * 146097 + day_of_era - 719468
+
+def timeframe_ordinal(timestamp, offset, timeframe):
+    """Get the ordinal of a timeframe from epoch microseconds and UTC offset
+
+    The integer kernel behind `DatePoint.ordinal`. Timeframes of an hour or
+    longer are taken in local time (per the offset), while minutes and
+    seconds count from the epoch. Every timeframe counts continuously, so
+    e.g. the last week of one year and the first of the next differ by one.
+    Weeks start on Monday, like ISO weeks.
+    """
+    seconds = timestamp // 1000000
+    if timeframe == Timeframe.second:
+        return seconds
+    elif timeframe == Timeframe.minute:
+        return seconds // 60
+    local = seconds + offset
+    if timeframe == Timeframe.hour:
+        return local // 3600 + EPOCH_ORDINAL * 24
+    days = local // 86400
+    if timeframe == Timeframe.day:
+        return days + EPOCH_ORDINAL
+    elif timeframe == Timeframe.week:
+        # the epoch was a Thursday, 3 days after the Monday its week started
+        return (days + 3) // 7
+    year, month, _ = civil_from_days(days)
+    if timeframe == Timeframe.month:
+        return year * 12 + month
+    elif timeframe == Timeframe.year:
+        return year
+
+def timeframe_start(ordinal, offset, timeframe):
+    """Get the epoch microseconds a timeframe ordinal starts at
+
+    The inverse of `timeframe_ordinal` for the first moment of the frame,
+    in local time for the given UTC offset.
+    """
+    if timeframe == Timeframe.second:
+        return ordinal * 1000000
+    elif timeframe == Timeframe.minute:
+        return ordinal * 60000000
+    elif timeframe == Timeframe.hour:
+        local = (ordinal - EPOCH_ORDINAL * 24) * 3600
+    elif timeframe == Timeframe.day:
+        local = (ordinal - EPOCH_ORDINAL) * 86400
+    elif timeframe == Timeframe.week:
+        local = (ordinal * 7 - 3) * 86400
+    elif timeframe == Timeframe.month:
+        year, month = divmod(ordinal - 1, 12)
+        local = _days_from_civil(year, month + 1, 1) * 86400
+    elif timeframe == Timeframe.year:
+        local = _days_from_civil(ordinal, 1, 1) * 86400
+    return (local - offset) * 1000000
+
+def frame_day(ordinal, timeframe):
+    """Get the (proleptic Gregorian) ordinal of the day a frame starts on"""
+    return timeframe_start(ordinal, 0, timeframe) // 86400000000 + EPOCH_ORDINAL
+
+def day_frame(day, timeframe):
+    """Get the ordinal of the frame a day (by its ordinal) starts in"""
+    return timeframe_ordinal((day - EPOCH_ORDINAL) * 86400000000, 0,
+                             timeframe)
+
+def _floor_datetime(value, timeframe):
+    """Get the start of the timeframe a datetime is in"""
+    if timeframe == Timeframe.year:
+        return value.replace(month=1, day=1, hour=0, minute=0, second=0,
+                             microsecond=0)
+    elif timeframe == Timeframe.month:
+        return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    elif timeframe == Timeframe.week:
+        value = value - datetime.timedelta(days=value.weekday())
+        return value.replace(hour=0, minute=0, second=0, microsecond=0)
+    elif timeframe == Timeframe.day:
+        return value.replace(hour=0, minute=0, second=0, microsecond=0)
+    elif timeframe == Timeframe.hour:
+        return value.replace(minute=0, second=0, microsecond=0)
+    elif timeframe == Timeframe.minute:
+        return value.replace(second=0, microsecond=0)
+    elif timeframe == Timeframe.second:
+        return value.replace(microsecond=0)
+
+def _shift_datetime(value, timeframe):
+    """Move a datetime forward by one of a timeframe"""
+    if timeframe == Timeframe.year:
+        return value.replace(year=value.year + 1)
+    elif timeframe == Timeframe.month:
+        if value.month == 12:
+            return value.replace(year=value.year + 1, month=1)
+        return value.replace(month=value.month + 1)
+    elif timeframe == Timeframe.week:
+        return value + datetime.timedelta(weeks=1)
+    return value + datetime.timedelta(**{timeframe + 's': 1})
 
 class DatePoint:
-    """Wrapper around dates and date ranges"""
+    """Wrapper around dates and date ranges
+
+    Stored compactly as integers: the start (and end, for ranges) in
+    microseconds since the UNIX epoch, each with the UTC offset in seconds
+    it was recorded with. Arrow and datetime objects are only made when asked
+    for, so large numbers of DatePoints stay cheap.
+
+    A DatePoint can also carry a tag, the integer ID of a name interned by
+    `DataManager` (0 for untagged). It's frozen after `TAG_CHAR`, and left
+    out entirely when 0, so untagged dates freeze the same as they always
+    have.
+    """
+    __slots__ = ('_start', '_offset', '_end', '_end_offset', '_tag')
 
     RANGE_INDICATORS = ('0', '1')
     SEPERATOR_CHAR = ' '
+    TAG_CHAR = '#'
 
     def __init__(self, first_date, second_date=None):
         """Create a new DatePoint from one or a pair of objects
 
         Possibilities: strings, Arrow dates, datetimes, DatePoint objects
         """
-        self._is_range = second_date is not None
+        registry.count(Metric.datepoint_created)
+        self._end = self._end_offset = None
+        self._tag = 0
         if isinstance(first_date, DatePoint):
-            self._first_date = first_date._first_date
+            self._start, self._offset = first_date._start, first_date._offset
+            self._tag = first_date._tag
             if first_date.is_range:
-                self._is_range = True
-                self._second_date = first_date._second_date
+                self._end = first_date._end
+                self._end_offset = first_date._end_offset
         else:
-            self._first_date = arrow.get(first_date)
+            self._start, self._offset = _parse_date(first_date)
 
         if isinstance(second_date, DatePoint):
-            self._second_date = second_date._first_date
+            self._end, self._end_offset = second_date._start, second_date._offset
         elif second_date is not None:
-            self._second_date = arrow.get(second_date)
+            self._end, self._end_offset = _parse_date(second_date)
+
+    @classmethod
+    def from_timestamps(cls, start, offset, end=None, end_offset=None, tag=0):
+        """Create a DatePoint directly from its integer representation"""
+        registry.count(Metric.datepoint_created)
+        datepoint = cls.__new__(cls)
+        datepoint._start = start
+        datepoint._offset = offset
+        datepoint._end = end
+        datepoint._end_offset = end_offset
+        datepoint._tag = tag
+        return datepoint
 
     @property
     def is_range(self):
         """Whether this is a range of dates or a single date"""
-        return self._is_range
+        return self._end is not None
+
+    @property
+    def end(self):
+        """The end of a range as a DatePoint, or this date if not a range"""
+        if self._end is None:
+            return self
+        return DatePoint.from_timestamps(self._end, self._end_offset,
+                                         tag=self._tag)
+
+    @property
+    def tag(self):
+        """The ID of this date's tag, or 0 if it has none"""
+        return self._tag
+
+    def tagged(self, tag):
+        """Get a copy of this date with a different tag ID"""
+        return DatePoint.from_timestamps(self._start, self._offset, self._end,
+                                         self._end_offset, tag)
 
     def freeze(self):
         """Return serialized string or byte version of self"""
         header = self.RANGE_INDICATORS[self.is_range]
-        body = str(self._first_date)
+        body = self._datetime().isoformat()
         if self.is_range:
-            body += self.SEPERATOR_CHAR + str(self._second_date)
+            body += self.SEPERATOR_CHAR + self._datetime(False).isoformat()
+        if self._tag:
+            body += self.TAG_CHAR + str(self._tag)
         return header + body
 
     @classmethod
@@ -63,16 +285,47 @@ class DatePoint:
             is_range = cls.RANGE_INDICATORS.index(frozen[0])
         except ValueError:
             return
-        first_date = frozen[1:]
+        first_date, _, tag = frozen[1:].partition(cls.TAG_CHAR)
         second_date = None
         if is_range:
             first_date, second_date = first_date.split(cls.SEPERATOR_CHAR)
-        return cls(first_date, second_date)
+        date = cls(first_date, second_date)
+        if tag:
+            date._tag = int(tag)
+        return date
+
+    @classmethod
+    def unfreeze_columns(cls, frozen):
+        """Get the integer representation of a frozen DatePoint directly
+
+        Returns (start, offset, end, end_offset, tag) as kept by
+        `DateStore`, with `NO_END` and 0 as the end of non-ranges, or None
+        if `frozen` isn't a frozen DatePoint. Avoids creating a DatePoint
+        per row.
+        """
+        try:
+            is_range = cls.RANGE_INDICATORS.index(frozen[0])
+        except (ValueError, IndexError):
+            return None
+        tag = 0
+        if cls.TAG_CHAR in frozen:
+            frozen, tag = frozen.split(cls.TAG_CHAR)
+            tag = int(tag)
+        if is_range:
+            first_date, second_date = frozen[1:].split(cls.SEPERATOR_CHAR)
+            return _parse_date(first_date) + _parse_date(second_date) + (tag,)
+        return _parse_date(frozen[1:]) + (NO_END, 0, tag)
 
     @classmethod
     def now(cls):
         """Get the current point in time as a DatePoint"""
-        return cls(arrow.now())
+        return cls(datetime.datetime.now().astimezone())
+
+    def _datetime(self, use_start=True):
+        """The aware `datetime.datetime` of the start or end of this"""
+        if use_start:
+            return _to_datetime(self._start, self._offset)
+        return _to_datetime(self._end, self._end_offset)
 
     def ordinal(self, timeframe=Timeframe.day, use_start=True):
         """Get an absolute version of the specified timeframe
@@ -86,22 +339,9 @@ class DatePoint:
         for comparison, for telling exactly the difference in whatever unit
         there are between two DatePoints
         """
-        date = self._first_date if use_start else self._second_date
-        if timeframe == Timeframe.year:
-            return date.year
-        elif timeframe == Timeframe.month:
-            return date.year * 12 + date.month
-        elif timeframe == Timeframe.week:
-            iso = date.isocalendar()
-            return iso[1]
-        elif timeframe == Timeframe.day:
-            return date.toordinal()
-        elif timeframe == Timeframe.hour:
-            return date.toordinal() * 24 + date.hour
-        elif timeframe == Timeframe.minute:
-            return date.timestamp // 60
-        elif timeframe == Timeframe.second:
-            return date.timestamp
+        if use_start:
+            return timeframe_ordinal(self._start, self._offset, timeframe)
+        return timeframe_ordinal(self._end, self._end_offset, timeframe)
 
     def same(self, other, timeframe=Timeframe.day):
         """If two DatePoints occurred in the same timeframe"""
@@ -124,27 +364,29 @@ class DatePoint:
         return self.ordinal(timeframe) < other.ordinal(timeframe)
 
     def floor(self, timeframe):
-        return self._first_date.floor(timeframe)
+        return arrow.Arrow.fromdatetime(
+            _floor_datetime(self._datetime(), timeframe))
 
     @property
     def date(self):
         """The 'date' version of this DatePoint, i.e. without time info"""
-        return DatePoint(arrow.get(self._first_date.date()))
+        return DatePoint(datetime.datetime.combine(
+            self.datetime_date, datetime.time(), datetime.timezone.utc))
 
     @property
     def datetime_date(self):
         """The `datetime.date` of this DatePoint"""
-        return self._first_date.date()
+        return self._datetime().date()
 
     @property
     def time(self):
         """The `datetime.time` of this DatePoint"""
-        return self._first_date.time()
+        return self._datetime().time()
 
     @property
     def arrow(self):
         """The `arrow.Arrow` version of this DatePoint"""
-        return self._first_date
+        return arrow.Arrow.fromdatetime(self._datetime())
 
     @property
     def total_time(self):
@@ -154,8 +396,8 @@ class DatePoint:
         information being stored here is probably a bad idea and should
         be decoupled."""
         if self.is_range:
-            return self._second_date - self._first_date
-        return datetime.timedelta(hours=1)
+            return (self._end - self._start) * _MICROSECOND
+        return POINT_TIME * _MICROSECOND
 
     def included(self, date_list, timeframe=Timeframe.day):
         """Return whether the timeframe of this date is included in the list"""
@@ -164,84 +406,255 @@ class DatePoint:
     def split_range(self, timeframe=Timeframe.day):
         """Split a range that extends over multiple timefames"""
         assert self.is_range
-        first, second = self._first_date, self._first_date.ceil(timeframe)
-        while second < self._second_date:
-            yield DatePoint(first, second)
-            first = second + datetime.timedelta(microseconds=1)
-            second = first.ceil(timeframe)
-        yield DatePoint(first, self._second_date)
+        end = self._datetime(False)
+        first = self._datetime()
+        second = _shift_datetime(_floor_datetime(first, timeframe),
+                                 timeframe) - _MICROSECOND
+        while second < end:
+            yield DatePoint(first, second).tagged(self._tag)
+            first = second + _MICROSECOND
+            second = _shift_datetime(first, timeframe) - _MICROSECOND
+        yield DatePoint(first, end).tagged(self._tag)
 
     def __eq__(self, other):
         """Compare to other, equal if dates compare equal"""
-        if self._is_range != other._is_range:
+        if self.is_range != other.is_range:
             return False
-        return (self._first_date == other._first_date and
-                self._second_date == other._second_date)
+        return self._start == other._start and self._end == other._end
 
     def __sub__(self, other):
         """Get the difference between two dates as a `timedelta`"""
-        return self._first_date - other._first_date
+        return (self._start - other._start) * _MICROSECOND
 
     def __gt__(self, other):
         """Check whether this date comes after another (no timeframe)"""
-        return self._first_date > other._first_date
+        return self._start > other._start
+
+    def __lt__(self, other):
+        """Check whether this date comes before another (no timeframe)"""
+        return self._start < other._start
 
     def __str__(self):
         """Get this DatePoint formatted as a string"""
         if self.is_range:
-            return '{} to {}'.format(self._first_date, self._second_date)
-        return str(self._first_date)
+            return '{} to {}'.format(self._datetime().isoformat(),
+                                     self._datetime(False).isoformat())
+        return self._datetime().isoformat()
 
     def __repr__(self):
         """Get a representation of this DatePoint"""
         return self.freeze()
 
+class DateStore:
+    """Compact column storage for a sequence of DatePoints
+
+    Holds the integer representation of each DatePoint in `array` columns
+    rather than one object per point, and acts as a sequence of DatePoints
+    that are created on access. `TimeframeGroup`s are index ranges into one
+    of these.
+    """
+    def __init__(self, dates=()):
+        """Create a store, optionally filled from an iterable of DatePoints"""
+        self.starts = array('q')
+        self.offsets = array('i')
+        self.ends = array('q')
+        self.end_offsets = array('i')
+        self.tags = array('i')
+        self._ordinals = {}
+        self.extend(dates)
+
+    @classmethod
+    def concatenate(cls, stores):
+        """Create a store of the dates of several stores, in order"""
+        result = cls()
+        for store in stores:
+            result.starts.extend(store.starts)
+            result.offsets.extend(store.offsets)
+            result.ends.extend(store.ends)
+            result.end_offsets.extend(store.end_offsets)
+            result.tags.extend(store.tags)
+        return result
+
+    def sliced(self, start_index=0, end_index=None):
+        """Get a new store of the dates in an index range"""
+        result = DateStore()
+        result.starts = self.starts[start_index:end_index]
+        result.offsets = self.offsets[start_index:end_index]
+        result.ends = self.ends[start_index:end_index]
+        result.end_offsets = self.end_offsets[start_index:end_index]
+        result.tags = self.tags[start_index:end_index]
+        return result
+
+    def append(self, date):
+        """Add a DatePoint to the end of the store"""
+        if date.is_range:
+            self.append_columns(date._start, date._offset,
+                                date._end, date._end_offset, date._tag)
+        else:
+            self.append_columns(date._start, date._offset, NO_END, 0,
+                                date._tag)
+
+    def append_columns(self, start, offset, end, end_offset, tag=0):
+        """Add a date in its integer representation to the end of the store"""
+        self.starts.append(start)
+        self.offsets.append(offset)
+        self.ends.append(end)
+        self.end_offsets.append(end_offset)
+        self.tags.append(tag)
+        for timeframe, ordinals in self._ordinals.items():
+            ordinals.append(timeframe_ordinal(start, offset, timeframe))
+
+    def extend(self, dates):
+        """Add every DatePoint in an iterable to the end of the store"""
+        for date in dates:
+            self.append(date)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Create a store from (start, offset, end, end_offset, tag) tuples"""
+        store = cls()
+        for row in rows:
+            store.append_columns(*row)
+        return store
+
+    def rows(self):
+        """Iterate over the dates as (start, offset, end, end_offset, tag)"""
+        return zip(self.starts, self.offsets, self.ends, self.end_offsets,
+                   self.tags)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, index):
+        """Get the DatePoint at an index, or a list of them for a slice"""
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        end = self.ends[index]
+        if end == NO_END:
+            return DatePoint.from_timestamps(self.starts[index],
+                                             self.offsets[index],
+                                             tag=self.tags[index])
+        return DatePoint.from_timestamps(self.starts[index],
+                                         self.offsets[index],
+                                         end, self.end_offsets[index],
+                                         self.tags[index])
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def ordinals(self, timeframe):
+        """Get the column of start ordinals for a timeframe
+
+        Computed once per timeframe and then kept up to date on append, so
+        grouping and comparisons never go back through DatePoint objects.
+        """
+        ordinals = self._ordinals.get(timeframe)
+        if ordinals is None:
+            ordinals = array('q', (
+                timeframe_ordinal(start, offset, timeframe)
+                for start, offset in zip(self.starts, self.offsets)))
+            self._ordinals[timeframe] = ordinals
+        return ordinals
+
+    def total_time(self, start_index=0, end_index=None):
+        """Get the total time of the DatePoints in an index range"""
+        starts = islice(self.starts, start_index, end_index)
+        ends = islice(self.ends, start_index, end_index)
+        total = sum(POINT_TIME if end == NO_END else end - start
+                    for start, end in zip(starts, ends))
+        return total * _MICROSECOND
+
 class TimeframeGroup(DatePoint):
     """A group of DatePoints in a single timeframe
 
     A TimeframeGroup inherits from DatePoint and in most ways can be treated
-    like one. It differs in that it stores a list of DatePoints rather than
-    one or two `arrow.Arrow` dates. It uses the timeframe floor of the
-    first component date for all DatePoint operations that require a
-    `_first_date`.
+    like one. It differs in that it refers to a run of DatePoints in a
+    `DateStore` (by start and end index) rather than storing dates itself.
+    It uses the timeframe floor of the first component date for all
+    DatePoint operations.
 
     Used in various places in `Project` when the individual DatePoints in a
     timeframe aren't as relevant as the aggregate information.
     """
-    def __init__(self, date_list, timeframe=Timeframe.day):
-        """Create a new group from a list of dates in the same timeframe"""
-        assert len(date_list) > 0
-        self.date_list = date_list
+    __slots__ = ('_store', '_start_index', '_end_index', '_ordinal',
+                 '_total', 'timeframe')
+
+    def __init__(self, date_list, timeframe=Timeframe.day,
+                 start_index=0, end_index=None, ordinal=None, offset=None,
+                 total=None):
+        """Create a new group from dates in the same timeframe
+
+        `date_list` is either a `DateStore` (or other store) that the group
+        will be a view of from `start_index` to `end_index`, or a list of
+        DatePoints to copy. If the group's ordinal, the UTC offset of its
+        first date and its total (in microseconds) are already known, e.g.
+        from a `Rollup`, they can be passed in and the store isn't touched
+        until the component dates are asked for.
+        """
+        if isinstance(date_list, list):
+            date_list = DateStore(date_list)
+        if end_index is None:
+            end_index = len(date_list)
+        assert end_index > start_index
+        self._store = date_list
+        self._start_index = start_index
+        self._end_index = end_index
         self.timeframe = timeframe
-        self.group_date = DatePoint(date_list[0].floor(timeframe))
+        if ordinal is None:
+            ordinal = date_list.ordinals(timeframe)[start_index]
+            offset = date_list.offsets[start_index]
+        self._ordinal = ordinal
+        self._offset = offset
+        self._start = timeframe_start(ordinal, offset, timeframe)
+        self._end = self._end_offset = None
+        self._tag = 0
+        self._total = total
 
     @classmethod
     def group_timeframes(cls, datepoint_list, timeframe=Timeframe.day):
         """Group a list of DatePoints by the timeframe they occurred on
 
-        This will return a list of lists. Each of those lists could be
-        validly used to construct a TimeframeGroup.
+        Returns a list of TimeframeGroups, one per run of dates in the same
+        timeframe, all sharing one `DateStore`.
         """
-        return [cls(dates) for dates in
-                binary_groupby(datepoint_list,
-                               lambda x, y: x.same(y, timeframe))]
-
-    @property
-    def total_time(self):
-        """Get the total time from all component DatePoints"""
-        return sum((date.total_time for date in self.date_list),
-                   datetime.timedelta())
+        if isinstance(datepoint_list, DateStore):
+            store = datepoint_list
+        else:
+            store = DateStore(datepoint_list)
+        ordinals = store.ordinals(timeframe)
+        groups = []
+        start_index = 0
+        for index in range(1, len(ordinals)):
+            if ordinals[index] != ordinals[index - 1]:
+                groups.append(cls(store, timeframe, start_index, index))
+                start_index = index
+        if len(store):
+            groups.append(cls(store, timeframe, start_index, len(store)))
+        return groups
 
     def ordinal(self, timeframe=Timeframe.day, use_start=None):
-        """Gets the 'prototypical' timeframe's ordinal value"""
-        return self.group_date.ordinal(timeframe)
+        """Gets the 'prototypical' timeframe's ordinal value
+
+        Precomputed for the group's own timeframe.
+        """
+        if timeframe == self.timeframe:
+            return self._ordinal
+        return DatePoint.ordinal(self, timeframe)
 
     @property
-    def is_range(self):
-        """TimeframeGroups are not ranges for the purpose of DatePoint methods"""
-        return False
+    def date_list(self):
+        """The component DatePoints of this group"""
+        return self._store[self._start_index:self._end_index]
+
+    @property
+    def group_date(self):
+        """The floor of the group's timeframe as a plain DatePoint"""
+        return DatePoint.from_timestamps(self._start, self._offset)
 
     @property
-    def _first_date(self):
-        """Return prototypical day for DatePoint compatibility"""
-        return self.group_date._first_date
+    def total_time(self):
+        """Get the total time from all component DatePoints"""
+        if self._total is not None:
+            return self._total * _MICROSECOND
+        return self._store.total_time(self._start_index, self._end_index)
@@ -0,0 +1,112 @@
+"""Typed events for changes to the stored dates
+
+The data managers publish a `DataEvent` on their `EventBus` for every change
+to the dates they store, whether made through them or (seen by `follow`)
+by another process. Anything derived from the data, like the `Rollup` the
+`CacheManager` keeps, can subscribe and apply appended rows as a delta
+instead of rebuilding, and only has to start over after other changes.
+Working out an event costs a look at the data's version before and after,
+so nothing is published while there are no subscribers.
+"""
+from date_point import DateStore
+
+
+class Change:
+    """Enum for the kinds of change to the stored dates"""
+    appended = 'appended' # new dates, all starting after the stored ones
+    rewrite = 'rewrite' # anything else, e.g. dates stored out of order
+    truncation = 'truncation' # dates removed from the end of the data
+
+
+class DataEvent:
+    """A change to the stored dates, between two versions of the data
+
+    Appended changes have the new rows as a `DateStore` in `rows`, in time
+    order. Other changes don't say which dates changed.
+    """
+    __slots__ = ('change', 'rows', 'previous_version', 'version')
+
+    def __init__(self, change, rows=None, previous_version=None,
+                 version=None):
+        self.change = change
+        self.rows = rows
+        self.previous_version = previous_version
+        self.version = version
+
+    def then(self, other):
+        """Get the event for this change followed by another
+
+        Two appends are one append of both their rows (if the second
+        follows on from the first), two truncations one truncation, and
+        anything else a rewrite.
+        """
+        change = Change.rewrite
+        rows = None
+        if (self.change == other.change == Change.appended and
+                self.version == other.previous_version):
+            change = Change.appended
+            rows = DateStore.concatenate([self.rows, other.rows])
+        elif self.change == other.change == Change.truncation:
+            change = Change.truncation
+        return DataEvent(change, rows, self.previous_version, other.version)
+
+    def __repr__(self):
+        return 'DataEvent({!r}, {} rows, {!r} -> {!r})'.format(
+            self.change, None if self.rows is None else len(self.rows),
+            self.previous_version, self.version)
+
+
+class EventBus:
+    """Hands published events to each subscriber in turn
+
+    A subscriber is any callable taking a `DataEvent`.
+    """
+    def __init__(self):
+        self.subscribers = []
+
+    def subscribe(self, subscriber):
+        """Start handing events to a subscriber, unless it gets them already"""
+        if subscriber not in self.subscribers:
+            self.subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """Stop handing events to a subscriber"""
+        if subscriber in self.subscribers:
+            self.subscribers.remove(subscriber)
+
+    def publish(self, event):
+        """Hand an event to every subscriber"""
+        for subscriber in list(self.subscribers):
+            subscriber(event)
+
+
+class Coalescer:
+    """Subscriber that holds a burst of events to pass on as one
+
+    Events are combined (see `DataEvent.then`) until `flush`, which hands
+    the combined event to `subscriber`. Used as a context manager it
+    flushes on exit, e.g. to apply a run of appends in one go.
+    """
+    def __init__(self, subscriber):
+        self.subscriber = subscriber
+        self.pending = None
+
+    def __call__(self, event):
+        if self.pending is None:
+            self.pending = event
+        else:
+            self.pending = self.pending.then(event)
+
+    def flush(self):
+        """Pass on the events held since the last flush, if any, as one"""
+        event, self.pending = self.pending, None
+        if event is not None:
+            self.subscriber(event)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.flush()
+
@@ -0,0 +1,248 @@
+"""A small expression language for picking out frames and streaks
+
+For example `weekday in (sat, sun) and total > 2h and date >= 2025-01-01`.
+An expression is compiled once into a `Filter`, a predicate over integers:
+the ordinal of the day a frame (or streak) starts on, its total time in
+microseconds and its length in frames. Comparisons on `date` that every
+match has to pass are also taken out as day bounds, so callers can bisect
+their sorted ordinals down to the matching range before testing anything.
+
+Fields:
+    date      the day the frame or streak starts, as YYYY-MM-DD
+    weekday   the weekday of that day, mon to sun
+    month     the month of that day, jan to dec or 1 to 12
+    year      the year of that day
+    total     the time in it, e.g. 45m, 2h, 1h30m or 90s
+    length    how many frames (streaks; always 1 for a frame)
+
+Comparisons are `=`, `!=`, `<`, `<=`, `>`, `>=`, `in (...)` and
+`not in (...)`, and can be combined with `and`, `or`, `not` and parentheses.
+"""
+import datetime
+import operator
+import re
+
+from date_point import EPOCH_ORDINAL, civil_from_days
+
+
+class FilterError(ValueError):
+    """An expression that can't be parsed or compiled"""
+
+
+WEEKDAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+MONTHS = ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep',
+          'oct', 'nov', 'dec')
+# microseconds per duration unit
+UNITS = {'h': 3600000000, 'm': 60000000, 's': 1000000}
+
+COMPARISONS = {'=': operator.eq, '==': operator.eq, '!=': operator.ne,
+               '<': operator.lt, '<=': operator.le, '>': operator.gt,
+               '>=': operator.ge}
+
+# value getters for each field, from (day ordinal, total, length)
+FIELDS = {
+    'date': lambda day, total, length: day,
+    'weekday': lambda day, total, length: (day - 1) % 7,
+    'month': lambda day, total, length: civil_from_days(day - EPOCH_ORDINAL)[1],
+    'year': lambda day, total, length: civil_from_days(day - EPOCH_ORDINAL)[0],
+    'total': lambda day, total, length: total,
+    'length': lambda day, total, length: length,
+}
+
+TOKEN = re.compile(r'''\s*(?:
+    (?P<date>\d{4}-\d{2}-\d{2})
+  | (?P<duration>(?:\d+(?:\.\d+)?[hms])+)
+  | (?P<number>\d+)
+  | (?P<symbol><=|>=|!=|==|=|<|>|\(|\)|,)
+  | (?P<word>[A-Za-z_]+)
+)''', re.VERBOSE)
+
+
+def tokenize(expression):
+    """Split an expression into (kind, text) tokens"""
+    tokens = []
+    position = 0
+    expression = expression.strip()
+    while position < len(expression):
+        match = TOKEN.match(expression, position)
+        if match is None or match.end() == position:
+            raise FilterError('unexpected {!r} in filter'.format(
+                expression[position:].strip()[:10]))
+        kind = match.lastgroup
+        text = match.group(kind)
+        tokens.append((kind, text.lower() if kind == 'word' else text))
+        position = match.end()
+    return tokens
+
+
+def parse_value(field, kind, text):
+    """Turn a literal into the integer a field compares against"""
+    if field == 'date' and kind == 'date':
+        try:
+            return datetime.date.fromisoformat(text).toordinal()
+        except ValueError:
+            raise FilterError('invalid date {}'.format(text))
+    if field == 'total' and kind == 'duration':
+        return sum(int(float(amount) * UNITS[unit])
+                   for amount, unit in re.findall(r'(\d+(?:\.\d+)?)([hms])',
+                                                  text))
+    if field == 'weekday' and text in WEEKDAYS:
+        return WEEKDAYS.index(text)
+    if field == 'month' and text in MONTHS:
+        return MONTHS.index(text) + 1
+    if field in ('month', 'year', 'length') and kind == 'number':
+        return int(text)
+    raise FilterError('invalid value {} for {}'.format(text, field))
+
+
+class Parser:
+    """Recursive descent parser from tokens to a tree of tuples
+
+    Nodes are ('and', [nodes]), ('or', [nodes]), ('not', node),
+    ('compare', field, operator, value) and ('in', field, values).
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return (None, None)
+
+    def take(self, text=None):
+        kind, value = self.peek()
+        if kind is None or text is not None and value != text:
+            raise FilterError('expected {} in filter'.format(
+                text or 'more'))
+        self.position += 1
+        return kind, value
+
+    def parse(self):
+        node = self.disjunction()
+        if self.peek()[0] is not None:
+            raise FilterError('unexpected {} in filter'.format(self.peek()[1]))
+        return node
+
+    def disjunction(self):
+        nodes = [self.conjunction()]
+        while self.peek() == ('word', 'or'):
+            self.take()
+            nodes.append(self.conjunction())
+        return nodes[0] if len(nodes) == 1 else ('or', nodes)
+
+    def conjunction(self):
+        nodes = [self.negation()]
+        while self.peek() == ('word', 'and'):
+            self.take()
+            nodes.append(self.negation())
+        return nodes[0] if len(nodes) == 1 else ('and', nodes)
+
+    def negation(self):
+        if self.peek() == ('word', 'not'):
+            self.take()
+            return ('not', self.negation())
+        if self.peek() == ('symbol', '('):
+            self.take()
+            node = self.disjunction()
+            self.take(')')
+            return node
+        return self.comparison()
+
+    def comparison(self):
+        kind, field = self.take()
+        if kind != 'word' or field not in FIELDS:
+            raise FilterError('unknown field {}'.format(field))
+        kind, text = self.take()
+        if (kind, text) == ('word', 'not'):
+            self.take('in')
+            return ('not', ('in', field, self.values(field)))
+        if (kind, text) == ('word', 'in'):
+            return ('in', field, self.values(field))
+        if text not in COMPARISONS:
+            raise FilterError('expected a comparison after {}'.format(field))
+        return ('compare', field, text, parse_value(field, *self.take()))
+
+    def values(self, field):
+        self.take('(')
+        values = [parse_value(field, *self.take())]
+        while self.peek() == ('symbol', ','):
+            self.take()
+            values.append(parse_value(field, *self.take()))
+        self.take(')')
+        return frozenset(values)
+
+
+def predicate(node):
+    """Compile a node into a function of (day ordinal, total, length)
+
+    Chains of `and`/`or` are folded pairwise into plain short-circuiting
+    functions, which are much cheaper to call than `all`/`any`.
+    """
+    kind = node[0]
+    if kind in ('and', 'or'):
+        parts = [predicate(child) for child in node[1]]
+        result = parts[0]
+        for part in parts[1:]:
+            result = (_both if kind == 'and' else _either)(result, part)
+        return result
+    if kind == 'not':
+        part = predicate(node[1])
+        return lambda day, total, length: not part(day, total, length)
+    getter = FIELDS[node[1]]
+    if kind == 'in':
+        values = node[2]
+        return lambda day, total, length: getter(day, total, length) in values
+    compare = COMPARISONS[node[2]]
+    value = node[3]
+    return lambda day, total, length: compare(getter(day, total, length), value)
+
+
+def _both(first, second):
+    return lambda day, total, length: (first(day, total, length) and
+                                       second(day, total, length))
+
+
+def _either(first, second):
+    return lambda day, total, length: (first(day, total, length) or
+                                       second(day, total, length))
+
+
+class Filter:
+    """A compiled filter expression
+
+    `low_day` and `high_day` are inclusive bounds on the day ordinal of
+    anything that matches (or None), and `matches` checks the rest.
+    """
+
+    def __init__(self, expression):
+        node = Parser(tokenize(expression)).parse()
+        self.expression = expression
+        self.low_day = self.high_day = None
+        conjuncts = node[1] if node[0] == 'and' else [node]
+        rest = [conjunct for conjunct in conjuncts
+                if not self._push_down(conjunct)]
+        self._predicate = predicate(('and', rest)) if rest else None
+
+    def _push_down(self, node):
+        """Narrow the day bounds by a date comparison, if `node` is one"""
+        if node[0] != 'compare' or node[1] != 'date' or node[2] == '!=':
+            return False
+        comparison, day = node[2], node[3]
+        if comparison in ('>', '>=', '=', '=='):
+            low = day + 1 if comparison == '>' else day
+            self.low_day = low if self.low_day is None else max(self.low_day,
+                                                                 low)
+        if comparison in ('<', '<=', '=', '=='):
+            high = day - 1 if comparison == '<' else day
+            self.high_day = (high if self.high_day is None
+                             else min(self.high_day, high))
+        return True
+
+    def matches(self, day, total, length=1):
+        """Check a frame or streak, ignoring the day bounds"""
+        return self._predicate is None or self._predicate(day, total, length)
+
+    def __repr__(self):
+        return 'Filter({!r})'.format(self.expression)
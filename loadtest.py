@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""Multi-process load test of start, stop, pause and finish contention
+
+Spawns processes that each run randomised operations against one config
+location, with the real `Project`, `DataManager` and `CacheManager`. Each
+operation is run like a command line invocation: it finds the config,
+makes a `Project`, does the operation and saves. The tracker itself has no
+locking, so by default every operation holds an exclusive `flock` on a
+lock file in the config location, and the time spent waiting for it is
+measured. With --no-lock operations run unserialized, to see what that
+breaks.
+
+Afterwards the stored data is checked: every row parses (no torn rows),
+every range a process recorded is stored exactly once (no lost or
+duplicated ranges), and every start is matched by a stored range or is
+the one still running. Operations that fail, e.g. on reading a torn
+cache.json, are reported along with those problems.
+"""
+import atexit
+import fcntl
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import click
+
+from controller import Project
+from data import ConfigLocations, ConfigManager
+from date_point import DatePoint
+from utilities import percentile
+
+# operations the workers run, and how often each is picked
+OPERATION_WEIGHTS = {'start': 35, 'stop': 35, 'pause': 10, 'finish': 20}
+# filename of the lock file the workers serialize operations with
+LOCK_FILENAME = 'loadtest.lock'
+# percentiles of latency and lock wait to report
+PERCENTILES = (50, 90, 99)
+
+def recorded_ranges(start, end, timeframe):
+    """Get the frozen dates `Project.stop` records for a range"""
+    this_range = DatePoint(start, end)
+    if end.same(start, timeframe):
+        return [this_range.freeze()]
+    return [date.freeze() for date in this_range.split_range(timeframe)]
+
+def run_operation(operation, journal):
+    """Run one operation as a command line invocation would
+
+    Appends what it recorded to `journal` as (kind, frozen date) pairs:
+    'start' for a start, 'stop' for the start a stop ended, 'range' for a
+    stored range and 'finish' for a finished date.
+    """
+    project = Project(ConfigManager.find_config())
+    atexit.unregister(project.close)
+    timeframe = project.timeframe
+    if operation in ('stop', 'pause'):
+        start = project.start_time
+        end = project.stop()
+        if end is not None:
+            journal.append(('stop', start.freeze()))
+            journal.extend(('range', frozen) for frozen
+                           in recorded_ranges(start, end, timeframe))
+    if operation in ('start', 'pause'):
+        start = project.start()
+        if start is not None:
+            journal.append(('start', start.freeze()))
+    if operation == 'finish':
+        date = project.finish()
+        if date is not None:
+            journal.append(('finish', date.freeze()))
+    project.close()
+
+def worker(path, operations, seed, lock, think):
+    """Run `operations` random operations against the config at `path`
+
+    Returns the (operation, latency, lock wait) of each in seconds, the
+    journal of what was recorded and the errors operations raised.
+    """
+    os.environ[ConfigManager.ENVIRONMENT_OVERRIDE] = path
+    generator = random.Random(seed)
+    names = list(OPERATION_WEIGHTS)
+    weights = list(OPERATION_WEIGHTS.values())
+    samples = []
+    journal = []
+    errors = []
+    with open(os.path.join(path, LOCK_FILENAME), 'a') as lock_file:
+        for operation in generator.choices(names, weights, k=operations):
+            if think:
+                time.sleep(generator.uniform(0, think))
+            start = time.perf_counter()
+            if lock:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            acquired = time.perf_counter()
+            try:
+                run_operation(operation, journal)
+            except Exception as error:
+                errors.append('{} failed: {!r}'.format(operation, error))
+            finally:
+                if lock:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+            samples.append((operation, time.perf_counter() - start,
+                            acquired - start))
+    return samples, journal, errors
+
+def set_up(path):
+    """Set up a fresh config location at `path` and check it's the one used"""
+    os.environ[ConfigManager.ENVIRONMENT_OVERRIDE] = path
+    ConfigManager.setup(ConfigLocations.env)
+    found = ConfigManager._config_dirpath()
+    if found != os.path.realpath(path):
+        raise click.ClickException(
+            'the config at {} takes precedence over {}'.format(found, path))
+
+def check_consistency(journals):
+    """Check the stored data against what the workers recorded
+
+    Returns a list of the problems found, empty if there were none. An
+    unreadable config or cache.json (e.g. torn by unlocked writes) is one.
+    """
+    try:
+        config = ConfigManager.find_config()
+    except (ValueError, OSError) as error:
+        return ['unreadable config: {!r}'.format(error)]
+    data = config.data
+    problems = []
+    for name in data.partition_names():
+        path = os.path.join(data.partition_path, name)
+        for path in (path, data._overflow_path(name)):
+            if not os.path.isfile(path):
+                continue
+            with open(path) as partition_file:
+                for number, line in enumerate(partition_file, 1):
+                    line = line.rstrip('\r\n')
+                    if DatePoint.unfreeze_columns(line) is None:
+                        problems.append('torn row {}:{}: {!r}'.format(
+                            os.path.basename(path), number, line))
+    stored = {}
+    for date in data.dates:
+        frozen = date.freeze()
+        stored[frozen] = stored.get(frozen, 0) + 1
+    recorded = {}
+    starts = set()
+    stopped = set()
+    for journal in journals:
+        for kind, frozen in journal:
+            if kind == 'start':
+                starts.add(frozen)
+            elif kind == 'stop':
+                stopped.add(frozen)
+            else:
+                recorded[frozen] = recorded.get(frozen, 0) + 1
+    for frozen, count in recorded.items():
+        if stored.get(frozen, 0) < count:
+            problems.append('lost range {}'.format(frozen))
+    for frozen, count in stored.items():
+        if count > recorded.get(frozen, 0):
+            problems.append('unrecorded or duplicated range {}'.format(frozen))
+    try:
+        running = config.cache.start_time
+    except (ValueError, OSError) as error:
+        problems.append('unreadable cache: {!r}'.format(error))
+        return problems
+    if running is not None:
+        stopped.add(running.freeze())
+    for frozen in sorted(starts - stopped):
+        problems.append('unmatched start {}'.format(frozen))
+    for frozen in sorted(stopped - starts):
+        problems.append('range from an unrecorded start {}'.format(frozen))
+    return problems
+
+def milliseconds(seconds):
+    return '{:.2f}'.format(seconds * 1000)
+
+@click.command()
+@click.option('--processes', '-p', default=4, help='worker processes')
+@click.option('--operations', '-n', default=100,
+              help='operations per process')
+@click.option('--seed', default=0, help='seed for the random operations')
+@click.option('--think', default=0.0,
+              help='most seconds to wait (at random) between operations')
+@click.option('--lock/--no-lock', default=True,
+              help='serialize operations with a lock (default) or not')
+@click.option('--path', type=click.Path(file_okay=False), default=None,
+              help='empty config location to use (default: a temporary one)')
+@click.pass_context
+def cli(context, processes, operations, seed, think, lock, path):
+    """Load test concurrent start, stop, pause and finish operations
+
+    Prints latency percentiles per operation, throughput and lock wait in
+    milliseconds, then checks the stored data is consistent. Exits with
+    status 1 if it isn't.
+    """
+    with tempfile.TemporaryDirectory() as temporary:
+        path = os.path.realpath(path or temporary)
+        os.makedirs(path, exist_ok=True)
+        set_up(path)
+        start = time.perf_counter()
+        with ProcessPoolExecutor(processes) as executor:
+            futures = [executor.submit(worker, path, operations, seed + index,
+                                       lock, think)
+                       for index in range(processes)]
+            results = [future.result() for future in futures]
+        elapsed = time.perf_counter() - start
+        samples = [sample for worker_samples, _, _ in results
+                   for sample in worker_samples]
+        click.echo('{} processes, {} operations, {}'.format(
+            processes, len(samples), 'locked' if lock else 'unlocked'))
+        header = ['operation', 'count'] + [
+            'p{}'.format(percent) for percent in PERCENTILES] + ['max']
+        click.echo(' '.join('{:>9}'.format(column) for column in header))
+        for operation in list(OPERATION_WEIGHTS) + ['all']:
+            latencies = sorted(latency for name, latency, _ in samples
+                               if operation in ('all', name))
+            row = [operation, str(len(latencies))] + [
+                milliseconds(percentile(latencies, percent / 100) or 0)
+                for percent in PERCENTILES]
+            row.append(milliseconds(latencies[-1] if latencies else 0))
+            click.echo(' '.join('{:>9}'.format(column) for column in row))
+        click.echo('throughput: {:.1f} operations/s'.format(
+            len(samples) / elapsed))
+        if lock:
+            waits = sorted(wait for _, _, wait in samples)
+            click.echo('lock wait: {} ms total, {} ms mean, {}'.format(
+                milliseconds(sum(waits)),
+                milliseconds(sum(waits) / len(waits)) if waits else 0,
+                ', '.join('p{} {} ms'.format(
+                    percent,
+                    milliseconds(percentile(waits, percent / 100) or 0))
+                    for percent in PERCENTILES)))
+        problems = [error for _, _, errors in results for error in errors]
+        problems.extend(check_consistency(
+            journal for _, journal, _ in results))
+        if problems:
+            for problem in problems:
+                click.echo(problem)
+            click.echo('inconsistent: {} problems'.format(len(problems)))
+            context.exit(1)
+        click.echo('consistent')
+
+
+if __name__ == '__main__':
+    cli()
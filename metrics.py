@@ -0,0 +1,93 @@
+"""Internal instrumentation counters for the hot paths of the tracker
+
+The core modules count the work they do (rows parsed, dates created, groups
+recomputed, bytes moved...) into a single `registry`. Counting is disabled by
+default, in which case `registry.count` is a no-op function, so the only
+cost left in the hot paths is one attribute lookup and call. It's meant for
+catching regressions, e.g. a change that starts regrouping every frame for
+each query, rather than for timing.
+"""
+import atexit
+import json
+import os
+from collections import Counter
+
+
+class Metric:
+    """Enum for the names of the counters the core modules increment"""
+    rows_parsed = 'rows_parsed'
+    arrow_get = 'arrow_get'
+    datepoint_created = 'datepoint_created'
+    timeframe_groups = 'timeframe_groups'
+    memo_hit = 'memo_hit'
+    memo_miss = 'memo_miss'
+    cache_hit = 'cache_hit'
+    cache_miss = 'cache_miss'
+    bytes_read = 'bytes_read'
+    bytes_written = 'bytes_written'
+    fsyncs = 'fsyncs'
+
+    @classmethod
+    def metrics(cls):
+        return [attribute for attribute in dir(cls)
+                if not attribute.startswith('__') and attribute != 'metrics']
+
+
+def _ignore(name, amount=1):
+    """Stand-in for `MetricsRegistry.count` while counting is disabled"""
+    pass
+
+
+class MetricsRegistry:
+    """Accumulates named counters while enabled, does nothing otherwise
+
+    `count` is swapped between a real counting method and a module level
+    no-op on enable/disable rather than checking a flag on every call.
+    """
+
+    # environment variable naming a file to dump the counters into at exit
+    ENVIRONMENT_OVERRIDE = 'PROJECT_TRACKER_METRICS'
+
+    def __init__(self):
+        self.counters = Counter()
+        self.enabled = False
+        self.count = _ignore
+
+    def enable(self):
+        """Start accumulating counts"""
+        self.enabled = True
+        self.count = self._count
+
+    def disable(self):
+        """Stop accumulating counts, keeping the ones collected so far"""
+        self.enabled = False
+        self.count = _ignore
+
+    def reset(self):
+        """Zero all counters"""
+        self.counters.clear()
+
+    def _count(self, name, amount=1):
+        self.counters[name] += amount
+
+    def snapshot(self):
+        """Get a plain dict of every known counter, including zero ones"""
+        result = {name: 0 for name in Metric.metrics()}
+        result.update(self.counters)
+        return result
+
+    def dump(self, filepath):
+        """Write the current counters to a JSON file"""
+        with open(filepath, 'w') as dump_file:
+            json.dump(self.snapshot(), dump_file, indent=2, sort_keys=True)
+
+    @classmethod
+    def dump_path(cls):
+        """The file requested for dumping through the environment, if any"""
+        return os.environ.get(cls.ENVIRONMENT_OVERRIDE) or None
+
+
+registry = MetricsRegistry()
+if registry.dump_path() is not None:
+    registry.enable()
+    atexit.register(registry.dump, registry.dump_path())
@@ -3,12 +3,21 @@ import click
 import os
 import sys
 import atexit
+import datetime
+import json
+import shutil
+from datetime import timedelta
+from itertools import groupby
 from traceback import print_exc
 from pprint import pformat
 
+from backends import Backend
 from data import ConfigManager, ConfigLocations
-from date_point import Timeframe
-from controller import Project
+from date_point import Timeframe, DatePoint
+from controller import Project, ProjectSnapshot
+from metrics import registry
+from watch import FileWatcher, LiveDisplay
+from filters import Filter, FilterError
 
 # "cli interface" helper functions
 
@@ -25,16 +34,63 @@ def unfinished_square(n=1):
 def unknown_square(n=1):
     return click.style('◻' * n, fg='white')
 
+def streak_string(day_streak_booleans):
+    """Get the red and green squares representing day states
+
+    Runs of the same state share one styled string.
+    """
+    squares = {None: unknown_square, True: finished_square,
+               False: unfinished_square}
+    return ''.join(squares[item](len(list(run)))
+                   for item, run in groupby(day_streak_booleans))
+
 def print_streak_string(day_streak_booleans):
-    """Print the streaks with red and green squares representing day states"""
-    for item in day_streak_booleans:
-        if item is None:
-            click.echo(unknown_square(), nl=False)
-        elif item:
-            click.echo(finished_square(), nl=False)
-        else:
-            click.echo(unfinished_square(), nl=False)
-    click.echo()
+    """Print the streaks with red and green squares representing day states
+
+    Everything is written at once.
+    """
+    click.echo(streak_string(day_streak_booleans))
+
+# character and color for each `Project.daily_levels` level
+HEATMAP_STYLES = (('◻', 'white'), ('◼', 'red'), ('◼', 'yellow'),
+                  ('◼', 'green'), ('◼', 'bright_green'))
+HEATMAP_WEEKDAYS = ('Mon', '', 'Wed', '', 'Fri', '', 'Sun')
+
+def heatmap_string(first_ordinal, levels):
+    """Get a GitHub-style calendar of day levels as one string
+
+    One column per week and one row per weekday, starting at the day with
+    ordinal `first_ordinal`. Each row is sliced straight out of the levels
+    array, and runs of the same level are styled together.
+    """
+    if not levels:
+        return ''
+    padding = datetime.date.fromordinal(first_ordinal).weekday()
+    columns = (padding + len(levels) + 6) // 7
+    header = [' '] * columns
+    last_month = None
+    free_column = 0
+    for column in range(columns):
+        monday = datetime.date.fromordinal(first_ordinal - padding + 7 * column)
+        if (monday.month != last_month and column >= free_column
+                and column + 3 <= columns):
+            header[column:column + 3] = monday.strftime('%b')
+            free_column = column + 4
+        last_month = monday.month
+    lines = ['    ' + ''.join(header).rstrip()]
+    for weekday in range(7):
+        row = [None] * (weekday < padding)
+        row.extend(levels[(weekday - padding) % 7::7])
+        parts = []
+        for level, run in groupby(row):
+            count = len(list(run))
+            if level is None:
+                parts.append(' ' * count)
+            else:
+                char, color = HEATMAP_STYLES[level]
+                parts.append(click.style(char * count, fg=color))
+        lines.append('{:<4}{}'.format(HEATMAP_WEEKDAYS[weekday], ''.join(parts)))
+    return '\n'.join(lines)
 
 def humanize_timedelta(timedelta):
     """Print out nice-reading strings for time periods"""
@@ -57,6 +113,17 @@ def humanize_timedelta(timedelta):
     return ', '.join(result)
 
 
+def humanize_threshold(threshold):
+    """Get a short string for a threshold, e.g. 1h30m or 45m"""
+    minutes = int(threshold.total_seconds() // 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours and minutes:
+        return '{}h{}m'.format(hours, minutes)
+    if hours:
+        return '{}h'.format(hours)
+    return '{}m'.format(minutes)
+
+
 # Below are the command line interface functions, using the `click` library.
 # See `click`'s documentation for details on how this works. Currently mostly
 # mirrors the functions in `Project`.
@@ -127,6 +194,13 @@ def cli(context, debug_time_period=None):
     After setup is finished, use start and stop to record precise time
     ranges, or finish to just mark entire days completed
     """
+    if context.invoked_subcommand != 'stats':
+        # stats loads the project itself once its options are parsed, so
+        # --internal can count loading it
+        load_project(context)
+
+def load_project(context):
+    """Load the config and put its `Project` in the context"""
     try:
         config = ConfigManager.find_config()
     except (FileNotFoundError, ValueError):
@@ -138,9 +212,16 @@ def cli(context, debug_time_period=None):
     project = Project(config) if config is not None else None
     context.obj['project'] = project
 
+def tag_option(command):
+    """Add the option to tag the time recorded by a command"""
+    return click.option('--tag', default=None,
+                        help='what the time was spent on, e.g. docs')(command)
+
+
 @cli.command(short_help='mark today as finished')
+@tag_option
 @click.pass_context
-def finish(context):
+def finish(context, tag):
     """Mark today as being finished without an explicit amount of time
 
     Regardless of how much time the project is configured to require for a
@@ -150,7 +231,7 @@ def finish(context):
     or simply forgotten, so finish acts as a failsafe
     """
     project = context.obj['project']
-    finish = project.finish()
+    finish = project.finish(tag)
     if finish is None:
         click.echo('Already finished today')
     else:
@@ -209,24 +290,45 @@ def interactive_setup(context, param, value):
 @click.option('--environment', '-e', 'location')
 @click.option('--finished-threshold', '-f', 'threshold', type=click.FLOAT)
 @click.option('--timeframe', '-t', type=click.Choice(Timeframe.timeframes()))
+@click.option('--backend', '-b', type=click.Choice(Backend.backends()),
+              help='how to store the data (default: csv)')
 @click.pass_context
-def setup(context, location, threshold, timeframe):
+def setup(context, location, threshold, timeframe, backend):
     """Set up a new project config location
 
     Interactively queries the user for initial config and where to store
-    critical startup files/data.
+    critical startup files/data. --backend picks how the data is stored:
+    csv files (the default), a binary file, or an SQLite database.
     """
     if any(v is not None for k, v in context.params.items()):
         filepath = None
         if location not in (ConfigLocations.config, ConfigLocations.local):
             filepath = location
             location = ConfigLocations.env
-        ConfigManager.setup(location, filepath)
+        ConfigManager.setup(location, filepath, backend)
         ConfigManager.configure(threshold=threshold, timeframe=timeframe)
     else:
         click.confirm('Setup with all default values?', abort=True, default=True)
         ConfigManager.setup()
 
+def timeframe_option(command):
+    """Add a --timeframe option that overrides the configured timeframe
+
+    Queries are answered from the cached rollup, so switching timeframes
+    for a single command doesn't regroup the history.
+    """
+    return click.option(
+        '--timeframe', '-t', type=click.Choice(Timeframe.timeframes()),
+        default=None, help='timeframe to use instead of the configured one'
+    )(command)
+
+def query_project(context, timeframe=None):
+    """Get the context's project, overriding its timeframe if one is given"""
+    project = context.obj['project']
+    if timeframe is not None:
+        project.timeframe = timeframe
+    return project
+
 HUMANIZED_CURRENT_TIMEFRAMES = {
     Timeframe.year: 'This year',
     Timeframe.month: 'This month',
@@ -237,24 +339,92 @@ HUMANIZED_CURRENT_TIMEFRAMES = {
     Timeframe.second: 'Right now'
 }
 
+def streak_report(project):
+    """Compute the sections of the streak summary from one snapshot
+
+    Returns the current streak, each frame's finished state and the time
+    in the current frame.
+    """
+    snapshot = project.snapshot()
+    return snapshot.compute([ProjectSnapshot.streak, ProjectSnapshot.states,
+                             ProjectSnapshot.total_current])
+
+def streak_rows(project, width):
+    """Get the lines of the streak summary, wrapping the squares at `width`"""
+    streak, booleans, current_total = streak_report(project)
+    rows = ['Current streak: {}'.format(streak)]
+    rows.extend(streak_string(booleans[index:index + width])
+                for index in range(0, len(booleans), width))
+    rows.append('{}: {}'.format(HUMANIZED_CURRENT_TIMEFRAMES[project.timeframe],
+                                humanize_timedelta(current_total)))
+    return rows
+
+def watch_streak(project):
+    """Keep the streak summary on screen, updating it as the data changes
+
+    Waits on changes to the data and cache files, folding only newly
+    appended dates into what's loaded, and redraws at least every second
+    while a range is started so its running time stays current.
+    """
+    display = LiveDisplay()
+    watcher = FileWatcher.create(project.watch_paths)
+    project.refresh()
+    try:
+        while True:
+            width = shutil.get_terminal_size().columns
+            display.update(streak_rows(project, width))
+            timeout = 1 if project.start_time is not None else 60
+            if watcher.wait(timeout):
+                project.refresh()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
 @cli.group(invoke_without_command=True,
            short_help='show info about the current streak')
+@click.option('--watch', '-w', is_flag=True,
+              help='keep showing the streak, updating it live')
+@click.option('--stream', is_flag=True,
+              help='compute from the data files in constant memory')
+@timeframe_option
 @click.pass_context
-def streak(context):
+def streak(context, watch, stream, timeframe):
     """Get information about the current streak (and all days)
 
     Prints out a github-like string of squares showing whether each of the
     days since project-start have been completed. Also prints out the length
     of the current streak and the total time spent today
+
+    With --watch it stays open and updates as ranges are started and
+    stopped (e.g. from another terminal) until interrupted. With --stream
+    this and the list and total subcommands skip the cached rollup and
+    fold the data files into streaks as they're read, using the same
+    memory however long the history is.
     """
-    project = context.obj['project']
+    project = query_project(context, timeframe)
+    context.obj['stream'] = stream
     if context.invoked_subcommand is None:
-        click.echo('Current streak: {}'.format(project.streak))
-        print_streak_string(project.streaks_boolean())
-        streak_total = project.current_streak_time
-        today_total = project.total_time_current
+        if watch:
+            watch_streak(project)
+            return
+        if stream:
+            click.echo('Current streak: {}'.format(
+                project.stream_current_streak()[0]))
+            squares = {None: unknown_square, True: finished_square,
+                       False: unfinished_square}
+            for item, run in groupby(project.stream_states()):
+                click.echo(squares[item](sum(1 for _ in run)), nl=False)
+            click.echo()
+            click.echo('{}: {}'.format(
+                HUMANIZED_CURRENT_TIMEFRAMES[project.timeframe],
+                humanize_timedelta(project.stream_total_current())))
+            return
+        streak, booleans, current_total = streak_report(project)
+        click.echo('Current streak: {}'.format(streak))
+        print_streak_string(booleans)
         click.echo('{}: {}'.format(HUMANIZED_CURRENT_TIMEFRAMES[project.timeframe],
-                                   humanize_timedelta(today_total)))
+                                   humanize_timedelta(current_total)))
 
 
 @streak.command(short_help='total time spent in streak')
@@ -262,24 +432,147 @@ def streak(context):
 def total(context):
     """Subcommand of streak that prints the total time in the current streak"""
     project = context.obj['project']
+    if context.obj.get('stream'):
+        click.echo(humanize_timedelta(project.stream_current_streak()[1]))
+        return
     click.echo(humanize_timedelta(project.current_streak_time))
 
 
+@streak.command(short_help='calendar heatmap of time per day')
+@click.option('--years', '-y', default=1, type=click.INT,
+              help='how many years back to show')
+@click.pass_context
+def heatmap(context, years):
+    """Print a GitHub-style calendar of the time spent each day
+
+    One column per week and a row per weekday, with each day shaded by how
+    its total compares to the finished threshold: red under half of it,
+    yellow under it, green over it and bright green over twice it.
+    """
+    project = context.obj['project']
+    end = DatePoint.now()
+    # a "year" is 52 weeks, one block each so weekdays line up across them
+    start = DatePoint(end.arrow.shift(days=1 - 364 * years))
+    first, levels = project.daily_levels(start=start, end=end)
+    blocks = [heatmap_string(first + offset, levels[offset:offset + 364])
+              for offset in range(0, len(levels), 364)]
+    click.echo('\n\n'.join(blocks))
+
+
+def page_options(command):
+    """Add --limit, --after and --reverse options for paging through results"""
+    options = [
+        click.option('--limit', '-n', type=click.INT, default=None,
+                     help='show at most this many results'),
+        click.option('--after', default=None,
+                     help='cursor printed by the previous page'),
+        click.option('--reverse', '-r', is_flag=True,
+                     help='page backwards from the most recent'),
+    ]
+    for option in reversed(options):
+        command = option(command)
+    return command
+
+def parse_where(context, parameter, value):
+    """Compile a --where expression into a `Filter`"""
+    if value is None:
+        return None
+    try:
+        return Filter(value)
+    except FilterError as error:
+        raise click.BadParameter(str(error))
+
+def where_option(command):
+    """Add a --where option taking a filter expression (see `filters`)"""
+    return click.option(
+        '--where', '-w', default=None, callback=parse_where,
+        help="filter, e.g. 'weekday in (sat, sun) and total > 2h'")(command)
+
+def next_page_line(cursor):
+    """Get the line telling the user how to get the next page"""
+    return 'More results: --after {}'.format(cursor)
+
+def echo_next_page(cursor):
+    """Tell the user how to get the next page, if there is one"""
+    if cursor is not None:
+        click.echo(next_page_line(cursor))
+
+def where_expression(where):
+    """Get the expression of a --where filter for a report key"""
+    return None if where is None else where.expression
+
+
+def streak_line(number, first, last, total):
+    """Get the line for one streak in `streak list`"""
+    start = first.datetime_date
+    end = last.datetime_date
+    if start != end:
+        streak_string = '{} to {}'.format(start, end)
+    else:
+        streak_string = '{}'.format(start)
+    return '{}: {}, {}'.format(number, streak_string, humanize_timedelta(total))
+
+def stream_streaks(project, limit, after, where):
+    """Echo `streak list` as the streaks are folded from the data
+
+    Goes forward from the start (or `after`), and stops reading once
+    `limit` streaks are out.
+    """
+    try:
+        streaks = project.stream_streaks(after, where)
+    except ValueError as error:
+        raise click.BadParameter(str(error), param_hint='--after')
+    shown = 0
+    previous = None
+    for number, first, last, _, total in streaks:
+        if limit is not None and shown == limit:
+            if previous is not None:
+                echo_next_page(project.streak_cursor(previous))
+            return
+        click.echo(streak_line(number, first, last, total))
+        shown += 1
+        previous = first
+
 @streak.command('list', short_help='list all streaks and their times')
+@page_options
+@where_option
 @click.pass_context
-def list_streaks(context):
-    """Lists every streak in the data and the total time spent for each"""
+def list_streaks(context, limit, after, reverse, where):
+    """Lists every streak in the data and the total time spent for each
+
+    With --limit, shows one page of streaks at a time and prints the cursor
+    to continue from with --after. With --where only lists the streaks
+    that match a filter, where a streak's date is its first day's and
+    `length` is its number of frames.
+    """
     project = context.obj['project']
-    streaks = project.finished_streaks
-    for i, streak in enumerate(streaks):
-        start = streak[0].datetime_date
-        end = streak[-1].datetime_date
-        if start != end:
-            streak_string = '{} to {}'.format(start, end)
-        else:
-            streak_string = '{}'.format(start)
-        time_string = humanize_timedelta(project.total_time_in(streak))
-        click.echo('{}: {}, {}'.format(i + 1, streak_string, time_string))
+    if context.obj.get('stream'):
+        if reverse:
+            raise click.UsageError("--reverse doesn't work with --stream")
+        stream_streaks(project, limit, after, where)
+        return
+
+    def build():
+        try:
+            streaks, cursor = project.streaks_page(limit, after, reverse,
+                                                   where)
+        except ValueError as error:
+            raise click.BadParameter(str(error), param_hint='--after')
+        lines = []
+        rows = []
+        for number, first, last, length, total in streaks:
+            lines.append(streak_line(number, first, last, total))
+            rows.append([number, str(first.datetime_date),
+                         str(last.datetime_date), length,
+                         total.total_seconds()])
+        if cursor is not None:
+            lines.append(next_page_line(cursor))
+        return '\n'.join(lines), {'streaks': rows, 'cursor': cursor}
+
+    arguments = [limit, after, reverse, where_expression(where)]
+    text, _ = project.report('streak list', arguments, build)
+    if text:
+        click.echo(text)
 
 
 @cli.command(short_help='time info about individual days')
@@ -291,35 +584,291 @@ def list_streaks(context):
               help='format flag: print all days with any time')
 @click.option('--empty', 'print_format', flag_value='empty',
               help='format flag: print days since start including empty ones')
+@page_options
+@where_option
+@timeframe_option
 @click.pass_context
-def times(context, start, end, print_format):
+def times(context, start, end, print_format, limit, after, reverse, where,
+          timeframe):
     """Print time information about individual days
 
     Allows specification of a time range to give info about. Has multiple
     different format options (or format flags). By default prints all days in
     all streaks, clearly separated into streaks.
+
+    The combined format can be paged through with --limit and --after
+    instead of a range. --where only shows the days matching a filter
+    expression, e.g. 'weekday in (sat, sun) and total > 2h'.
     """
-    project = context.obj['project']
+    project = query_project(context, timeframe)
+    paged = limit is not None or after is not None
+    if paged and (print_format != 'combined' or start or end):
+        raise click.UsageError(
+            'paging only works with --combined and without a range')
+    arguments = [start, end, print_format, limit, after, reverse,
+                 where_expression(where)]
+    text, _ = project.report(
+        'times', arguments,
+        lambda: times_report(project, start, end, print_format, limit, after,
+                             reverse, where),
+        current=True)
+    if paged:
+        click.echo(text)
+    else:
+        click.echo_via_pager(text)
+
+def times_report(project, start, end, print_format, limit, after, reverse,
+                 where):
+    """Get the text of `times` and its (date, seconds) rows"""
     results = []
+    rows = []
+
+    def add(date, total):
+        results.append('{}: {}'.format(date, humanize_timedelta(total)))
+        rows.append([str(date), total.total_seconds()])
+
+    if limit is not None or after is not None:
+        try:
+            frames, cursor = project.frames_page(limit, after, reverse, where)
+        except ValueError as error:
+            raise click.BadParameter(str(error), param_hint='--after')
+        for frame, total in frames:
+            add(frame.datetime_date, total)
+        text = '\n'.join(results)
+        if cursor is not None:
+            text += '\n' + next_page_line(cursor)
+        return text, rows
     if print_format == 'streak':
-        streak_range = project.streaks_range(start=start, end=end)
         results.append('-' * 40)
-        for streak in streak_range:
-            for day in streak:
-                day_string = '{}: {}'.format(
-                    day.datetime_date, humanize_timedelta(day.total_time))
-                results.append(day_string)
+        if where is None:
+            streaks = [[(day, day.total_time) for day in streak]
+                       for streak in project.streaks_range(start=start,
+                                                           end=end)]
+        else:
+            streaks = project.matching_streak_frames(where, start=start,
+                                                     end=end)
+        for streak in streaks:
+            for day, total in streak:
+                add(day.datetime_date, total)
             results.append('-' * 40)
     elif print_format == 'empty':
         for day in project.filled_range(start=start, end=end):
-            day_string = '{}: {}'.format(
-                day.date(), humanize_timedelta(project.total_time_on(day)))
-            results.append(day_string)
+            if where is not None and not project.frame_matches(where, day):
+                continue
+            add(day.date(), project.total_time_on(day))
     elif print_format == 'combined':
-        for day in project.day_range(start=start, end=end):
-            results.append('{}: {}'.format(
-                day.datetime_date, humanize_timedelta(day.total_time)))
-    click.echo_via_pager('\n'.join(results))
+        if where is None:
+            days = [(day, day.total_time)
+                    for day in project.timeframe_range(start=start, end=end)]
+        else:
+            days = project.matching_frames(where, start=start, end=end)
+        for day, total in days:
+            add(day.datetime_date, total)
+    return '\n'.join(results), rows
+
+
+def start_counting(context, param, value):
+    """Start the instrumentation counters for stats --internal
+
+    Eager, so this runs before the project is loaded and loading is counted.
+    """
+    if value and not context.resilient_parsing:
+        registry.reset()
+        registry.enable()
+    return value
+
+# window sizes (in frames) of the rolling statistics shown by stats
+STATS_WINDOWS = (7, 30, 90)
+
+@cli.command(short_help='overall statistics about the project')
+@click.option('--top', '-n', default=5, type=click.INT,
+              help='how many best frames and longest streaks to list')
+@click.option('--internal', is_flag=True, is_eager=True,
+              callback=start_counting,
+              help='also report internal instrumentation counters')
+@click.option('--json', 'as_json', is_flag=True,
+              help='dump the results as JSON')
+@timeframe_option
+@click.pass_context
+def stats(context, top, internal, as_json, timeframe):
+    """Print overall and rolling statistics about the project
+
+    Shows totals, the average time per frame, finish rate and best frame
+    over the last 7, 30 and 90 frames, percentiles of frame times and
+    streak lengths, and the best frames and longest streaks.
+
+    With --internal also counts the work done to compute them (rows parsed,
+    DatePoints created, groups recomputed, cache hits, bytes read...),
+    loading the config and data included. A change that makes the core redo
+    work shows up as a jump in these.
+    """
+    load_project(context)
+    project = query_project(context, timeframe)
+    frames = project.frame_totals
+    lengths = project.streak_lengths
+    total = timedelta(microseconds=sum(frames.totals))
+    windows = project.rolling_summary(STATS_WINDOWS)
+    frame_percentiles = project.frame_percentiles()
+    streak_percentiles = project.streak_percentiles()
+    best_frames = project.best_frames(top)
+    longest_streaks = project.longest_streaks(top)
+    if as_json:
+        results = {
+            'frames': len(frames),
+            'finished_frames': sum(lengths),
+            'total_time': total.total_seconds(),
+            'current_streak': project.streak,
+            'longest_streak': max(lengths, default=0),
+            'windows': {
+                window: {'average': average.total_seconds(),
+                         'finish_rate': rate,
+                         'best': best.total_seconds()}
+                for window, (average, rate, best) in windows.items()},
+            'frame_percentiles': {
+                fraction: value.total_seconds()
+                for fraction, value in frame_percentiles.items()},
+            'streak_percentiles': streak_percentiles,
+            'best_frames': [[str(date.datetime_date), time.total_seconds()]
+                            for date, time in best_frames],
+            'longest_streaks': [
+                [str(first.datetime_date), str(last.datetime_date), length]
+                for first, last, length in longest_streaks],
+        }
+        if internal:
+            results = {'stats': results, 'internal': registry.snapshot()}
+        click.echo(json.dumps(results, indent=2, sort_keys=True))
+        return
+    lines = [
+        'Frames with time: {}'.format(len(frames)),
+        'Finished frames: {}'.format(sum(lengths)),
+        'Total time: {}'.format(humanize_timedelta(total)),
+        'Current streak: {}'.format(project.streak),
+        'Longest streak: {}'.format(max(lengths, default=0)),
+    ]
+    for window, (average, rate, best) in windows.items():
+        lines.append('Last {} frames: {} average, {:.0%} finished, best {}'.format(
+            window, humanize_timedelta(average), rate, humanize_timedelta(best)))
+    if frame_percentiles:
+        lines.append('Frame time percentiles: {}'.format(', '.join(
+            '{:.0%}: {}'.format(fraction, humanize_timedelta(value))
+            for fraction, value in frame_percentiles.items())))
+    if streak_percentiles:
+        lines.append('Streak length percentiles: {}'.format(', '.join(
+            '{:.0%}: {}'.format(fraction, value)
+            for fraction, value in streak_percentiles.items())))
+    if best_frames:
+        lines.append('Best frames:')
+        lines.extend('  {}: {}'.format(date.datetime_date, humanize_timedelta(time))
+                     for date, time in best_frames)
+    if longest_streaks:
+        lines.append('Longest streaks:')
+        for first, last, length in longest_streaks:
+            lines.append('  {} to {}: {}'.format(
+                first.datetime_date, last.datetime_date, length))
+    if internal:
+        lines.append('Internal counters:')
+        lines.extend('  {}: {}'.format(name, value)
+                     for name, value in sorted(registry.snapshot().items()))
+    click.echo('\n'.join(lines))
+
+
+@cli.command(short_help='time and streaks per tag')
+@timeframe_option
+@click.pass_context
+def tags(context, timeframe):
+    """Show the time spent with each tag and the streaks of each
+
+    A tag's streaks count only the time recorded with that tag towards
+    finishing a frame.
+    """
+    project = query_project(context, timeframe)
+    try:
+        summary = project.tag_summary()
+    except ValueError as error:
+        raise click.UsageError(str(error))
+    if not summary:
+        click.echo('No tags used yet')
+        return
+    for name, total, finished, longest, current in summary:
+        click.echo('{}: {}, {} finished, longest streak {}, current streak {}'
+                   .format(name, humanize_timedelta(total), finished, longest,
+                           current))
+
+
+# finished thresholds (in seconds) tried by sweep by default
+SWEEP_THRESHOLDS = (900, 1800, 2700, 3600, 5400, 7200, 10800, 14400)
+
+@cli.command(short_help='compare streaks across thresholds and timeframes')
+@click.option('--threshold', '-f', 'thresholds', multiple=True,
+              type=click.FLOAT,
+              help='finished threshold in seconds to try (repeatable)')
+@click.option('--timeframe', '-t', 'timeframes', multiple=True,
+              type=click.Choice(Timeframe.timeframes()),
+              help='timeframe to try (repeatable, default: the configured one)')
+@click.pass_context
+def sweep(context, thresholds, timeframes):
+    """Print what the streaks would be for other thresholds and timeframes
+
+    For each combination shows the current and longest streak and the
+    share of frames finished, as if the config had those settings. The
+    configured combination is marked with a *.
+    """
+    project = context.obj['project']
+    thresholds = [timedelta(seconds=seconds)
+                  for seconds in thresholds or SWEEP_THRESHOLDS]
+    results = project.sweep(thresholds, timeframes or None)
+    lines = ['  {:<8}{:>12}{:>9}{:>9}{:>10}'.format(
+        'frame', 'threshold', 'current', 'longest', 'finished')]
+    for timeframe, threshold, current, longest, rate in results:
+        configured = (timeframe == project.timeframe and
+                      threshold == project.finished_threshold)
+        lines.append('{} {:<8}{:>12}{:>9}{:>9}{:>10.0%}'.format(
+            '*' if configured else ' ', timeframe, humanize_threshold(threshold),
+            current, longest, rate))
+    click.echo('\n'.join(lines))
+
+
+@cli.command(short_help='merge in data logs from other machines')
+@click.argument('sources', nargs=-1, required=True,
+                type=click.Path(exists=True))
+@click.pass_context
+def merge(context, sources):
+    """Merge data recorded elsewhere into this project's data
+
+    Each source is a data file or another installation's whole data
+    directory. The dates recorded here are kept as they are. Dates already
+    recorded are skipped, and ranges that overlap ones already recorded
+    with the same tag are cut short, so no time is counted twice.
+    """
+    project = context.obj['project']
+    try:
+        added, trimmed, skipped = project.merge(sources)
+    except ValueError as error:
+        raise click.ClickException(str(error))
+    click.echo('Added {} dates, skipped {} already recorded'.format(
+        added, skipped))
+    if trimmed:
+        click.echo('{} of the added dates were cut short where they overlap '
+                   'ones already recorded'.format(trimmed))
+
+
+@cli.command(short_help='archive closed years of data')
+@click.option('--before', '-b', default=None,
+              help='archive dates before this (default: start of this year)')
+@click.pass_context
+def archive(context, before):
+    """Move closed years of data into compressed archive segments
+
+    Each year gets its own segment, summarised in the archive manifest, so
+    everyday commands only parse the current data file. This also happens
+    automatically on the first recording of a new year.
+    """
+    project = context.obj['project']
+    try:
+        archived = project.archive(before)
+    except ValueError as error:
+        raise click.ClickException(str(error))
+    click.echo('Archived {} dates'.format(archived))
 
 
 @cli.command(short_help='debug using ipdb')
@@ -353,8 +902,9 @@ def list_config():
 
 
 @cli.command(short_help='begin work on the project')
+@tag_option
 @click.pass_context
-def start(context):
+def start(context, tag):
     """Begin work on the project
 
     Starts a new time range at the time called. This, along with stop,
@@ -364,7 +914,7 @@ def start(context):
     started work and how long they've been working.
     """
     project = context.obj['project']
-    start = project.start()
+    start = project.start(tag=tag)
     if start is None:
         click.echo('Already started')
         click.echo('Total time: {}'.format(
@@ -374,17 +924,18 @@ def start(context):
 
 
 @cli.command(short_help='stop work on the project')
+@tag_option
 @click.pass_context
-def stop(context):
+def stop(context, tag):
     """Stop work on the project
 
     Ends an already-started time range at the time called. If no time
     range was started, does nothing. Otherwise prints out the time
-    stopped at.
+    stopped at. A tag given here replaces the one given to start.
     """
     project = context.obj['project']
     start = project.start_time
-    end = project.stop()
+    end = project.stop(tag)
     if end is None:
         click.echo('Already stopped')
     else:
@@ -392,6 +943,43 @@ def stop(context):
         difference = end - start
         click.echo(humanize_timedelta(difference))
 
+def local_datetime(context, parameter, value):
+    """Parse a date and time, taking ones without a UTC offset as local"""
+    if value is None:
+        return None
+    try:
+        parsed = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise click.BadParameter('expected a date and time like '
+                                 '2026-10-12T14:30')
+    if parsed.tzinfo is None:
+        parsed = parsed.astimezone()
+    return DatePoint(parsed)
+
+
+@cli.command(short_help='record work done in the past')
+@click.argument('start', callback=local_datetime)
+@click.argument('end', required=False, callback=local_datetime)
+@tag_option
+@click.pass_context
+def backfill(context, start, end, tag):
+    """Record a forgotten range of work, from START to END
+
+    Without END, marks the frame START is in as finished like finish does.
+    Times without a UTC offset are taken as local time.
+    """
+    project = context.obj['project']
+    date = start if end is None else DatePoint(start, end)
+    try:
+        added, _ = project.record_many([date], tag=tag)
+    except ValueError as error:
+        raise click.BadParameter(str(error))
+    if added:
+        click.echo('Recorded {}'.format(date))
+    else:
+        click.echo('Already recorded')
+
+
 @cli.command(short_help='quick pause in work')
 @click.pass_context
 def pause(context):
@@ -404,10 +992,11 @@ def pause(context):
     if project.start_time is None:
         click.echo("Can't pause, not started")
         return
+    tag = project.current_tag
     end = project.stop()
     click.echo('Paused')
     click.pause(info='Press any key to continue...')
-    start = project.start()
+    start = project.start(tag=tag)
     click.echo('Restarted')
     click.echo('Paused for {}'.format(humanize_timedelta(start - end)))
 
@@ -0,0 +1,243 @@
+"""Per-frame time totals for several timeframes at once
+
+Grouping the whole history into `TimeframeGroup`s for every query is the
+most expensive thing `Project` does, and has to be redone whenever the
+timeframe changes. A `Rollup` instead folds every stored DatePoint into
+hour, day, week, month and year totals in a single pass. It's cached by
+`CacheManager` against the data version, so any of those timeframes can be
+queried without rescanning the raw ranges.
+
+Tagged dates are also folded into a separate set of totals per tag. Their
+sorted ordinals are a posting list of the frames each tag has time in, so
+per-tag totals and streaks never scan the ranges either.
+"""
+import bisect
+from array import array
+
+from date_point import (DatePoint, Timeframe, NO_END, POINT_TIME,
+                        EPOCH_ORDINAL, civil_from_days, timeframe_start)
+
+class FrameTotals:
+    """Total time per frame in one timeframe, as parallel columns
+
+    Frames are in data order (so sorted by ordinal for time-ordered data).
+    For each frame this keeps its ordinal, its total in microseconds, the
+    UTC offset of its first DatePoint (to place its start) and the index of
+    its first DatePoint in the `DateStore`, so it can be turned back into a
+    `TimeframeGroup`.
+    """
+    def __init__(self, timeframe, ordinals=(), totals=(), offsets=(),
+                 firsts=()):
+        self.timeframe = timeframe
+        self.ordinals = array('q', ordinals)
+        self.totals = array('q', totals)
+        self.offsets = array('i', offsets)
+        self.firsts = array('q', firsts)
+
+    @classmethod
+    def build(cls, store, timeframe):
+        """Fold a `DateStore` into totals for a single timeframe"""
+        frame_totals = cls(timeframe)
+        ordinals = store.ordinals(timeframe)
+        for index, (start, end) in enumerate(zip(store.starts, store.ends)):
+            total = POINT_TIME if end == NO_END else end - start
+            frame_totals.add(ordinals[index], total, store.offsets[index],
+                             index)
+        return frame_totals
+
+    def add(self, ordinal, total, offset, index):
+        """Fold the total of the DatePoint at `index` into the last frame
+
+        Starts a new frame if the DatePoint isn't in the last one.
+        """
+        if self.ordinals and self.ordinals[-1] == ordinal:
+            self.totals[-1] += total
+        else:
+            self.ordinals.append(ordinal)
+            self.totals.append(total)
+            self.offsets.append(offset)
+            self.firsts.append(index)
+
+    def extend(self, other, row_offset=0):
+        """Append the frames of other FrameTotals that come after these
+
+        Their DateStore indexes are shifted by `row_offset`, and a first
+        frame with the same ordinal as the last one here (e.g. a week split
+        across two stores) is merged into it.
+        """
+        start = 0
+        if len(other) and self.ordinals and self.ordinals[-1] == other.ordinals[0]:
+            self.totals[-1] += other.totals[0]
+            start = 1
+        self.ordinals.extend(other.ordinals[start:])
+        self.totals.extend(other.totals[start:])
+        self.offsets.extend(other.offsets[start:])
+        self.firsts.extend(first + row_offset for first in other.firsts[start:])
+
+    def __len__(self):
+        return len(self.ordinals)
+
+    def find(self, ordinal):
+        """Get the index of the frame with an ordinal, or None"""
+        index = bisect.bisect_left(self.ordinals, ordinal)
+        if index < len(self.ordinals) and self.ordinals[index] == ordinal:
+            return index
+        return None
+
+    def total_on(self, ordinal):
+        """Get the total (in microseconds) of the frame with an ordinal"""
+        index = self.find(ordinal)
+        if index is None:
+            return 0
+        return self.totals[index]
+
+    def frame_date(self, index):
+        """Get the start of a frame as a DatePoint"""
+        offset = self.offsets[index]
+        return DatePoint.from_timestamps(
+            timeframe_start(self.ordinals[index], offset, self.timeframe),
+            offset)
+
+    def span(self, index, row_count):
+        """Get the (start, end) DateStore indexes of the rows in a frame"""
+        if index + 1 < len(self.firsts):
+            return self.firsts[index], self.firsts[index + 1]
+        return self.firsts[index], row_count
+
+    def freeze(self):
+        """Return a JSON-serializable version of self"""
+        return {'ordinals': self.ordinals.tolist(),
+                'totals': self.totals.tolist(),
+                'offsets': self.offsets.tolist(),
+                'firsts': self.firsts.tolist()}
+
+    @classmethod
+    def unfreeze(cls, timeframe, frozen):
+        """Create FrameTotals from a frozen serialization of one"""
+        return cls(timeframe, frozen['ordinals'], frozen['totals'],
+                   frozen['offsets'], frozen['firsts'])
+
+class Rollup:
+    """Per-frame totals for every timeframe from an hour up to a year
+
+    Tagged with the data version it was built from, so that a cached
+    rollup can be checked for staleness without looking at the data.
+    `tags` has the same layers for just the dates with each tag, by tag ID.
+    """
+    TIMEFRAMES = (Timeframe.hour, Timeframe.day, Timeframe.week,
+                  Timeframe.month, Timeframe.year)
+
+    def __init__(self, layers=None, rows=0, version=None, tags=None):
+        if layers is None:
+            layers = self.empty_layers()
+        self.layers = layers
+        self.rows = rows
+        self.version = version
+        self.tags = {} if tags is None else tags
+
+    @classmethod
+    def empty_layers(cls):
+        """Get empty FrameTotals for each of the rollup's timeframes"""
+        return {timeframe: FrameTotals(timeframe)
+                for timeframe in cls.TIMEFRAMES}
+
+    @classmethod
+    def build(cls, store, version=None):
+        """Build the rollup of a whole `DateStore` in one pass"""
+        rollup = cls(version=version)
+        rollup.add_rows(store)
+        return rollup
+
+    @classmethod
+    def concatenate(cls, rollups, version=None):
+        """Combine the rollups of consecutive DateStores into one
+
+        As if built from the stores concatenated in order.
+        """
+        result = cls(version=version)
+        for rollup in rollups:
+            result.extend(rollup)
+        return result
+
+    def extend(self, other):
+        """Append the frames of the rollup of rows that come after these"""
+        for timeframe, layer in self.layers.items():
+            layer.extend(other[timeframe], self.rows)
+        for tag, other_layers in other.tags.items():
+            layers = self.tags.get(tag)
+            if layers is None:
+                layers = self.tags[tag] = self.empty_layers()
+            for timeframe, layer in layers.items():
+                layer.extend(other_layers[timeframe], self.rows)
+        self.rows += other.rows
+
+    def add_rows(self, store, start_index=None):
+        """Fold the rows of a `DateStore` from `start_index` on into the totals
+
+        Defaults to the rows after the ones already rolled up. Each row's
+        local day is converted to a calendar date at most once, and only
+        when it differs from the previous row's. Tagged rows are folded
+        into their tag's layers as well.
+        """
+        if start_index is None:
+            start_index = self.rows
+        hours = self.layers[Timeframe.hour]
+        days = self.layers[Timeframe.day]
+        weeks = self.layers[Timeframe.week]
+        months = self.layers[Timeframe.month]
+        years = self.layers[Timeframe.year]
+        last_day = year = month = None
+        columns = zip(store.starts[start_index:], store.offsets[start_index:],
+                      store.ends[start_index:], store.tags[start_index:])
+        for index, (start, offset, end, tag) in enumerate(columns, start_index):
+            total = POINT_TIME if end == NO_END else end - start
+            local = start // 1000000 + offset
+            day = local // 86400
+            if day != last_day:
+                year, month, _ = civil_from_days(day)
+                last_day = day
+            hour = local // 3600 + EPOCH_ORDINAL * 24
+            hours.add(hour, total, offset, index)
+            days.add(day + EPOCH_ORDINAL, total, offset, index)
+            weeks.add((day + 3) // 7, total, offset, index)
+            months.add(year * 12 + month, total, offset, index)
+            years.add(year, total, offset, index)
+            if tag:
+                layers = self.tags.get(tag)
+                if layers is None:
+                    layers = self.tags[tag] = self.empty_layers()
+                ordinals = (hour, day + EPOCH_ORDINAL, (day + 3) // 7,
+                            year * 12 + month, year)
+                for timeframe, ordinal in zip(self.TIMEFRAMES, ordinals):
+                    layers[timeframe].add(ordinal, total, offset, index)
+        self.rows = len(store)
+
+    def __contains__(self, timeframe):
+        return timeframe in self.layers
+
+    def __getitem__(self, timeframe):
+        """Get the FrameTotals for a timeframe"""
+        return self.layers[timeframe]
+
+    def freeze(self):
+        """Return a JSON-serializable version of self"""
+        return {'version': self.version,
+                'rows': self.rows,
+                'layers': {timeframe: layer.freeze()
+                           for timeframe, layer in self.layers.items()},
+                'tags': {tag: {timeframe: layer.freeze()
+                               for timeframe, layer in layers.items()}
+                         for tag, layers in self.tags.items()}}
+
+    @classmethod
+    def unfreeze(cls, frozen):
+        """Create a Rollup from a frozen serialization of one
+
+        Rollups frozen before tags existed have none.
+        """
+        layers = {timeframe: FrameTotals.unfreeze(timeframe, layer)
+                  for timeframe, layer in frozen['layers'].items()}
+        tags = {int(tag): {timeframe: FrameTotals.unfreeze(timeframe, layer)
+                           for timeframe, layer in tag_layers.items()}
+                for tag, tag_layers in frozen.get('tags', {}).items()}
+        return cls(layers, frozen['rows'], frozen['version'], tags)
@@ -0,0 +1,77 @@
+"""Constant-memory pipelines from stored dates to frames and streaks
+
+Each stage is a generator that only holds the frame or streak it's folding,
+so going from the data files to streaks takes the same memory however long
+the history is. They rely on the dates coming in time order, as they're
+stored, and work on plain integers like `DateStore`'s columns.
+"""
+from collections import deque
+
+from date_point import NO_END, POINT_TIME, timeframe_ordinal
+
+
+def frame_totals(rows, timeframe):
+    """Fold (start, offset, end) rows into per-frame totals
+
+    Yields an (ordinal, offset, total) tuple for each frame with dates in
+    it, with the offset of its first date and its total in microseconds.
+    """
+    ordinal = offset = None
+    total = 0
+    for start, row_offset, end in rows:
+        row_ordinal = timeframe_ordinal(start, row_offset, timeframe)
+        if row_ordinal != ordinal:
+            if ordinal is not None:
+                yield ordinal, offset, total
+            ordinal, offset, total = row_ordinal, row_offset, 0
+        total += POINT_TIME if end == NO_END else end - start
+    if ordinal is not None:
+        yield ordinal, offset, total
+
+
+def finished_streaks(frames, threshold):
+    """Fold per-frame totals into runs of consecutive finished frames
+
+    `threshold` is in microseconds. Yields a (first ordinal, first offset,
+    last ordinal, length, total) tuple per run, as soon as it's over.
+    """
+    streak = None
+    for ordinal, offset, total in frames:
+        if total < threshold:
+            continue
+        if streak is not None and ordinal - streak[2] <= 1:
+            streak[2] = ordinal
+            streak[3] += 1
+            streak[4] += total
+        else:
+            if streak is not None:
+                yield tuple(streak)
+            streak = [ordinal, offset, ordinal, 1, total]
+    if streak is not None:
+        yield tuple(streak)
+
+
+def frame_states(frames, threshold, last_ordinal):
+    """Yield whether each frame up to `last_ordinal` was finished
+
+    Starts at the first frame with time, and frames without any are
+    unfinished.
+    """
+    next_ordinal = None
+    for ordinal, _, total in frames:
+        if ordinal > last_ordinal:
+            break
+        if next_ordinal is not None:
+            for _ in range(next_ordinal, ordinal):
+                yield False
+        yield total >= threshold
+        next_ordinal = ordinal + 1
+    if next_ordinal is not None:
+        for _ in range(next_ordinal, last_ordinal + 1):
+            yield False
+
+
+def last(iterable, default=None):
+    """Get the last item of an iterable without keeping the others"""
+    items = deque(iterable, maxlen=1)
+    return items[0] if items else default
@@ -1,3 +1,6 @@
+import math
+from collections import deque
+
 def binary_groupby(iterator, key):
     """Return the iterator split based on a boolean 'streak' function"""
     iterator = iter(iterator)
@@ -13,3 +16,40 @@ def binary_groupby(iterator, key):
         last_item = item
     if result_list:
         yield result_list
+
+def sliding_sums(iterable, window):
+    """Yield the sum of the last `window` items at each item
+
+    Kept as a running total over a deque, so each step is O(1). Until the
+    window fills up it's the sum of the items so far.
+    """
+    items = deque()
+    total = 0
+    for item in iterable:
+        items.append(item)
+        total += item
+        if len(items) > window:
+            total -= items.popleft()
+        yield total
+
+def sliding_max(iterable, window):
+    """Yield the largest of the last `window` items at each item
+
+    Uses a monotonic queue of candidates (amortised O(1) per step) rather
+    than taking the max of every window.
+    """
+    candidates = deque()
+    for index, item in enumerate(iterable):
+        while candidates and candidates[-1][1] <= item:
+            candidates.pop()
+        candidates.append((index, item))
+        if candidates[0][0] <= index - window:
+            candidates.popleft()
+        yield candidates[0][1]
+
+def percentile(sorted_values, fraction):
+    """Get the nearest-rank percentile (0 < fraction <= 1) of sorted values"""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(fraction * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
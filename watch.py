@@ -0,0 +1,155 @@
+"""Waiting on file changes and redrawing a live terminal display
+
+`FileWatcher.create` uses inotify (through ctypes, so Linux only) to wake up
+as soon as a file in one of the watched directories changes, and falls back
+to polling the files' sizes and modification times where inotify isn't
+available. `LiveDisplay` keeps the rows it last drew and only rewrites the
+ones that changed.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import sys
+import time
+
+import click
+
+
+class FileWatcher:
+    """Base for watchers of the files in a set of directories"""
+
+    def __init__(self, paths):
+        self.paths = [path for path in paths if os.path.isdir(path)]
+
+    @classmethod
+    def create(cls, paths):
+        """Get an inotify watcher if possible, or a polling one otherwise"""
+        try:
+            return InotifyWatcher(paths)
+        except OSError:
+            return PollingWatcher(paths)
+
+    def wait(self, timeout):
+        """Wait until a file changes or `timeout` seconds pass
+
+        Returns whether anything changed.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher(FileWatcher):
+    """Watches directories with inotify"""
+
+    # IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+    # IN_CREATE | IN_DELETE, i.e. anything that changes a file's contents
+    MASK = 0x002 | 0x004 | 0x008 | 0x040 | 0x080 | 0x100 | 0x200
+
+    def __init__(self, paths):
+        super().__init__(paths)
+        library = ctypes.util.find_library('c')
+        if library is None:
+            raise OSError('no C library to get inotify from')
+        libc = ctypes.CDLL(library, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError('inotify is not available')
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        for path in self.paths:
+            if libc.inotify_add_watch(self._fd, os.fsencode(path),
+                                      self.MASK) < 0:
+                error = ctypes.get_errno()
+                os.close(self._fd)
+                raise OSError(error, 'inotify_add_watch failed', path)
+
+    def wait(self, timeout):
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return False
+        # the events themselves don't matter, just drain them
+        try:
+            while os.read(self._fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self):
+        os.close(self._fd)
+
+
+class PollingWatcher(FileWatcher):
+    """Watches directories by polling their files' sizes and mtimes"""
+
+    # seconds between polls
+    INTERVAL = 0.2
+
+    def __init__(self, paths):
+        super().__init__(paths)
+        self._snapshot = self._take_snapshot()
+
+    def _take_snapshot(self):
+        snapshot = set()
+        for path in self.paths:
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        stat = entry.stat()
+                        snapshot.add((entry.path, stat.st_size,
+                                      stat.st_mtime_ns))
+            except FileNotFoundError:
+                pass
+        return snapshot
+
+    def wait(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            snapshot = self._take_snapshot()
+            if snapshot != self._snapshot:
+                self._snapshot = snapshot
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self.INTERVAL, remaining))
+
+
+class LiveDisplay:
+    """A block of terminal rows redrawn in place
+
+    Each row must fit on one terminal line. After the first draw, `update`
+    moves the cursor up to each changed row and rewrites only that row.
+    When not writing to a terminal every changed block is written out in
+    full instead.
+    """
+
+    def __init__(self, stream=None):
+        self.stream = sys.stdout if stream is None else stream
+        self.in_place = self.stream.isatty()
+        self.rows = []
+
+    def update(self, rows):
+        """Draw `rows`, rewriting only the ones that differ from last time"""
+        if not self.in_place:
+            if rows != self.rows:
+                click.echo('\n'.join(rows) + '\n', file=self.stream)
+                self.rows = list(rows)
+            return
+        parts = []
+        height = len(self.rows)
+        for index, row in enumerate(rows[:height]):
+            if row != self.rows[index]:
+                up = height - index
+                parts.append('\033[{}F\033[2K{}\033[{}E'.format(up, row, up))
+        for row in rows[height:]:
+            parts.append(row + '\n')
+        if len(rows) < height:
+            extra = height - len(rows)
+            parts.append('\033[{}F\033[J'.format(extra))
+        click.echo(''.join(parts), file=self.stream, nl=False)
+        self.stream.flush()
+        self.rows = list(rows)